@@ -27,23 +27,44 @@
 """
 
 from pydbg.breakpoints import Breakpoint, HwBreakpoint, MemBreakpoint
-from pydbg.mem_snapshot import MemSnapshotContext, MemSnapshotBlock
+from pydbg.event_filter import EventFilter
+from pydbg.logger import Logger
+from pydbg.mem_snapshot import MemSnapshotContext, MemSnapshotBlock, PageStore
+from pydbg.module_map import ModuleMap, ModuleRecord
+from pydbg.pe_exports import ExportIndex
+from pydbg.region_map import MemoryRegion, RegionMap
+from pydbg.snapshot_diff import SnapshotDiff, diff_snapshots
+from pydbg.snapshot_file import SnapshotFile, save_snapshot
+from pydbg.symbolizer import Symbolizer
 from pydbg.defines import *
 from pydbg.errors import *
 from pydbg.pydbg import *
 from pydbg.pydbg_client import *
+from pydbg.pydbg_async_client import AsyncPyDBGClient
 from pydbg.systemdll import *
 from pydbg.windows_h import *
 
 __all__ = [
+    "AsyncPyDBGClient",
     "Breakpoint",
+    "EventFilter",
+    "ExportIndex",
     "HwBreakpoint",
+    "Logger",
     "MemBreakpoint",
     "MemSnapshotBlock",
     "MemSnapshotContext",
+    "MemoryRegion",
+    "ModuleMap",
+    "ModuleRecord",
     "PDError",
+    "PageStore",
     "PyDBG",
     "PyDBGClient",
+    "RegionMap",
+    "SnapshotDiff",
+    "SnapshotFile",
+    "Symbolizer",
     "SystemDLL",
     "windows_h",
     "defines",
@@ -26,6 +26,7 @@
 @organization: www.openrce.org
 """
 
+import bisect
 import random
 from pydbg.defines import DWORD, MEMORY_BASIC_INFORMATION
 
@@ -89,6 +90,173 @@ class MemBreakpoint(object):
         self.on_stack = False  # is this memory breakpoint on a stack buffer?
 
 
+class MemBreakpointIndex(dict):
+    """Memory breakpoints keyed by buffer start address, with an address index
+
+    This is the dictionary PyDBG exposes as memory_breakpoints. Buffer start
+    addresses are kept in a sorted list for bisect lookups and every guarded
+    page maps back to the set of breakpoints spanning it, so that hit
+    resolution is O(log n) and removal only touches the pages of the removed
+    breakpoint. Every mutating dictionary operation maintains the index, so
+    it can not drift from the breakpoints it describes.
+    """
+
+    def __init__(self, page_size: int = 0x1000, breakpoints=()):
+        """
+        @type  page_size:   Integer
+        @param page_size:   (Optional, def=0x1000) System page size
+        @type  breakpoints: Mixed
+        @param breakpoints: (Optional) Mapping, or iterable of (address, MemBreakpoint) pairs, to start with
+        """
+
+        super().__init__()
+
+        self.page_size = page_size
+        self.starts = []  # sorted buffer start addresses
+        self.pages = {}   # guarded page -> set of buffer start addresses spanning it
+        self.spans = {}   # buffer start address -> list of pages it spans
+
+        self.update(breakpoints)
+
+    def __reduce__(self):
+        # the index is rebuilt through __setitem__(), once page_size is known.
+        return (self.__class__, (self.page_size, list(self.items())))
+
+    def __setitem__(self, address, breakpoint):
+        if address in self:
+            self.remove(address)
+
+        super().__setitem__(address, breakpoint)
+
+        bisect.insort(self.starts, address)
+        self.spans[address] = self.span(breakpoint)
+
+        for page in self.spans[address]:
+            self.pages.setdefault(page, set()).add(address)
+
+    def __delitem__(self, address):
+        if address not in self:
+            raise KeyError(address)
+
+        self.remove(address)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+
+        self.starts = []
+        self.pages = {}
+        self.spans = {}
+
+    def pop(self, address, *default):
+        if address not in self:
+            if default:
+                return default[0]
+
+            raise KeyError(address)
+
+        breakpoint = self[address]
+        self.remove(address)
+
+        return breakpoint
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+
+        address = next(reversed(self))
+
+        return (address, self.pop(address))
+
+    def setdefault(self, address, default=None):
+        if address not in self:
+            self[address] = default
+
+        return self[address]
+
+    def update(self, *args, **kwargs):
+        for (address, breakpoint) in dict(*args, **kwargs).items():
+            self[address] = breakpoint
+
+    def span(self, breakpoint):
+        """
+        @type  breakpoint: MemBreakpoint
+        @param breakpoint: Memory breakpoint
+
+        @rtype:  List
+        @return: Base addresses of the pages guarded for the breakpoint, from the page its MEMORY_BASIC_INFORMATION
+                 describes through the byte following the buffer.
+        """
+
+        if breakpoint.mbi is not None:
+            page = breakpoint.mbi.BaseAddress or 0
+        else:
+            page = breakpoint.address - breakpoint.address % self.page_size
+
+        return list(range(page, breakpoint.address + breakpoint.size + 1, self.page_size))
+
+    def remove(self, address: int):
+        """
+        @type  address: DWORD
+        @param address: Starting address of the buffer whose breakpoint to drop
+
+        @rtype:  List
+        @return: Pages no longer spanned by any breakpoint.
+        """
+
+        if address not in self:
+            return []
+
+        super().__delitem__(address)
+        del self.starts[bisect.bisect_left(self.starts, address)]
+
+        released = []
+
+        for page in self.spans.pop(address):
+            owners = self.pages.get(page)
+
+            if owners is None:
+                continue
+
+            owners.discard(address)
+
+            if not owners:
+                del self.pages[page]
+                released.append(page)
+
+        return released
+
+    def find(self, address: int):
+        """
+        @type  address: DWORD
+        @param address: Address to resolve
+
+        @rtype:  Mixed
+        @return: Starting address of the buffer containing address or None if no buffer does.
+        """
+
+        i = bisect.bisect_right(self.starts, address) - 1
+
+        # the closest buffer starting at or below the address.
+        if i >= 0:
+            start = self.starts[i]
+
+            if address <= start + self[start].size:
+                return start
+
+        # overlapping buffers, fall back to the buffers sharing the page.
+        owners = self.pages.get(address - address % self.page_size, ())
+
+        for start in sorted(owners, reverse=True):
+            if start <= address <= start + self[start].size:
+                return start
+
+        return None
+
+
 class HwBreakpoint(object):
     """Hardware breakpoint object"""
 
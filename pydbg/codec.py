@@ -0,0 +1,109 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import copyreg
+from ctypes import addressof, sizeof, string_at
+
+from pydbg.defines import CONTEXT, DEBUG_EVENT, MEMORY_BASIC_INFORMATION, MODULEENTRY32
+from pydbg.errors import PDError
+
+# type tag -> structure class, tags go on the wire and must never be reused.
+TAGS = {}
+
+# structure class -> type tag.
+TYPES = {}
+
+
+def register(tag: int, cls):
+    """
+    Marshal the specified structure as its type tag followed by its raw bytes, pickle included.
+
+    @type  tag: Integer
+    @param tag: Type tag, a single byte value unique to cls
+    @type  cls: Class object
+    @param cls: ctypes structure class
+    """
+
+    if not 0 < tag < 0x100:
+        raise PDError('codec: invalid type tag {}'.format(tag))
+
+    if TAGS.get(tag, cls) is not cls:
+        raise PDError('codec: type tag {} already used by {}'.format(tag, TAGS[tag].__name__))
+
+    TAGS[tag] = cls
+    TYPES[cls] = tag
+
+    copyreg.pickle(cls, _reduce)
+
+
+def encode(obj):
+    """
+    @type  obj: ctypes Structure
+    @param obj: Registered structure to marshal
+
+    @raise PDError: An exception is raised if the structure type was not registered.
+    @rtype:     Raw Bytes
+    @return:    Type tag byte followed by the raw bytes of the structure.
+    """
+
+    tag = TYPES.get(type(obj))
+
+    if tag is None:
+        raise PDError('codec: unregistered type {}'.format(type(obj).__name__))
+
+    return bytes((tag,)) + string_at(addressof(obj), sizeof(obj))
+
+
+def decode(data):
+    """
+    @type  data: Bytes-like object
+    @param data: Output of encode()
+
+    @raise PDError: An exception is raised on unknown type tags or size mismatches.
+    @rtype:     ctypes Structure
+    @return:    Rebuilt structure, holding its own copy of the bytes.
+    """
+
+    view = memoryview(data).cast('B')
+    cls = TAGS.get(view[0])
+
+    if cls is None:
+        raise PDError('codec: unknown type tag {}'.format(view[0]))
+
+    if len(view) - 1 != sizeof(cls):
+        raise PDError('codec: {} expects {} bytes, got {}'.format(cls.__name__, sizeof(cls), len(view) - 1))
+
+    return cls.from_buffer_copy(view, 1)
+
+
+def _reduce(obj):
+    return (decode, (encode(obj),))
+
+
+register(1, CONTEXT)
+register(2, DEBUG_EVENT)
+register(3, MEMORY_BASIC_INFORMATION)
+register(4, MODULEENTRY32)
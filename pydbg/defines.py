@@ -29,8 +29,8 @@
 #                    -s SYSTEM_INFO -o windows_h.py
 #
 # Then the import of ctypes was changed at the top of the file to
-# utilize my_ctypes, which adds the necessary changes to support
-# the pickle-ing of our defined data structures and ctype primitives.
+# utilize my_ctypes. The pickle-ing of our defined data structures
+# is registered by pydbg.codec.
 #
 
 """
@@ -179,8 +179,11 @@ FORMAT_MESSAGE_FROM_SYSTEM = 0x00001000
 INVALID_HANDLE_VALUE = 0xFFFFFFFF
 MEM_COMMIT = 0x00001000
 MEM_DECOMMIT = 0x00004000
+MEM_FREE = 0x00010000
 MEM_IMAGE = 0x01000000
+MEM_PRIVATE = 0x00020000
 MEM_RELEASE = 0x00008000
+MEM_RESERVE = 0x00002000
 PAGE_NOACCESS = 0x00000001
 PAGE_READONLY = 0x00000002
 PAGE_READWRITE = 0x00000004
@@ -0,0 +1,167 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import operator
+
+from pydbg.errors import PDError
+
+# comparison operators usable in register and memory predicates.
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<':  operator.lt,
+    '<=': operator.le,
+    '>':  operator.gt,
+    '>=': operator.ge,
+    '&':  lambda value, mask: value & mask != 0,
+}
+
+# register name -> CONTEXT field.
+REGISTER_FIELDS = {
+    'EAX': 'Eax', 'EBX': 'Ebx', 'ECX': 'Ecx', 'EDX': 'Edx',
+    'ESI': 'Esi', 'EDI': 'Edi', 'ESP': 'Esp', 'EBP': 'Ebp',
+    'EIP': 'Eip', 'EFLAGS': 'EFlags',
+}
+
+
+class EventFilter(object):
+    """Declarative predicate over a debug event
+
+    Filters are plain data so they can be shipped to a PyDBG server and
+    evaluated there, next to the debuggee. Every condition given must hold
+    for the filter to match, a filter without conditions matches everything.
+    """
+
+    def __init__(self, address_ranges=None, module=None, registers=None, memory=None, thread_ids=None):
+        """
+        @type  address_ranges: List
+        @param address_ranges: (Optional) (start, end) ranges the exception address must fall in, end excluded
+        @type  module:         String
+        @param module:         (Optional) Name of the module, executable or DLL, the exception address must sit
+                               in, compared case-insensitively
+        @type  registers:      List
+        @param registers:      (Optional) (register, operator, value) predicates on the thread context
+        @type  memory:         List
+        @param memory:         (Optional) (location, length, operator, value) predicates on debuggee memory.
+                               location is an address or a (register, offset) tuple, value raw bytes
+        @type  thread_ids:     List
+        @param thread_ids:     (Optional) IDs of the threads the event must come from
+        """
+
+        self.address_ranges = [tuple(address_range) for address_range in address_ranges or []]
+        self.module = module.lower() if module else None
+        self.registers = [tuple(predicate) for predicate in registers or []]
+        self.memory = [tuple(predicate) for predicate in memory or []]
+        self.thread_ids = set(thread_ids or [])
+
+        for (register, op, value) in self.registers:
+            if register.upper() not in REGISTER_FIELDS:
+                raise PDError('EventFilter: invalid register {}'.format(register))
+
+            if op not in OPERATORS:
+                raise PDError('EventFilter: invalid operator {}'.format(op))
+
+        for (location, length, op, value) in self.memory:
+            if op not in ('==', '!='):
+                raise PDError('EventFilter: invalid memory operator {}'.format(op))
+
+    def __repr__(self):
+        return 'EventFilter(address_ranges={!r}, module={!r}, registers={!r}, memory={!r}, thread_ids={!r})'.format(
+            self.address_ranges, self.module, self.registers, self.memory, sorted(self.thread_ids))
+
+    def matches(self, pydbg):
+        """
+        Evaluate the filter against the debug event pydbg is currently handling.
+        Conditions are checked cheapest first, memory that can not be read fails the predicate.
+
+        @type  pydbg: PyDBG
+        @param pydbg: Debugger instance handling the event
+
+        @rtype:  Bool
+        @return: True if the event satisfies every condition.
+        """
+
+        if self.thread_ids and pydbg.dbg.dwThreadId not in self.thread_ids:
+            return False
+
+        address = pydbg.exception_address
+
+        if self.address_ranges:
+            for (start, end) in self.address_ranges:
+                if start <= address < end:
+                    break
+            else:
+                return False
+
+        if self.module:
+            module = pydbg.addr_to_module(address)
+
+            if not module or module.name.lower() != self.module:
+                return False
+
+        for (register, op, value) in self.registers:
+            if not OPERATORS[op](self._register(pydbg, register), value):
+                return False
+
+        for (location, length, op, value) in self.memory:
+            if isinstance(location, tuple):
+                (register, offset) = location
+                location = self._register(pydbg, register) + offset
+
+            try:
+                data = pydbg.read_process_memory(location, length)
+            except PDError:
+                return False
+
+            if not OPERATORS[op](bytes(data), value):
+                return False
+
+        return True
+
+    @staticmethod
+    def _register(pydbg, register):
+        return getattr(pydbg.context, REGISTER_FIELDS[register.upper()])
+
+
+def any_match(filters, pydbg):
+    """
+    @type  filters: List
+    @param filters: EventFilter objects, any of which may match
+    @type  pydbg:   PyDBG
+    @param pydbg:   Debugger instance handling the event
+
+    @rtype:  Bool
+    @return: True if there are no filters or at least one of them matches.
+    """
+
+    if not filters:
+        return True
+
+    for event_filter in filters:
+        if event_filter.matches(pydbg):
+            return True
+
+    return False
@@ -0,0 +1,191 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import sys
+import collections
+
+LOG_DEBUG = 10
+LOG_INFO = 20
+LOG_ERROR = 40
+LOG_OFF = 100
+
+LOG_PREFIXES = {
+    LOG_DEBUG: '[PDBG_LOG]',
+    LOG_INFO:  '[PDBG_LOG]',
+    LOG_ERROR: '[PDBG_ERR]',
+}
+
+
+class Logger(object):
+    """Level gated debugger log
+
+    Messages are %-style format strings whose arguments are only applied
+    once the message passed the level check, so a disabled message costs a
+    single comparison. Hot call sites can skip even building the arguments
+    by testing the debug_enabled attribute first. Messages are written to a
+    stream (sys.stderr by default) or kept, unformatted, in a ring buffer of
+    the most recent records. A level can also be handed to a hook taking the
+    formatted message, as PyDBG does for scripts replacing its _log / _err.
+    """
+
+    def __init__(self, level: int = LOG_DEBUG, stream=None, ring_size: int = 0):
+        """
+        @type  level:     Integer
+        @param level:     (Optional, def=LOG_DEBUG) Minimum level of the messages to emit
+        @type  stream:    File
+        @param stream:    (Optional, def=sys.stderr) Stream messages are written to
+        @type  ring_size: Integer
+        @param ring_size: (Optional, def=0) Keep the last ring_size records in memory instead of writing them
+        """
+
+        self.level = LOG_OFF
+        self.debug_enabled = False  # fast check for hot call sites, kept in sync with self.level
+        self.stream = stream
+        self.ring = None
+        self.hooks = {}  # level -> routine called with each formatted message of that level
+
+        self.set_level(level)
+
+        if ring_size:
+            self.route_to_ring(ring_size)
+
+    def set_level(self, level: int):
+        """
+        Set the minimum level of the messages to emit, LOG_OFF disables logging.
+
+        @type  level: Integer
+        @param level: LOG_DEBUG, LOG_INFO, LOG_ERROR or LOG_OFF
+        """
+
+        self.level = level
+        self.debug_enabled = level <= LOG_DEBUG
+
+    def is_enabled(self, level: int):
+        """
+        @type  level: Integer
+        @param level: Level to check
+
+        @rtype:  Bool
+        @return: True if messages of the specified level are emitted.
+        """
+
+        return level >= self.level
+
+    def set_hook(self, level: int, hook):
+        """
+        Hand the messages of the specified level to a routine instead of the stream or ring buffer.
+
+        @type  level: Integer
+        @param level: LOG_DEBUG, LOG_INFO or LOG_ERROR
+        @type  hook:  Function Pointer
+        @param hook:  Routine called with each formatted message, hook(msg). None, or the logger method of the
+                      level itself, removes the hook.
+        """
+
+        if hook is None or hook == {LOG_DEBUG: self.debug, LOG_INFO: self.info, LOG_ERROR: self.error}.get(level):
+            self.hooks.pop(level, None)
+        else:
+            self.hooks[level] = hook
+
+    def route_to_ring(self, size: int):
+        """
+        Keep the last size records in memory instead of writing them out.
+
+        @type  size: Integer
+        @param size: Number of records to keep
+        """
+
+        self.ring = collections.deque(maxlen=size)
+
+    def route_to_stream(self, stream=None):
+        """
+        Write records to the specified stream, dropping the ring buffer if any.
+
+        @type  stream: File
+        @param stream: (Optional, def=sys.stderr) Stream messages are written to
+        """
+
+        self.stream = stream
+        self.ring = None
+
+    def records(self):
+        """
+        Format and return the records currently held in the ring buffer.
+
+        @rtype:  List
+        @return: List of (level, message) tuples, oldest first.
+        """
+
+        if self.ring is None:
+            return []
+
+        return [(level, self.format(msg, args)) for level, msg, args in self.ring]
+
+    def log(self, level: int, msg, *args):
+        """
+        Emit a message if its level is enabled.
+
+        @type  level: Integer
+        @param level: Level of the message
+        @type  msg:   String
+        @param msg:   Message, or %-style format string if args are given
+        @type  args:  Tuple
+        @param args:  Format arguments, only applied if the message is emitted
+        """
+
+        if level < self.level:
+            return
+
+        if self.hooks:
+            hook = self.hooks.get(level)
+
+            if hook is not None:
+                hook(self.format(msg, args))
+                return
+
+        if self.ring is not None:
+            self.ring.append((level, msg, args))
+            return
+
+        stream = self.stream or sys.stderr
+        stream.write('{} {}\n'.format(LOG_PREFIXES.get(level, '[PDBG_LOG]'), self.format(msg, args)))
+
+    def debug(self, msg, *args):
+        if self.debug_enabled:
+            self.log(LOG_DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(LOG_INFO, msg, *args)
+
+    def error(self, msg, *args):
+        self.log(LOG_ERROR, msg, *args)
+
+    @staticmethod
+    def format(msg, args):
+        if args:
+            return msg % args
+
+        return str(msg)
@@ -26,21 +26,288 @@
 @organization: www.openrce.org
 """
 
+import hashlib
+
 from pydbg.defines import MEMORY_BASIC_INFORMATION, CONTEXT
+from pydbg.errors import PDError
+
+# pages are zero pages if they are a prefix of this buffer. bytes.startswith() compares buffers with a
+# single memcmp(), where comparing a memoryview goes element by element. covers every page size in use.
+ZERO_PAGE = bytes(0x10000)
+
+
+class PageStore(object):
+    """Content-addressed store of snapshot pages
+
+    Blocks are split into pages which are deduplicated by digest across
+    blocks and snapshots, zero pages are not stored at all. Blocks keep
+    references to the shared page objects themselves, the store only
+    counts them so unreferenced pages can be forgotten.
+    """
+
+    DIGEST_SIZE = 16
+
+    def __init__(self, page_size: int = 0x1000):
+        """
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) System page size
+        """
+
+        if page_size > len(ZERO_PAGE):
+            raise PDError('page size 0x{:x} exceeds 0x{:x}'.format(page_size, len(ZERO_PAGE)))
+
+        self.page_size = page_size
+        self.zero_page = ZERO_PAGE[:page_size]
+        self.pages = {}       # digest -> page bytes
+        self.references = {}  # digest -> number of stored pages pointing to it
+        self.digests = {}     # id of a stored page -> its digest, spares hashing on release()
+
+        self.pages_put = 0   # number of pages handed to put()
+        self.zero_pages = 0  # number of those that were zero pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def put(self, data):
+        """
+        Split the specified data into pages and store them.
+
+        @type  data: Bytes-like object
+        @param data: Block content
+
+        @rtype:  Tuple
+        @return: Page objects of the block, None standing for zero pages.
+        """
+
+        view = memoryview(data).cast('B')
+        page_size = self.page_size
+        pages = []
+
+        for offset in range(0, len(view), page_size):
+            page = view[offset:offset + page_size]
+            self.pages_put += 1
+
+            if ZERO_PAGE.startswith(page):
+                self.zero_pages += 1
+                pages.append(None)
+                continue
+
+            digest = hashlib.blake2b(page, digest_size=self.DIGEST_SIZE).digest()
+            stored = self.pages.get(digest)
+
+            if stored is None:
+                stored = self.pages[digest] = page.tobytes()
+                self.references[digest] = 0
+                self.digests[id(stored)] = digest
+
+            self.references[digest] += 1
+            pages.append(stored)
+
+        return tuple(pages)
+
+    def release(self, pages):
+        """
+        Forget the pages returned by put() once no other block references them.
+
+        @type  pages: Tuple
+        @param pages: Output of put()
+        """
+
+        for page in pages:
+            if page is None:
+                continue
+
+            digest = self.digests.get(id(page))
+
+            # pages the store no longer holds, ex: after clear().
+            if digest is None or self.pages[digest] is not page:
+                continue
+
+            self.references[digest] -= 1
+
+            if not self.references[digest]:
+                del self.references[digest]
+                del self.pages[digest]
+                del self.digests[id(page)]
+
+    def clear(self):
+        """Forget all stored pages, blocks holding them are not affected."""
+
+        self.pages = {}
+        self.references = {}
+        self.digests = {}
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Number of pages put, zero pages among them, unique pages stored and bytes they take.
+        """
+
+        return {
+            'pages': self.pages_put,
+            'zero_pages': self.zero_pages,
+            'unique_pages': len(self.pages),
+            'bytes': sum(len(page) for page in self.pages.values()),
+        }
 
 
 class MemSnapshotBlock(object):
     """Memory block object, used in memory snapshots"""
     
-    def __init__(self, mbi: MEMORY_BASIC_INFORMATION = None, data: bytes = None):
+    def __init__(self, mbi: MEMORY_BASIC_INFORMATION = None, data: bytes = None, store: PageStore = None):
         """
-        @type  mbi:  MEMORY_BASIC_INFORMATION
-        @param mbi:  MEMORY_BASIC_INFORMATION of memory block
-        @type  data: Raw Bytes
-        @param data: Raw bytes stored in memory block at time of snapshot
+        @type  mbi:   MEMORY_BASIC_INFORMATION
+        @param mbi:   MEMORY_BASIC_INFORMATION of memory block
+        @type  data:  Bytes-like object
+        @param data:  Raw bytes stored in memory block at time of snapshot, ex: a view of a snapshot file
+        @type  store: PageStore
+        @param store: (Optional) Page store to keep the data in, deduplicated, instead of a single bytes object
         """
         self.mbi = mbi
-        self.data = data
+        self.store = None
+        self.pages = None  # page objects of the data, see PageStore.put()
+        self.size = 0
+        self._data = None
+
+        if store is not None and data is not None:
+            self.store = store
+            self.pages = store.put(data)
+            self.size = len(data)
+        else:
+            self.data = data
+
+    def __del__(self):
+        self._release()
+
+    @property
+    def data(self):
+        """
+        Raw bytes stored in memory block at time of snapshot, assembled from the page store if needed.
+        """
+
+        if self.pages is None:
+            return self._data
+
+        return self.view().tobytes()
+
+    @data.setter
+    def data(self, data):
+        self._release()
+        self._data = data
+        self.size = len(data) if data is not None else 0
+
+    def view(self, offset: int = 0, length: int = None):
+        """
+        @type  offset: Integer
+        @param offset: (Optional, def=0) Offset into the block
+        @type  length: Integer
+        @param length: (Optional, def=up to the end of the block) Number of bytes
+
+        @rtype:  memoryview
+        @return: Read-only view of the data. Views of a single stored page or of unpaged data share its memory.
+        """
+
+        if length is None:
+            length = self.size - offset
+
+        if self.pages is None:
+            return memoryview(self._data)[offset:offset + length]
+
+        page_size = self.store.page_size
+        (first, last) = (offset // page_size, (offset + length - 1) // page_size)
+
+        if first == last and self.pages[first] is not None:
+            start = offset - first * page_size
+            return memoryview(self.pages[first])[start:start + length]
+
+        data = b''.join(self._page(index) for index in range(first, last + 1))
+        start = offset - first * page_size
+
+        return memoryview(data)[start:start + length]
+
+    def dirty_runs(self, current: bytes, page_size: int = 0x1000):
+        """
+        Compare the current content of the block against the snapshot, page by page.
+        The snapshot bytes are at hand, so pages are compared directly rather than through digests.
+
+        @type  current:   Raw Bytes
+        @param current:   Current content of the block
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) System page size
+
+        @rtype:  List
+        @return: (offset, length) runs of consecutive pages whose content changed since the snapshot.
+        """
+
+        if len(current) != self.size:
+            return [(0, self.size)]
+
+        if self.pages is None and isinstance(self._data, (bytes, bytearray)) and current == self._data:
+            return []
+
+        # stored pages must be compared on the page size of the store.
+        if self.pages is not None:
+            page_size = self.store.page_size
+
+        runs = []
+
+        for (offset, page) in zip(range(0, self.size, page_size), self.iter_pages(page_size)):
+            if current[offset:offset + page_size] == page:
+                continue
+
+            length = min(page_size, self.size - offset)
+
+            # extend the previous run if the pages are adjacent.
+            if runs and runs[-1][0] + runs[-1][1] == offset:
+                runs[-1] = (runs[-1][0], runs[-1][1] + length)
+            else:
+                runs.append((offset, length))
+
+        return runs
+
+    def iter_pages(self, page_size: int = 0x1000):
+        """
+        Iterate over the content of the block, page by page.
+        Pages of a page store are yielded as the shared page objects, so identical pages of blocks kept in
+        the same store are the same object.
+
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) System page size
+
+        @rtype:  Raw Bytes
+        @return: Page contents, the last page may be short.
+        """
+
+        if self.pages is not None and page_size == self.store.page_size:
+            for index in range(len(self.pages)):
+                yield self._page(index)
+
+            return
+
+        data = self._data if self.pages is None else self.data
+
+        if isinstance(data, (bytes, bytearray)):
+            for offset in range(0, self.size, page_size):
+                yield data[offset:offset + page_size]
+        else:
+            # memoryview comparisons go element by element, page copies compare with a single memcmp().
+            for offset in range(0, self.size, page_size):
+                yield data[offset:offset + page_size].tobytes()
+
+    def _page(self, index):
+        page = self.pages[index]
+
+        if page is None:
+            # zero page, possibly the short last page of the block.
+            return self.store.zero_page[:min(self.store.page_size, self.size - index * self.store.page_size)]
+
+        return page
+
+    def _release(self):
+        if self.pages is not None:
+            self.store.release(self.pages)
+            self.pages = None
+            self.store = None
 
 
 class MemSnapshotContext(object):
@@ -0,0 +1,229 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import bisect
+import os
+from collections import namedtuple
+
+# ANSI code page the *A() APIs return strings in, 'mbcs' only exists on Windows.
+ANSI_ENCODING = 'mbcs' if os.name == 'nt' else 'utf-8'
+
+
+def ansi_string(value):
+    """
+    @type  value: Raw Bytes or String
+    @param value: String returned by an ANSI API, such as a module name or path
+
+    @rtype:  String
+    @return: value decoded from the ANSI code page, str values are returned as is.
+    """
+
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode(ANSI_ENCODING, 'replace')
+
+    return value
+
+
+class ModuleRecord(namedtuple('ModuleRecord', ('name', 'path', 'base', 'size'))):
+    """Immutable description of a module mapped in the debuggee
+
+    The MODULEENTRY32 field names are kept as aliases so code written
+    against the toolhelp structures keeps working.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, name, path, base, size):
+        # modules are looked up by str, whatever API their name came from.
+        return super().__new__(cls, ansi_string(name), ansi_string(path), base, size)
+
+    @property
+    def end(self):
+        return self.base + self.size
+
+    @property
+    def szModule(self):
+        return self.name
+
+    @property
+    def szExePath(self):
+        return self.path
+
+    @property
+    def modBaseAddr(self):
+        return self.base
+
+    @property
+    def modBaseSize(self):
+        return self.size
+
+    @classmethod
+    def from_entry(cls, entry):
+        """
+        @type  entry: MODULEENTRY32
+        @param entry: Module entry as returned by Module32First() / Module32Next()
+
+        @rtype:  ModuleRecord
+        @return: Record describing the same module as entry.
+        """
+
+        return cls(entry.szModule, entry.szExePath, entry.modBaseAddr or 0, entry.modBaseSize)
+
+
+class ModuleMap(object):
+    """Sorted, bisect searchable table of the modules mapped in the debuggee
+
+    Records are kept in two parallel lists sorted by base address, plus an
+    index by lower cased name. The map is maintained from module load and
+    unload events, a module loading over the range of another replaces it.
+    """
+
+    def __init__(self):
+        self.bases = []
+        self.records = []
+        self.names = {}  # lower cased module name -> record
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record: ModuleRecord):
+        """
+        Add the specified module, replacing any module it overlaps.
+
+        @type  record: ModuleRecord
+        @param record: Module to add
+        """
+
+        low = bisect.bisect_right(self.bases, record.base)
+
+        # the preceding module may extend over the new one.
+        if low and self.records[low - 1].end > record.base:
+            low -= 1
+
+        high = bisect.bisect_left(self.bases, max(record.end, record.base + 1), low)
+        stale = self.records[low:high]
+
+        self.bases[low:high] = [record.base]
+        self.records[low:high] = [record]
+
+        for replaced in stale:
+            self._unindex(replaced)
+
+        if record.name:
+            self.names[record.name.lower()] = record
+
+    def clear(self):
+        """Drop all known modules."""
+
+        self.bases = []
+        self.records = []
+        self.names = {}
+
+    def find(self, address: int):
+        """
+        Find the module containing the specified address.
+
+        @type  address: DWORD
+        @param address: Address to look up
+
+        @rtype:  ModuleRecord
+        @return: Module containing the address, or None if not found.
+        """
+
+        position = bisect.bisect_right(self.bases, address)
+
+        if not position:
+            return None
+
+        record = self.records[position - 1]
+
+        if address >= record.end:
+            return None
+
+        return record
+
+    def find_name(self, name):
+        """
+        @type  name: String
+        @param name: Module name (case-insensitive, ex:ws2_32.dll)
+
+        @rtype:  ModuleRecord
+        @return: Module loaded under the name, or None if not found.
+        """
+
+        return self.names.get(name.lower())
+
+    def remove(self, base: int):
+        """
+        Remove the module loaded at the specified base.
+
+        @type  base: DWORD
+        @param base: Module base address
+
+        @rtype:  ModuleRecord
+        @return: Removed module, or None if no module was loaded at that base.
+        """
+
+        position = bisect.bisect_left(self.bases, base)
+
+        if position == len(self.bases) or self.bases[position] != base:
+            return None
+
+        record = self.records[position]
+
+        del self.bases[position]
+        del self.records[position]
+        self._unindex(record)
+
+        return record
+
+    def sync(self, records):
+        """
+        Replace the known modules, ex: with a toolhelp snapshot taken on attach.
+
+        @type  records: List
+        @param records: ModuleRecord objects
+        """
+
+        self.clear()
+
+        for record in records:
+            self.add(record)
+
+    def _unindex(self, record):
+        if not record.name or self.names.get(record.name.lower()) is not record:
+            return
+
+        del self.names[record.name.lower()]
+
+        # fall back on another module of the same name, if any.
+        for other in self.records:
+            if other is not record and other.name and other.name.lower() == record.name.lower():
+                self.names[other.name.lower()] = other
+                break
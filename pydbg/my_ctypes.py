@@ -35,57 +35,5 @@
 
 from ctypes import *
 
-
-def _construct(type_, raw_bytes):
-    """
-
-    This routine is called by _reduce for unmarshaling purposes.
-    The object type is used to instantiate a new object of
-    the desired type. The raw bytes are then directly written
-    into the address space of the newly instantiated object
-    via the ctypes routines memmove() and addressof().
-
-    @type  type_:       Class object
-    @param type_:       The class type of the object we are unmarshaling.
-    @type  raw_bytes: Raw bytes (in a string buffer)
-    @param raw_bytes: The raw bytes
-
-    @rtype:  Mixed
-    @return: Unmarshaled object.
-    """
-
-    obj = type_.__new__(type_)
-    memmove(addressof(obj), raw_bytes, len(raw_bytes))
-
-    return obj
-
-
-def _reduce(self):
-    """
-
-    cPickle will allow an object to marshal itself if
-    the __reduce__ function is defined. Because cPickle is unable to
-    handle ctype primitives or the objects derived on those primitives
-    we define this function that later is assigned as the __reduce__ method
-    for all types. This method relies on _construct for unmarshaling.
-    As per the Python docs __reduce__ must return a tuple where the first
-    element is "A callable object that will be called to create the
-    initial version of the object. The next element of the tuple will provide
-    arguments for this callable...". In this case we pass the object class and
-    the raw data bytes of the object to _construct.
-
-    @rtype:  Tuple
-    @return: Tuple, as specified per the cPickle __reduce__ Python docs.
-    """
-
-    return (_construct, (self.__class__, str(buffer(self))))
-
-
-c_types = (Structure, c_char, c_byte, c_ubyte, c_short, c_ushort,
-           c_int, c_uint, c_long, c_ulong, c_longlong, c_ulonglong,
-           c_float, c_double, c_char_p, c_wchar_p, c_void_p)
-
-
-# for each ctype we need to marshal, set it's __reduce__ routine.
-#for typ in c_types:
-#    typ.__reduce__ = _reduce
+# the __reduce__ attribute of the builtin ctypes base classes can not be overridden, pickle support for the
+# structures we ship over the wire is registered per class with copyreg by pydbg.codec instead.
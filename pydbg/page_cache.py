@@ -0,0 +1,147 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+from pydbg.errors import PDError
+
+
+class PageCache(object):
+    """Page granular cache of debuggee memory
+
+    The cache is only meant to live for the duration of a single debug event,
+    while the debuggee is stopped and its memory can not change underneath us.
+    Reads are served from page sized blocks fetched through the supplied
+    read routine, writes must be reported through invalidate().
+    """
+
+    def __init__(self, read, page_size: int = 0x1000):
+        """
+        @type  read:      Function Pointer
+        @param read:      Routine used to fetch uncached memory, read(address, length) -> bytes
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) Size of a cached block, must be a power of two
+        """
+
+        self.read = read
+        self.page_size = page_size
+        self.enabled = False
+        self.pages = {}   # page base address -> page bytes
+
+        self.hits = 0     # number of pages served from the cache
+        self.misses = 0   # number of pages fetched through self.read
+
+    def enable(self):
+        """Start caching reads. Any previously cached data is dropped."""
+
+        self.pages.clear()
+        self.enabled = True
+
+    def disable(self):
+        """Stop caching reads and drop all cached data."""
+
+        self.pages.clear()
+        self.enabled = False
+
+    def flush(self):
+        """Drop all cached data."""
+
+        self.pages.clear()
+
+    def invalidate(self, address: int, length: int):
+        """
+        Drop the cached pages overlapping the specified range.
+
+        @type  address: DWORD
+        @param address: Start of the modified range
+        @type  length:  Integer
+        @param length:  Length, in bytes, of the modified range
+        """
+
+        if not self.pages:
+            return
+
+        mask = ~(self.page_size - 1)
+        page = address & mask
+        end = address + max(length, 1)
+
+        while page < end:
+            self.pages.pop(page, None)
+            page += self.page_size
+
+    def read_cached(self, address: int, length: int):
+        """
+        Read the specified range through the cache.
+
+        @type  address: DWORD
+        @param address: Address to read from
+        @type  length:  Integer
+        @param length:  Length, in bytes, of data to read
+
+        @raise PDError: An exception is raised if any of the spanned pages can not be fully read.
+        @rtype:     Raw Bytes
+        @return:    Read data.
+        """
+
+        page_size = self.page_size
+        page = address & ~(page_size - 1)
+        offset = address - page
+        end = address + length
+
+        # fast path, the range sits in a single page.
+        if end <= page + page_size:
+            return self._page(page)[offset:offset + length]
+
+        data = bytearray()
+
+        while page < end:
+            data += self._page(page)
+            page += page_size
+
+        return bytes(data[offset:offset + length])
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Cache hit / miss counters and the number of resident pages.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'pages': len(self.pages)}
+
+    def _page(self, page):
+        data = self.pages.get(page)
+
+        if data is None:
+            self.misses += 1
+            data = self.read(page, self.page_size)
+
+            # never cache a partially readable page.
+            if len(data) != self.page_size:
+                raise PDError('PageCache: short read of page 0x{:08x}'.format(page))
+
+            self.pages[page] = data
+        else:
+            self.hits += 1
+
+        return data
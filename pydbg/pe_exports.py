@@ -0,0 +1,307 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import bisect
+import struct
+
+from pydbg.errors import PDError
+
+DOS_HEADER_SIZE = 0x40
+PE_HEADERS_SIZE = 0xF8           # PE signature, file header and 32-bit optional header
+EXPORT_DIRECTORY_SIZE = 0x28
+EXPORT_DATA_DIRECTORY = 0x78     # offset of the export data directory in the PE headers
+MAX_EXPORTS = 0x10000
+
+
+class ExportIndex(object):
+    """Export table of a module loaded in the debuggee
+
+    Built once from the export directory, which is fetched with a single
+    read covering the directory, its tables and, as laid out by every sane
+    linker, the name strings. Anything sitting outside of it is fetched
+    separately.
+    """
+
+    def __init__(self, base: int, names=None, ordinals=None, forwarders=None, directory=(0, 0)):
+        """
+        @type  base:       DWORD
+        @param base:       Module base address
+        @type  names:      Dictionary
+        @param names:      (Optional) Export name -> RVA
+        @type  ordinals:   Dictionary
+        @param ordinals:   (Optional) Export ordinal (ordinal base included) -> RVA
+        @type  forwarders: Dictionary
+        @param forwarders: (Optional) Forwarded export name -> forwarder string ("DLL.Function")
+        @type  directory:  Tuple
+        @param directory:  (Optional) (RVA, size) of the export directory, forwarder strings live there
+        """
+
+        self.base = base
+        self.names = names or {}
+        self.ordinals = ordinals or {}
+        self.forwarders = forwarders or {}
+        self.directory = directory
+
+        # sorted RVAs of the exported code and data, with the (first) name exported at each.
+        (start, size) = directory
+        rva_names = {}
+
+        for (ordinal, rva) in sorted(self.ordinals.items()):
+            if rva and not start <= rva < start + size:
+                rva_names.setdefault(rva, '#{}'.format(ordinal))
+
+        for (name, rva) in sorted(self.names.items()):
+            if rva in rva_names and rva_names[rva].startswith('#'):
+                rva_names[rva] = name
+
+        self.rvas = sorted(rva_names)
+        self.rva_names = [rva_names[rva] for rva in self.rvas]
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, rva: int):
+        """
+        Find the closest export at or below the specified RVA.
+
+        @type  rva: DWORD
+        @param rva: RVA within the module
+
+        @rtype:  Tuple
+        @return: (export name, offset from the export), or None if the RVA precedes every export.
+        """
+
+        position = bisect.bisect_right(self.rvas, rva)
+
+        if not position:
+            return None
+
+        return (self.rva_names[position - 1], rva - self.rvas[position - 1])
+
+    def resolve(self, name):
+        """
+        @type  name: String
+        @param name: Export name (case-sensitive)
+
+        @rtype:  DWORD
+        @return: Address of the export in the debuggee, or None if not exported.
+        """
+
+        rva = self.names.get(name)
+
+        if rva is None:
+            return None
+
+        return self.base + rva
+
+    def resolve_ordinal(self, ordinal: int):
+        """
+        @type  ordinal: Integer
+        @param ordinal: Export ordinal, ordinal base included
+
+        @rtype:  DWORD
+        @return: Address of the export in the debuggee, or None if not exported.
+        """
+
+        rva = self.ordinals.get(ordinal)
+
+        if not rva:
+            return None
+
+        return self.base + rva
+
+    @classmethod
+    def parse(cls, read, base: int):
+        """
+        Build the export index of the module loaded at the specified base.
+
+        @type  read: Function Pointer
+        @param read: Routine reading debuggee memory, read(address, length) -> bytes
+        @type  base: DWORD
+        @param base: Module base address
+
+        @raise PDError: An exception is raised if the module headers or the export table are invalid.
+        @rtype:     ExportIndex
+        @return:    Export index, empty for modules without exports.
+        """
+
+        # short reads and out of range indexes, as found in unmapped or corrupted export tables.
+        try:
+            return cls._parse(read, base)
+        except (struct.error, IndexError) as err:
+            raise PDError('ExportIndex: invalid export table at 0x{:08x}: {}'.format(base, err))
+
+    @classmethod
+    def _parse(cls, read, base):
+        dos_header = read(base, DOS_HEADER_SIZE)
+
+        if len(dos_header) != DOS_HEADER_SIZE or dos_header[:2] != b'MZ':
+            raise PDError('ExportIndex: invalid DOS header at 0x{:08x}'.format(base))
+
+        (e_lfanew,) = struct.unpack_from('<I', dos_header, 0x3C)
+        pe_headers = read(base + e_lfanew, PE_HEADERS_SIZE)
+
+        if len(pe_headers) != PE_HEADERS_SIZE or pe_headers[:4] != b'PE\x00\x00':
+            raise PDError('ExportIndex: invalid PE headers at 0x{:08x}'.format(base + e_lfanew))
+
+        (directory_rva, directory_size) = struct.unpack_from('<II', pe_headers, EXPORT_DATA_DIRECTORY)
+
+        if not directory_rva:
+            return cls(base)
+
+        blob = _Blob(read, base, directory_rva, max(directory_size, EXPORT_DIRECTORY_SIZE))
+
+        (ordinal_base, num_functions, num_names,
+         address_of_functions, address_of_names, address_of_ordinals) = struct.unpack_from(
+            '<IIIIII', blob.get(directory_rva, EXPORT_DIRECTORY_SIZE), 0x10)
+
+        # ordinals are 16-bit, anything larger is garbage and would have us read the world.
+        if num_functions > MAX_EXPORTS or num_names > MAX_EXPORTS:
+            raise PDError('ExportIndex: invalid export directory at 0x{:08x}'.format(base + directory_rva))
+
+        functions = struct.unpack('<{}I'.format(num_functions), blob.get(address_of_functions, num_functions * 4))
+        name_rvas = struct.unpack('<{}I'.format(num_names), blob.get(address_of_names, num_names * 4))
+        name_ordinals = struct.unpack('<{}H'.format(num_names), blob.get(address_of_ordinals, num_names * 2))
+
+        ordinals = {}
+        names = {}
+        forwarders = {}
+
+        for (index, rva) in enumerate(functions):
+            if rva:
+                ordinals[ordinal_base + index] = rva
+
+        for (name_rva, index) in zip(name_rvas, name_ordinals):
+            if index >= num_functions:
+                continue
+
+            name = blob.string(name_rva)
+            rva = functions[index]
+            names[name] = rva
+
+            # exports pointing back into the export directory are forwarder strings.
+            if directory_rva <= rva < directory_rva + directory_size:
+                forwarders[name] = blob.string(rva)
+
+        return cls(base, names, ordinals, forwarders, (directory_rva, directory_size))
+
+
+class _Blob(object):
+    """
+    Bulk read of a module range, with a fallback read for anything outside of it.
+    """
+
+    def __init__(self, read, base, rva, size):
+        self.read = read
+        self.base = base
+        self.rva = rva
+        self.data = read(base + rva, size)
+        self.reads = 1
+
+    def get(self, rva, length):
+        offset = rva - self.rva
+
+        if 0 <= offset and offset + length <= len(self.data):
+            return self.data[offset:offset + length]
+
+        self.reads += 1
+        return self.read(self.base + rva, length)
+
+    def string(self, rva, chunk=256):
+        offset = rva - self.rva
+
+        if 0 <= offset < len(self.data):
+            end = self.data.find(b'\x00', offset)
+
+            if end != -1:
+                return self.data[offset:end].decode('ascii', 'replace')
+
+        # outside of the bulk read, or running past its end.
+        data = b''
+
+        while True:
+            self.reads += 1
+            piece = self.read(self.base + rva + len(data), chunk)
+            end = piece.find(b'\x00')
+
+            if end != -1 or not piece:
+                data += piece[:end] if end != -1 else piece
+                return data.decode('ascii', 'replace')
+
+            data += piece
+
+
+class ExportCache(object):
+    """Export indexes of the modules loaded in the debuggee, keyed by module base"""
+
+    def __init__(self):
+        self.indexes = {}  # module base -> ExportIndex
+
+        self.hits = 0    # number of lookups served from the cache
+        self.misses = 0  # number of indexes built
+
+    def get(self, read, base: int):
+        """
+        @type  read: Function Pointer
+        @param read: Routine reading debuggee memory, read(address, length) -> bytes
+        @type  base: DWORD
+        @param base: Module base address
+
+        @raise PDError: An exception is raised if the module headers are invalid.
+        @rtype:     ExportIndex
+        @return:    Export index of the module, built on first request.
+        """
+
+        index = self.indexes.get(base)
+
+        if index is None:
+            self.misses += 1
+            index = self.indexes[base] = ExportIndex.parse(read, base)
+        else:
+            self.hits += 1
+
+        return index
+
+    def drop(self, base: int):
+        """
+        Forget the index of the module at the specified base, on unload or when another module loads there.
+
+        @type  base: DWORD
+        @param base: Module base address
+        """
+
+        self.indexes.pop(base, None)
+
+    def clear(self):
+        self.indexes.clear()
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Hit / miss counters and the number of cached indexes.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'modules': len(self.indexes)}
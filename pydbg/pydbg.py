@@ -30,13 +30,16 @@
 
 import os.path
 import sys
-import copy
 import signal
+import collections
+from array import array
 import struct
+import time
 import pydasm
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from ctypes import (
-    windll, CDLL, byref, sizeof, c_char_p, c_int,
+    windll, CDLL, byref, sizeof, c_char, c_char_p, c_int,
     c_ulong, create_string_buffer,
 )
 
@@ -50,8 +53,16 @@ except:
     kernel32 = CDLL(os.path.join(os.path.dirname(__file__), 'libmacdll.dylib'))
     advapi32 = kernel32
 
-from pydbg.breakpoints import Breakpoint, MemBreakpoint, HwBreakpoint
+from pydbg.breakpoints import Breakpoint, MemBreakpoint, HwBreakpoint, MemBreakpointIndex
 from pydbg.mem_snapshot import MemSnapshotBlock, MemSnapshotContext
+from pydbg.module_map import ModuleMap, ModuleRecord
+from pydbg.logger import Logger, LOG_DEBUG, LOG_INFO, LOG_ERROR, LOG_OFF
+from pydbg.page_cache import PageCache
+from pydbg.pe_exports import ExportCache
+from pydbg.region_map import RegionMap, MemoryRegion
+from pydbg.snapshot_diff import diff_snapshots
+from pydbg.snapshot_file import SnapshotFile, save_snapshot
+from pydbg.symbolizer import Symbolizer
 from pydbg.systemdll import SystemDLL
 from pydbg.errors import PDError
 from pydbg.windows_h import (
@@ -75,12 +86,66 @@ from pydbg.defines import (
     MIB_UDPTABLE_OWNER_PID, AF_INET, UDP_TABLE_OWNER_PID,
     TCP_TABLE_OWNER_PID_ALL, PAGE_READONLY, PAGE_EXECUTE, PAGE_NOACCESS,
     PAGE_EXECUTE_READ, PAGE_EXECUTE_READWRITE, PAGE_EXECUTE_WRITECOPY,
-    PAGE_READWRITE, MEM_COMMIT, MEM_IMAGE, SYSDBG_MSR,
+    PAGE_READWRITE, PAGE_WRITECOPY, MEM_COMMIT, MEM_IMAGE, SYSDBG_MSR,
     SysDbgReadMsr, SysDbgWriteMsr, FORMAT_MESSAGE_ALLOCATE_BUFFER,
     FORMAT_MESSAGE_FROM_SYSTEM,
 )
 
 
+def needs_context(handler):
+    """
+    Declare that a debug event / exception handler requires the thread
+    context of the event. The context of every other event is only fetched
+    on first access to PyDBG.context.
+
+    @see: PyDBG.debug_event_iteration()
+    """
+
+    handler.needs_context = True
+    return handler
+
+
+def pure(method=None, memoize=False):
+    """
+    Declare that a PyDBG routine is a pure helper: it does not touch the
+    debuggee nor the debugger state, so clients may run it locally instead
+    of going over the network. Use @pure(memoize=True) on helpers whose
+    result only depends on hashable arguments.
+
+    @see: pure_methods()
+    """
+
+    def mark(method):
+        method.pure = True
+        method.memoize = memoize
+        return method
+
+    if method is None:
+        return mark
+
+    return mark(method)
+
+
+def pure_methods(cls):
+    """
+    @type  cls: Class object
+    @param cls: PyDBG or a subclass
+
+    @rtype:  Dictionary
+    @return: Name -> memoize flag of the routines of cls declared with @pure.
+    """
+
+    methods = {}
+
+    for name in dir(cls):
+        member = getattr(cls, name, None)
+
+        if getattr(member, 'pure', False):
+            methods[name] = member.memoize
+
+    return methods
+
+
 class PyDBG(object):
     """
     This class implements standard low level functionality including:
@@ -110,6 +175,27 @@ class PyDBG(object):
     STRING_EXPLORATON_BUF_SIZE = 256
     STRING_EXPLORATION_MIN_LENGTH = 2
     HW_SLOTS = {0, 1, 2, 3}
+    PAGE_CACHE_MAX_READ = 0x4000  # reads larger than this bypass the per-event page cache
+    READABLE_PROTECTIONS = (PAGE_READONLY | PAGE_READWRITE | PAGE_WRITECOPY |
+                            PAGE_EXECUTE_READ | PAGE_EXECUTE_READWRITE | PAGE_EXECUTE_WRITECOPY)
+
+    # debug event code -> name of the internal handler.
+    DEBUG_EVENT_HANDLERS = {
+        CREATE_PROCESS_DEBUG_EVENT: 'event_handler_create_process',
+        CREATE_THREAD_DEBUG_EVENT: 'event_handler_create_thread',
+        EXIT_PROCESS_DEBUG_EVENT: 'event_handler_exit_process',
+        EXIT_THREAD_DEBUG_EVENT: 'event_handler_exit_thread',
+        LOAD_DLL_DEBUG_EVENT: 'event_handler_load_dll',
+        UNLOAD_DLL_DEBUG_EVENT: 'event_handler_unload_dll',
+    }
+
+    # exception code -> name of the internal handler.
+    EXCEPTION_HANDLERS = {
+        EXCEPTION_ACCESS_VIOLATION: 'exception_handler_access_violation',
+        EXCEPTION_BREAKPOINT: 'exception_handler_breakpoint',
+        EXCEPTION_GUARD_PAGE: 'exception_handler_guard_page',
+        EXCEPTION_SINGLE_STEP: 'exception_handler_single_step',
+    }
 
     def __init__(self, ff=True, cs=False):
         """
@@ -123,9 +209,14 @@ class PyDBG(object):
         """
 
         # private variables, internal use only:
+        self._event_thread_id = None     # thread id of the debug event being handled
+        self._h_thread = None            # backs self.h_thread
+        self._context = None             # backs self.context
+        self._thread_handles = {}        # thread id -> (handle, owned), see _thread_handle()
         self._restore_breakpoint = None  # breakpoint to restore
         self._guarded_pages = set()      # specific pages we set PAGE_GUARD on
         self._guards_active = True       # flag specifying whether or not guard pages are active
+        self._coverage_breakpoints = set()  # addresses of pending one-shot coverage breakpoints
 
         self.page_size = 0   # memory page size (dynamically resolved at run-time)
         self.pid = 0         # debuggee's process id
@@ -136,10 +227,16 @@ class PyDBG(object):
         self.client_server = cs  # flag controlling whether or not pydbg is in client/server mode
         self.callbacks = {}    # exception callback handler dictionary
         self.system_dlls = []  # list of loaded system dlls
+        self.module_map = ModuleMap()  # modules mapped in the debuggee, maintained from load / unload events
+        self._system_dlls_by_base = {}  # module base -> entry of self.system_dlls, see addr_to_dll()
         self.dirty = False     # flag specifying that the memory space of the debuggee was modified
         self.system_break = None  # the address at which initial and forced breakpoints occur at
         self.peb = None  # process environment block address
         self.tebs = {}   # dictionary of thread IDs to thread environment block addresses
+        self.event_counts = collections.Counter()           # debug event / exception code -> times handled
+        self.event_times = collections.defaultdict(float)   # debug event / exception code -> seconds in handler
+        self.protection_aware_reads = True  # only flip page protections for reads of unreadable memory
+        self.counters = collections.Counter()  # internal API call counters, see read_process_memory(), open_thread()
 
         # internal variables specific to the last triggered exception.
         self.context = None  # thread context of offending thread
@@ -150,10 +247,14 @@ class PyDBG(object):
         self.exception_code = None     # from dbg.u.Exception.ExceptionRecord.ExceptionCode
 
         self.breakpoints = {}  # internal breakpoint dictionary, keyed by address
-        self.memory_breakpoints = {}        # internal memory breakpoint dictionary, keyed by base address
+        self.memory_breakpoints = MemBreakpointIndex()  # internal memory breakpoint dictionary, keyed by base address
         self.hardware_breakpoints = {}      # internal hardware breakpoint array, indexed by slot (0-3 inclusive)
         self.memory_snapshot_blocks = []    # list of memory blocks at time of memory snapshot
         self.memory_snapshot_contexts = []  # list of threads contexts at time of memory snapshot
+        self.snapshot_file = None           # SnapshotFile backing the memory snapshot, see process_snapshot_load()
+        self.last_restore = {}              # page counts and latency of the last process_restore()
+        self.coverage_addresses = array('L')  # coverage breakpoint addresses, in first-hit order
+        self.coverage_threads = array('L')    # id of the thread that hit each coverage breakpoint
 
         self.first_breakpoint = True    # this flag gets disabled once the windows initial break is handled
 
@@ -173,21 +274,96 @@ class PyDBG(object):
         self.op2 = None  # pydasm decoded 2nd operand, propagated by self.disasm()
         self.op3 = None  # pydasm decoded 3rd operand, propagated by self.disasm()
 
-        # control debug/error logging.
-        self._log = lambda msg: sys.stderr.write('[PDBG_LOG] {}\n'.format(msg))
-        self._err = lambda msg: sys.stderr.write('[PDBG_ERR] {}\n'.format(msg))
+        # control debug/error logging through self._log / self._err.
+        # messages are %-style format strings, formatted only if their level is enabled.
+        # hot call sites check self.logger.debug_enabled before building any argument.
+        self.logger = Logger()
 
         # determine the system page size.
         system_info = SYSTEM_INFO()
         kernel32.GetSystemInfo(byref(system_info))
         self.page_size = system_info.dwPageSize
 
+        # per debug event cache of debuggee memory, see read_process_memory().
+        self._page_cache = PageCache(self._read_process_memory, self.page_size)
+
+        # per debug event map of the debuggee address space, see virtual_query().
+        self._region_map = RegionMap(self.page_size)
+
+        # export indexes of the debuggee modules keyed by module base, see func_resolve_debuggee().
+        self._export_cache = ExportCache()
+
+        # address to module!export+offset resolution, module ranges are refreshed on module load / unload.
+        self._symbolizer = Symbolizer(self.read_process_memory, self._export_cache)
+        self._symbolizer_stale = True
+
+        # self.memory_breakpoints indexes its breakpoints by address and guarded page, see bp_is_ours_mem().
+        self.memory_breakpoints.page_size = self.page_size
+
         # Determine the system DbgBreakPoint address.
         # This is the address at which initial and forced breaks happen.
         # XXX - need to look into fixing this for pydbg client/server.
         self.system_break = self.func_resolve('ntdll.dll', 'DbgBreakPoint')
 
-        self._log('system page size is {}'.format(self.page_size))
+        self._log('system page size is %s', self.page_size)
+
+    @property
+    def context(self):
+        """
+        Thread context of the thread that triggered the current debug event,
+        fetched from the debuggee on first access.
+        """
+
+        if self._context is None and self._event_thread_id is not None:
+            self._context = self.get_thread_context(self.h_thread)
+
+        return self._context
+
+    @context.setter
+    def context(self, context):
+        self._context = context
+
+    @property
+    def h_thread(self):
+        """
+        Handle to the thread that triggered the current debug event,
+        resolved through the thread handle cache on first access.
+        """
+
+        if self._h_thread is None and self._event_thread_id is not None:
+            self._h_thread = self._thread_handle(self._event_thread_id)
+
+        return self._h_thread
+
+    @h_thread.setter
+    def h_thread(self, h_thread):
+        self._h_thread = h_thread
+
+    @property
+    def _log(self):
+        """
+        Debug log, taking a %-style format string and its arguments. Scripts may still
+        replace it with a routine of their own, ex: dbg._log = lambda msg: None, which is
+        then handed each message formatted.
+        """
+
+        return self.logger.debug
+
+    @_log.setter
+    def _log(self, hook):
+        self.logger.set_hook(LOG_DEBUG, hook)
+
+    @property
+    def _err(self):
+        """
+        Error log, see _log.
+        """
+
+        return self.logger.error
+
+    @_err.setter
+    def _err(self, hook):
+        self.logger.set_hook(LOG_ERROR, hook)
 
     def addr_to_dll(self, address):
         """
@@ -200,34 +376,26 @@ class PyDBG(object):
         @return: System DLL that contains the address specified or None if not found.
         """
 
-        for dll in self.system_dlls:
-            if dll.base < address < (dll.base + dll.size):
-                return dll
+        module = self.module_map.find(address)
 
-        return None
+        if not module:
+            return None
+
+        return self._system_dlls_by_base.get(module.base)
 
     def addr_to_module(self, address):
         """
-        Return the MODULEENTRY32 structure for the module that contains the address specified.
+        Return the record of the module that contains the address specified.
+        Records expose the MODULEENTRY32 field names (szModule, szExePath, modBaseAddr, modBaseSize) as aliases.
 
         @type  address: DWORD
         @param address: Address to search loaded module ranges for
 
-        @rtype:  MODULEENTRY32
-        @return: MODULEENTRY32 strucutre that contains the address specified or None if not found.
+        @rtype:  ModuleRecord
+        @return: Record of the module that contains the address specified or None if not found.
         """
 
-        found = None
-
-        for module in self.iterate_modules():
-            if module.modBaseAddr < address < module.modBaseAddr + module.modBaseSize:
-                # we have to make a copy of the 'module' since it is an iterator and will be blown away.
-                # the reason we can't "break" out of the loop is because there will be a handle leak.
-                # and we can't use enumerate_modules() because we need the entire module structure.
-                # so there...
-                found = copy.copy(module)
-
-        return found
+        return self.module_map.find(address)
 
     def attach(self, pid):
         """Attach to the specified process by PID
@@ -243,7 +411,7 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('attaching to pid {}'.format(pid))
+        self._log('attaching to pid %s', pid)
 
         # obtain necessary debug privileges.
         self.get_debug_privileges()
@@ -253,6 +421,9 @@ class PyDBG(object):
 
         self.debug_active_process(pid)
 
+        # initial sync of the module map, load / unload events keep it up to date from here on.
+        self.module_map.sync(ModuleRecord.from_entry(module) for module in self.iterate_modules())
+
         # allow detaching on systems that support it.
         try:
             self.debug_set_process_kill_on_exit(False)
@@ -262,7 +433,7 @@ class PyDBG(object):
 
         # enumerate the TEBs and add them to the internal dictionary.
         for thread_id in self.enumerate_threads():
-            thread_handle = self.open_thread(thread_id)
+            thread_handle = self._thread_handle(thread_id)
             thread_context = self.get_thread_context(thread_handle)
             selector_entry = LDT_ENTRY()
 
@@ -272,8 +443,6 @@ class PyDBG(object):
             if not success:
                 self.win32_error('GetThreadSelectorEntry()')
 
-            self.close_handle(thread_handle)
-
             teb = selector_entry.BaseLow
             teb += ((selector_entry.HighWord.Bits.BaseMid << 16)
                     + (selector_entry.HighWord.Bits.BaseHi << 24))
@@ -291,6 +460,8 @@ class PyDBG(object):
     def bp_del(self, address):
         """
         Removes the breakpoint from target address.
+        Lists of addresses are removed with a single read and write per spanned page and either all of the
+        breakpoints are removed or none of them are.
 
         @see: bp_set(), bp_del_all(), bp_is_ours()
 
@@ -302,15 +473,44 @@ class PyDBG(object):
         @return:    Self
         """
 
-        # if a list of addresses to remove breakpoints from was supplied.
+        # if a list of addresses to remove breakpoints from was supplied,
+        # restore the original bytes one page at a time.
         if isinstance(address, list):
-            # pass each lone address to ourself.
-            for addr in address:
-                self.bp_del(addr)
+            self._log('bp_del() %s addresses', len(address))
+
+            targets = [addr for addr in address if addr in self.breakpoints]
+            restored = []
+
+            try:
+                for (start, end, group) in self._group_by_page(targets):
+                    current = self.read_process_memory(start, end - start)
+                    data = bytearray(current)
+
+                    for addr in group:
+                        data[addr - start] = self.breakpoints[addr].original_byte[0]
+
+                    self.write_process_memory(start, bytes(data))
+                    self.set_attr('dirty', True)
+                    restored.append((start, current, group))
+            except:
+                # put the int3s back on every page we already restored.
+                for (start, current, group) in reversed(restored):
+                    try:
+                        self.write_process_memory(start, current)
+                    except:
+                        pass
+
+                raise PDError('Failed removing breakpoints at {} addresses'.format(len(targets)))
+
+            # remove the breakpoints from the internal list.
+            for (start, current, group) in restored:
+                for addr in group:
+                    del self.breakpoints[addr]
+                    self._coverage_breakpoints.discard(addr)
 
             return self.ret_self()
 
-        self._log('bp_del(0x{:08x})'.format(address))
+        self._log('bp_del(0x%08x)', address)
 
         # ensure a breakpoint exists at the target address.
         if address in self.breakpoints:
@@ -320,6 +520,7 @@ class PyDBG(object):
 
             # remove the breakpoint from the internal list.
             del self.breakpoints[address]
+            self._coverage_breakpoints.discard(address)
 
         return self.ret_self()
 
@@ -336,10 +537,7 @@ class PyDBG(object):
 
         self._log('bp_del_all()')
 
-        for bp in list(self.breakpoints):
-            self.bp_del(bp)
-
-        return self.ret_self()
+        return self.bp_del(list(self.breakpoints))
 
     def bp_del_hw(self, address=None, slot=None):
         """
@@ -444,44 +642,24 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('bp_del_mem(0x{:08x})'.format(address))
+        self._log('bp_del_mem(0x%08x)', address)
 
         # ensure a memory breakpoint exists at the target address.
         if address not in self.memory_breakpoints:
             return self.ret_self()
 
-        size = self.memory_breakpoints[address].size
         mbi = self.memory_breakpoints[address].mbi
 
-        # remove the memory breakpoint from our internal list.
-        del self.memory_breakpoints[address]
-
-        # page-aligned target memory range.
-        start = mbi.BaseAddress
-        end = address + size    # non page-aligned range end
-        end = end + self.page_size - (end % self.page_size)   # page-aligned range end
-
-        # for each page in the target range, restore
-        # the original page permissions if no other breakpoint exists.
-        for page in range(start, end, self.page_size):
-            other_bp_found = False
-
-            for mem_bp in self.memory_breakpoints.values():
-                if page <= mem_bp.address < page + self.page_size:
-                    other_bp_found = True
-                    break
-                if page <= mem_bp.address + size < page + self.page_size:
-                    other_bp_found = True
-                    break
-
-            if not other_bp_found:
-                try:
-                    self.virtual_protect(page, 1, mbi.Protect & ~PAGE_GUARD)
+        # remove the memory breakpoint from our internal list and, for each page
+        # in the target range that no other breakpoint spans, restore the original page permissions.
+        for page in self.memory_breakpoints.remove(address):
+            try:
+                self.virtual_protect(page, 1, mbi.Protect & ~PAGE_GUARD)
 
-                    # remove the page from the set of tracked GUARD pages.
-                    self._guarded_pages.remove(mbi.BaseAddress)
-                except:
-                    pass
+                # remove the page from the set of tracked GUARD pages.
+                self._guarded_pages.discard(page)
+            except:
+                pass
 
         return self.ret_self()
 
@@ -538,13 +716,12 @@ class PyDBG(object):
                  or False if address falls outside range.
         """
 
-        for address in self.memory_breakpoints:
-            size = self.memory_breakpoints[address].size
+        address = self.memory_breakpoints.find(address_to_check)
 
-            if address <= address_to_check <= address + size:
-                return address
+        if address is None:
+            return False
 
-        return False
+        return address
 
     def bp_set(self, address, description="", restore=True, handler=None):
         """Sets a breakpoint at the designated address.
@@ -552,7 +729,8 @@ class PyDBG(object):
         Register an EXCEPTION_BREAKPOINT callback handler to catch
         breakpoint events. If a list of addresses is submitted to this routine
         then the entire list of new breakpoints get the same description and
-        restore.
+        restore. Lists are installed with a single read and write per spanned
+        page and either all of the breakpoints are set or none of them are.
         The optional "handler" parameter can be used to identify a function to
         specifically handle the specified bp, as opposed to the generic
         bp callback handler. The prototype of the callback routines is::
@@ -577,15 +755,11 @@ class PyDBG(object):
         """
 
         # If a list of addresses to set breakpoints on from was supplied
+        # (each one gets the same description / restore flag).
         if isinstance(address, list):
-            # Pass each lone address to ourselves
-            # (each one gets the same description / restore flag).
-            for addr in address:
-                self.bp_set(addr, description, restore, handler)
+            return self._bp_set_bulk(address, description, restore, handler)
 
-            return self.ret_self()
-
-        self._log('bp_set(0x{:08x})'.format(address))
+        self._log('bp_set(0x%08x)', address)
 
         # Ensure a breakpoint doesn't already exist at the target address.
         if address not in self.breakpoints:
@@ -594,7 +768,7 @@ class PyDBG(object):
                 original_byte = self.read_process_memory(address, 1)
 
                 # write an int3 into the target process space.
-                self.write_process_memory(address, '\xCC')
+                self.write_process_memory(address, b'\xCC')
                 self.set_attr('dirty', True)
 
                 # add the breakpoint to the internal list.
@@ -605,6 +779,111 @@ class PyDBG(object):
 
         return self.ret_self()
 
+    def bp_set_coverage(self, address):
+        """
+        Sets one-shot coverage breakpoints at the designated address or list of addresses.
+
+        Coverage breakpoints are handled internally and never reach
+        the registered callbacks. The first hit of each breakpoint is appended
+        to self.coverage_addresses (and the id of the hitting thread to
+        self.coverage_threads), after which the original byte is restored
+        and execution resumes without the single step restore cycle.
+
+        @see: coverage_bitmap(), coverage_reset(), bp_del()
+
+        @type  address: DWORD or List
+        @param address: Address or list of addresses to record coverage at
+
+        @raise PDError: An exception is raised on failure.
+        @rtype:     PyDBG
+        @return:    Self
+        """
+
+        if not isinstance(address, list):
+            address = [address]
+
+        addresses = [addr for addr in address if addr not in self.breakpoints]
+
+        self._bp_set_bulk(addresses, 'coverage', False, None)
+        self._coverage_breakpoints.update(addresses)
+
+        return self.ret_self()
+
+    def _bp_set_bulk(self, addresses, description, restore, handler):
+        """
+        Set breakpoints on a list of addresses, reading and writing each
+        spanned page once instead of once per breakpoint. Either every
+        breakpoint is set or, on failure, every patched page is restored
+        and none of the breakpoints is recorded.
+
+        @see: bp_set()
+
+        @raise PDError: An exception is raised on failure.
+        @rtype:     PyDBG
+        @return:    Self
+        """
+
+        self._log('bp_set() %s addresses', len(addresses))
+
+        targets = [addr for addr in addresses if addr not in self.breakpoints]
+        patched = []
+
+        try:
+            for (start, end, group) in self._group_by_page(targets):
+                # save the original bytes at the requested breakpoint addresses.
+                original = self.read_process_memory(start, end - start)
+                data = bytearray(original)
+
+                # write an int3 at each breakpoint address in the local copy.
+                for addr in group:
+                    data[addr - start] = 0xCC
+
+                self.write_process_memory(start, bytes(data))
+                self.set_attr('dirty', True)
+                patched.append((start, original, group))
+        except:
+            # roll back every page we already patched.
+            for (start, original, group) in reversed(patched):
+                try:
+                    self.write_process_memory(start, original)
+                except:
+                    pass
+
+            raise PDError('Failed setting breakpoints at {} addresses'.format(len(targets)))
+
+        # add the breakpoints to the internal list.
+        for (start, original, group) in patched:
+            for addr in group:
+                self.breakpoints[addr] = Breakpoint(addr, original[addr - start:addr - start + 1],
+                                                    description, restore, handler)
+
+        return self.ret_self()
+
+    def _group_by_page(self, addresses):
+        """
+        Group addresses by the page they live on.
+
+        @type  addresses: List
+        @param addresses: Addresses to group, in any order
+
+        @rtype:  Generator
+        @return: (start, end, addresses) tuples, one per page, where [start, end)
+                 is the smallest range of the page covering the sorted addresses.
+        """
+
+        addresses = sorted(set(addresses))
+        group = []
+
+        for addr in addresses:
+            if group and addr - addr % self.page_size != group[0] - group[0] % self.page_size:
+                yield (group[0], group[-1] + 1, group)
+                group = []
+
+            group.append(addr)
+
+        if group:
+            yield (group[0], group[-1] + 1, group)
+
     def bp_set_hw(self, address, length, condition,
                   description="", restore=True, handler=None):
         """Sets a hardware breakpoint at the designated address.
@@ -651,7 +930,7 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('bp_set_hw(0x{:08x}, {}, {})'.format(address, length, condition))
+        self._log('bp_set_hw(0x%08x, %s, %s)', address, length, condition)
 
         # Instantiate a new hardware breakpoint object for the new bp to create.
         hw_bp = HwBreakpoint(address, length, condition,
@@ -769,11 +1048,11 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('bp_set_mem() buffer range is 0x{:08x} - 0x{:08x}'.format(address, address + size))
+        self._log('bp_set_mem() buffer range is 0x%08x - 0x%08x', address, address + size)
 
         # ensure the target address doesn't already sit in a memory breakpoint range:
         if self.bp_is_ours_mem(address):
-            self._log('a memory breakpoint spanning 0x{:08x} already exists'.format(address))
+            self._log('a memory breakpoint spanning 0x%08x already exists', address)
             return self.ret_self()
 
         # determine the base address of the page containing the starting point of our buffer.
@@ -782,7 +1061,7 @@ class PyDBG(object):
         except:
             raise PDError('bp_set_mem(): failed querying address: 0x{:08x}'.format(address))
 
-        self._log('buffer starting at 0x{:08x} sits on page starting at 0x{:08x}'.format(address, mbi.BaseAddress))
+        self._log('buffer starting at 0x%08x sits on page starting at 0x%08x', address, mbi.BaseAddress)
 
         # Individually change the page permissions for each page our buffer spans.
         # Why do we individually set the page permissions of each page
@@ -792,21 +1071,18 @@ class PyDBG(object):
         # is dropped for the entire range of pages that was originally modified.
         # This is undesirable for our purposes when it comes to the ease of
         # restoring hit memory breakpoints.
-        current_page = mbi.BaseAddress
+        breakpoint = MemBreakpoint(address, size, mbi, description, handler)
 
-        while current_page <= address + size:
-            self._log('changing page permissions on 0x{:08x}'.format(current_page))
+        for current_page in self.memory_breakpoints.span(breakpoint):
+            self._log('changing page permissions on 0x%08x', current_page)
 
             # Keep track of explicitly guarded pages,
             # to differentiate from pages guarded by the debuggee / OS.
             self._guarded_pages.add(current_page)
             self.virtual_protect(current_page, 1, mbi.Protect | PAGE_GUARD)
 
-            current_page += self.page_size
-
-        # add the breakpoint to the internal list.
-        self.memory_breakpoints[address] = MemBreakpoint(address, size, mbi,
-                                                         description, handler)
+        # add the breakpoint to the internal list, which indexes the pages it spans.
+        self.memory_breakpoints[address] = breakpoint
 
         return self.ret_self()
 
@@ -821,8 +1097,52 @@ class PyDBG(object):
         @return: Return value from CloseHandle().
         """
 
+        self.counters['close_handle'] += 1
+
         return kernel32.CloseHandle(handle)
 
+    def coverage_bitmap(self, base, size):
+        """
+        Export the recorded coverage as a bitmap relative to a module base.
+        Bit N (bit N % 8 of byte N // 8) is set if the coverage breakpoint
+        at base + N was hit.
+
+        @see: bp_set_coverage(), coverage_reset()
+
+        @type  base: DWORD
+        @param base: Base address of the module (or range) to export
+        @type  size: Integer
+        @param size: Size of the module (or range) to export
+
+        @rtype:  Bytearray
+        @return: Coverage bitmap of (size + 7) // 8 bytes.
+        """
+
+        bitmap = bytearray((size + 7) // 8)
+
+        for address in self.coverage_addresses:
+            offset = address - base
+
+            if 0 <= offset < size:
+                bitmap[offset >> 3] |= 1 << (offset & 7)
+
+        return bitmap
+
+    def coverage_reset(self):
+        """
+        Forget the recorded coverage hits. Pending coverage breakpoints are left in place.
+
+        @see: bp_set_coverage(), coverage_bitmap()
+
+        @rtype:     PyDBG
+        @return:    Self
+        """
+
+        self.coverage_addresses = array('L')
+        self.coverage_threads = array('L')
+
+        return self.ret_self()
+
     def dbg_print_all_debug_registers(self):
         """
         *** DEBUG ROUTINE ***
@@ -851,30 +1171,12 @@ class PyDBG(object):
         It was too useful to be removed from the release code.
         """
 
-        cursor = 0
-
         # scan through the entire memory range.
-        while cursor < 0xFFFFFFFF:
-            try:
-                mbi = self.virtual_query(cursor)
-            except:
-                break
-
-            if mbi.Protect & PAGE_GUARD:
-                address = mbi.BaseAddress
-                print('PAGE GUARD on 0x{:08x}'.format(mbi.BaseAddress))
-
-                while True:
-                    address += self.page_size
-                    tmp_mbi = self.virtual_query(address)
-
-                    if not tmp_mbi.Protect & PAGE_GUARD:
-                        break
-
+        for region in self.memory_regions():
+            if region.protect & PAGE_GUARD:
+                for address in range(region.base, region.end, self.page_size):
                     print('PAGE GUARD on 0x{:08x}'.format(address))
 
-            cursor += mbi.RegionSize
-
     def debug_active_process(self, pid):
         """
         Convenience wrapper around GetLastError() and FormatMessage().
@@ -893,6 +1195,10 @@ class PyDBG(object):
     def debug_event_iteration(self):
         """
         Check for and process a debug event.
+        Events are dispatched through DEBUG_EVENT_HANDLERS / EXCEPTION_HANDLERS.
+        The number of events handled and the cumulative time spent in their
+        handlers are kept per event (or exception) code in self.event_counts
+        and self.event_times.
         """
 
         continue_status = DBG_CONTINUE
@@ -900,57 +1206,58 @@ class PyDBG(object):
 
         # wait for a debug event.
         if kernel32.WaitForDebugEvent(byref(dbg), 100):
+            # the debuggee is stopped until we continue the event,
+            # so its memory can be safely cached in the mean time.
+            self._page_cache.enable()
+            self._region_map.enable()
+
             # grab various information with regards to the current exception.
-            self.h_thread = self.open_thread(dbg.dwThreadId)
-            self.context = self.get_thread_context(self.h_thread)
+            # the thread handle and context are only fetched on first access,
+            # or up front for handlers declared with @needs_context.
+            self._event_thread_id = dbg.dwThreadId
+            self._h_thread = None
+            self._context = None
             self.dbg = dbg
             self.exception_address = dbg.u.Exception.ExceptionRecord.ExceptionAddress
             self.write_violation = dbg.u.Exception.ExceptionRecord.ExceptionInformation[0]
             self.violation_address = dbg.u.Exception.ExceptionRecord.ExceptionInformation[1]
             self.exception_code = dbg.u.Exception.ExceptionRecord.ExceptionCode
 
-            if dbg.dwDebugEventCode == CREATE_PROCESS_DEBUG_EVENT:
-                continue_status = self.event_handler_create_process()
+            # an exception was caught.
+            if dbg.dwDebugEventCode == EXCEPTION_DEBUG_EVENT:
+                code = self.exception_code
+                handler_name = self.EXCEPTION_HANDLERS.get(code)
 
-            elif dbg.dwDebugEventCode == CREATE_THREAD_DEBUG_EVENT:
-                continue_status = self.event_handler_create_thread()
+                if self.logger.debug_enabled:
+                    self._log('debug_event_loop() exception: 0x%08x', code)
+            else:
+                code = dbg.dwDebugEventCode
+                handler_name = self.DEBUG_EVENT_HANDLERS.get(code)
 
-            elif dbg.dwDebugEventCode == EXIT_PROCESS_DEBUG_EVENT:
-                continue_status = self.event_handler_exit_process()
+            started = time.perf_counter()
 
-            elif dbg.dwDebugEventCode == EXIT_THREAD_DEBUG_EVENT:
-                continue_status = self.event_handler_exit_thread()
+            # call the internal handler for the event that just occured.
+            if handler_name:
+                handler = getattr(self, handler_name)
 
-            elif dbg.dwDebugEventCode == LOAD_DLL_DEBUG_EVENT:
-                continue_status = self.event_handler_load_dll()
+                if getattr(handler, 'needs_context', False):
+                    self.context = self.get_thread_context(self.h_thread)
 
-            elif dbg.dwDebugEventCode == UNLOAD_DLL_DEBUG_EVENT:
-                continue_status = self.event_handler_unload_dll()
+                continue_status = handler()
 
-            # an exception was caught.
             elif dbg.dwDebugEventCode == EXCEPTION_DEBUG_EVENT:
-                ec = dbg.u.Exception.ExceptionRecord.ExceptionCode
-
-                self._log('debug_event_loop() exception: 0x{:08x}'.format(ec))
-
-                # call the internal handler for the exception event that just occured.
-                if ec == EXCEPTION_ACCESS_VIOLATION:
-                    continue_status = self.exception_handler_access_violation()
-                elif ec == EXCEPTION_BREAKPOINT:
-                    continue_status = self.exception_handler_breakpoint()
-                elif ec == EXCEPTION_GUARD_PAGE:
-                    continue_status = self.exception_handler_guard_page()
-                elif ec == EXCEPTION_SINGLE_STEP:
-                    continue_status = self.exception_handler_single_step()
                 # generic callback support.
-                elif ec in self.callbacks:
-                    continue_status = self.callbacks[ec](self)
+                if code in self.callbacks:
+                    continue_status = self.callbacks[code](self)
                 # unhandled exception.
                 else:
-                    self._log('TID:0x{:04x} caused an unhandled exception'
-                              ' (0x{:08x}) at 0x{:08x}'.format(self.dbg.dwThreadId, ec, self.exception_address))
+                    self._log('TID:0x%04x caused an unhandled exception (0x%08x) at 0x%08x',
+                              self.dbg.dwThreadId, code, self.exception_address)
                     continue_status = DBG_EXCEPTION_NOT_HANDLED
 
+            self.event_counts[code] += 1
+            self.event_times[code] += time.perf_counter() - started
+
             # If the memory space of the debuggee was tainted, flush the instruction cache.
             # from MSDN: Applications should call FlushInstructionCache
             #            if they generate or modify code in memory.
@@ -959,9 +1266,11 @@ class PyDBG(object):
             if self.dirty:
                 kernel32.FlushInstructionCache(self.h_process, 0, 0)
 
-            # Close the opened thread handle and resume executing the thread
-            # that triggered the debug event.
-            self.close_handle(self.h_thread)
+            # resume executing the thread that triggered the debug event. its handle
+            # stays in the thread handle cache until the thread exits.
+            self._event_thread_id = None
+            self._page_cache.disable()
+            self._region_map.disable()
             kernel32.ContinueDebugEvent(dbg.dwProcessId, dbg.dwThreadId, continue_status)
 
     def debug_event_loop(self):
@@ -1001,7 +1310,12 @@ class PyDBG(object):
             if def_sigint_handler:
                 signal.signal(signal.SIGINT, def_sigint_handler)
 
-        # close the global process handle.
+        # close the cached thread handles and the global process handle.
+        self._release_thread_handles()
+        self.module_map.clear()
+        self._export_cache.clear()
+        self._symbolizer.clear()
+        self._symbolizer_stale = True
         self.close_handle(self.h_process)
 
     def debug_set_process_kill_on_exit(self, kill_on_exit):
@@ -1018,6 +1332,30 @@ class PyDBG(object):
         if not kernel32.DebugSetProcessKillOnExit(kill_on_exit):
             raise PDError("DebugActiveProcess(%s)" % kill_on_exit, True)
 
+    def default_continue_status(self):
+        """
+        Continue status the default handlers use for the current event when no callback is registered
+        for it. The server continues the events a client filtered out with it.
+
+        @rtype:  DWORD
+        @return: Debug event continue status.
+        """
+
+        # debug events and user callback events.
+        if not self.dbg or self.dbg.dwDebugEventCode != EXCEPTION_DEBUG_EVENT:
+            return DBG_CONTINUE
+
+        # callbacks are only reached for the system breakpoint and for our own breakpoints and guarded pages.
+        if self.exception_code in (EXCEPTION_BREAKPOINT, EXCEPTION_GUARD_PAGE):
+            return DBG_CONTINUE
+
+        # single step we took to restore a breakpoint.
+        if self.exception_code == EXCEPTION_SINGLE_STEP and self._restore_breakpoint:
+            return DBG_CONTINUE
+
+        # access violations and any other exception are the debuggee's to handle.
+        return DBG_EXCEPTION_NOT_HANDLED
+
     def detach(self):
         """
         Detach from debuggee.
@@ -1038,6 +1376,11 @@ class PyDBG(object):
         # if the API is available on the current platform.
         kernel32.DebugActiveProcessStop(self.pid)
 
+        self._release_thread_handles()
+        self.module_map.clear()
+        self._export_cache.clear()
+        self._symbolizer.clear()
+        self._symbolizer_stale = True
         self.set_debugger_active(False)
         return self.ret_self()
 
@@ -1395,8 +1738,21 @@ class PyDBG(object):
 
         self._log('event_handler_create_process()')
 
-        # don't need this.
-        self.close_handle(self.dbg.u.CreateProcessInfo.hFile)
+        base = self.dbg.u.CreateProcessInfo.lpBaseOfImage or 0
+
+        # the image file handle is only needed to resolve the image name, SystemDLL closes it.
+        try:
+            image = SystemDLL(self.dbg.u.CreateProcessInfo.hFile, base)
+        except PDError:
+            self.close_handle(self.dbg.u.CreateProcessInfo.hFile)
+        else:
+            self.module_map.add(ModuleRecord(image.name, image.path, base, self._image_size(base, image.size)))
+            del image
+
+        # the initial thread handle is owned by the system and
+        # remains valid until the thread exits, cache it.
+        self._release_thread_handle(self.dbg.dwThreadId)
+        self._thread_handles[self.dbg.dwThreadId] = (self.dbg.u.CreateProcessInfo.hThread, False)
 
         if not self.follow_forks:
             return DBG_CONTINUE
@@ -1414,11 +1770,16 @@ class PyDBG(object):
         @return: Debug event continue status.
         """
 
-        self._log('event_handler_create_thread({})'.format(self.dbg.dwThreadId))
+        self._log('event_handler_create_thread(%s)', self.dbg.dwThreadId)
 
         # resolve the newly created threads TEB and add it to the internal dictionary.
         thread_id = self.dbg.dwThreadId
         thread_handle = self.dbg.u.CreateThread.hThread
+
+        # the handle is owned by the system and remains valid until the thread exits, cache it.
+        self._release_thread_handle(thread_id)
+        self._thread_handles[thread_id] = (thread_handle, False)
+
         thread_context = self.get_thread_context(thread_handle)
         selector_entry = LDT_ENTRY()
 
@@ -1473,9 +1834,17 @@ class PyDBG(object):
         self.set_debugger_active(False)
 
         if EXIT_PROCESS_DEBUG_EVENT in self.callbacks:
-            return self.callbacks[EXIT_PROCESS_DEBUG_EVENT](self)
+            continue_status = self.callbacks[EXIT_PROCESS_DEBUG_EVENT](self)
+        else:
+            continue_status = DBG_CONTINUE
 
-        return DBG_CONTINUE
+        self._release_thread_handles()
+        self.module_map.clear()
+        self._export_cache.clear()
+        self._symbolizer.clear()
+        self._symbolizer_stale = True
+
+        return continue_status
 
     def event_handler_exit_thread(self):
         """
@@ -1496,6 +1865,10 @@ class PyDBG(object):
         if self.dbg.dwThreadId in self.tebs:
             del(self.tebs[self.dbg.dwThreadId])
 
+        # the thread id may be reused, drop its cached handle.
+        self._release_thread_handle(self.dbg.dwThreadId)
+        self._h_thread = None
+
         return continue_status
 
     def event_handler_load_dll(self):
@@ -1516,6 +1889,13 @@ class PyDBG(object):
 
         dll = SystemDLL(self.dbg.u.LoadDll.hFile, self.dbg.u.LoadDll.lpBaseOfDll)
         self.system_dlls.append(dll)
+        self._system_dlls_by_base[dll.base] = dll
+        self.module_map.add(ModuleRecord(dll.name, dll.path, dll.base, self._image_size(dll.base, dll.size)))
+
+        # whatever used to live at this base is gone.
+        self._export_cache.drop(dll.base)
+        self._symbolizer.drop(dll.base)
+        self._symbolizer_stale = True
 
         if LOAD_DLL_DEBUG_EVENT in self.callbacks:
             return self.callbacks[LOAD_DLL_DEBUG_EVENT](self)
@@ -1554,10 +1934,17 @@ class PyDBG(object):
 
             # remove the system dll from the internal list.
             self.system_dlls.remove(unloading)
+            self._system_dlls_by_base.pop(base, None)
             del(unloading)
 
+        self.module_map.remove(base)
+        self._export_cache.drop(base)
+        self._symbolizer.drop(base)
+        self._symbolizer_stale = True
+
         return continue_status
 
+    @needs_context
     def exception_handler_access_violation(self):
         """
         This is the default EXCEPTION_ACCESS_VIOLATION handler.
@@ -1576,6 +1963,7 @@ class PyDBG(object):
 
         return DBG_EXCEPTION_NOT_HANDLED
 
+    @needs_context
     def exception_handler_breakpoint(self):
         """
         This is the default EXCEPTION_BREAKPOINT handler,
@@ -1586,7 +1974,12 @@ class PyDBG(object):
         @return: Debug event continue status.
         """
 
-        self._log('pydbg.exception_handler_breakpoint() at 0x{:08x} from thread id {}'.format(self.exception_address, self.dbg.dwThreadId))
+        if self.logger.debug_enabled:
+            self._log('pydbg.exception_handler_breakpoint() at 0x%08x from thread id %s', self.exception_address, self.dbg.dwThreadId)
+
+        # one-shot coverage breakpoints.
+        if self.exception_address in self._coverage_breakpoints:
+            return self._exception_handler_coverage()
 
         # breakpoints we did not set.
         if not self.bp_is_ours(self.exception_address):
@@ -1599,18 +1992,18 @@ class PyDBG(object):
                     continue_status = DBG_CONTINUE
 
                 if self.first_breakpoint:
-                    self._log('first windows driven system breakpoint at 0x{:08x}'.format(self.exception_address))
+                    self._log('first windows driven system breakpoint at 0x%08x', self.exception_address)
                     self.first_breakpoint = False
 
             # ignore all other breakpoints we didn't explicitly set.
             else:
-                self._log('breakpoint not ours 0x{:08x}'.format(self.exception_address))
+                self._log('breakpoint not ours 0x%08x', self.exception_address)
                 continue_status = DBG_EXCEPTION_NOT_HANDLED
 
         # breakpoints we did set.
         else:
             # restore the original byte at the breakpoint address.
-            self._log('restoring original byte at 0x{:08x}'.format(self.exception_address))
+            self._log('restoring original byte at 0x%08x', self.exception_address)
             self.write_process_memory(self.exception_address, self.breakpoints[self.exception_address].original_byte)
             self.set_attr('dirty', True)
 
@@ -1650,6 +2043,35 @@ class PyDBG(object):
 
         return continue_status
 
+    def _exception_handler_coverage(self):
+        """
+        Record the hit of a one-shot coverage breakpoint and remove it.
+        The EIP rewind is applied to the context fetched for this debug event,
+        so no further GetThreadContext() or single step is required.
+
+        @see: bp_set_coverage()
+
+        @rtype:  DWORD
+        @return: Debug event continue status.
+        """
+
+        address = self.exception_address
+        bp = self.breakpoints.pop(address)
+        self._coverage_breakpoints.discard(address)
+
+        self.coverage_addresses.append(address)
+        self.coverage_threads.append(self.dbg.dwThreadId)
+
+        # restore the original byte and rewind EIP over the INT 3.
+        self.write_process_memory(address, bp.original_byte)
+        self.set_attr('dirty', True)
+
+        self.context.Eip = address
+        self.set_thread_context(self.context)
+
+        return DBG_CONTINUE
+
+    @needs_context
     def exception_handler_guard_page(self):
         """
         This is the default EXCEPTION_GUARD_PAGE handler,
@@ -1676,12 +2098,12 @@ class PyDBG(object):
 
         # grab the actual memory breakpoint object, for the hit breakpoint.
         if self.memory_breakpoint_hit:
-            self._log('direct hit on memory breakpoint at 0x{:08x}'.format(self.memory_breakpoint_hit))
+            self._log('direct hit on memory breakpoint at 0x%08x', self.memory_breakpoint_hit)
 
         if self.write_violation:
-            self._log('write violation from 0x{:08x} on 0x{:08x} of mem bp'.format(self.exception_address, self.violation_address))
+            self._log('write violation from 0x%08x on 0x%08x of mem bp', self.exception_address, self.violation_address)
         else:
-            self._log('read violation from 0x{:08x} on 0x{:08x} of mem bp'.format(self.exception_address, self.violation_address))
+            self._log('read violation from 0x%08x on 0x%08x of mem bp', self.exception_address, self.violation_address)
 
         # if there is a specific handler registered for this bp,
         # pass control to it.
@@ -1707,6 +2129,7 @@ class PyDBG(object):
 
         return continue_status
 
+    @needs_context
     def exception_handler_single_step(self):
         """
         This is the default EXCEPTION_SINGLE_STEP handler,
@@ -1725,18 +2148,18 @@ class PyDBG(object):
 
             # restore a soft breakpoint.
             if isinstance(bp, Breakpoint):
-                self._log('restoring breakpoint at 0x{:08x}'.format(bp.address))
+                self._log('restoring breakpoint at 0x%08x', bp.address)
                 self.bp_set(bp.address, bp.description, bp.restore, bp.handler)
 
             # restore PAGE_GUARD for a memory breakpoint
             # (make sure guards are not temporarily suspended).
             elif isinstance(bp, MemBreakpoint) and self._guards_active:
-                self._log('restoring 0x{:08x} +PAGE_GUARD on page based @ 0x{:08x}'.format(bp.mbi.Protect, bp.mbi.BaseAddress))
+                self._log('restoring 0x%08x +PAGE_GUARD on page based @ 0x%08x', bp.mbi.Protect, bp.mbi.BaseAddress)
                 self.virtual_protect(bp.mbi.BaseAddress, 1, bp.mbi.Protect | PAGE_GUARD)
 
             # restore a hardware breakpoint.
             elif isinstance(bp, HwBreakpoint):
-                self._log('restoring hardware breakpoint on 0x{:08x}'.format(bp.address))
+                self._log('restoring hardware breakpoint on 0x%08x', bp.address)
                 self.bp_set_hw(bp.address, bp.length, bp.condition, bp.description, bp.restore, bp.handler)
 
         # Determine if this single step event occured in reaction to
@@ -1833,7 +2256,9 @@ class PyDBG(object):
         a given module / function name pair under the context of the debuggee.
 
         Note: Be weary of calling this function from within a LOAD_DLL handler
-        as the module is not yet fully loaded and therefore the snapshot will not include it.
+        as the module is not yet fully loaded and its export table may not be readable yet.
+
+        The export table of each module is parsed once and cached, see pydbg.pe_exports.ExportIndex.
 
         @author: Otto Ebeling
         @see:    func_resolve()
@@ -1858,67 +2283,21 @@ class PyDBG(object):
         if not dll_name.count('.'):
             dll_name += '.dll'
 
-        for module in self.iterate_modules():
-            if module.szModule.lower() == dll_name:
-                base_address = module.modBaseAddr
-                dos_header = self.read_process_memory(base_address, 0x40)
-
-                # Check validity of DOS header
-                if len(dos_header) != 0x40 or dos_header[:2] != 'MZ':
-                    continue
-
-                e_lfanew = struct.unpack('<I', dos_header[0x3c:0x40])[0]
-                pe_headers = self.read_process_memory(base_address + e_lfanew, 0xF8)
-
-                # Check validity of PE headers
-                if len(pe_headers) != 0xF8 or pe_headers[:2] != 'PE':
-                    continue
+        module = self.module_map.find_name(dll_name)
 
-                export_directory_rva = struct.unpack('<I', pe_headers[0x78:0x7C])[0]
-                export_directory_len = struct.unpack('<I', pe_headers[0x7C:0x80])[0]
-                export_directory = self.read_process_memory(base_address + export_directory_rva, export_directory_len)
-                num_of_functions = struct.unpack('<I', export_directory[0x14:0x18])[0]
-                num_of_names = struct.unpack('<I', export_directory[0x18:0x1C])[0]
-                address_of_functions = struct.unpack('<I', export_directory[0x1C:0x20])[0]
-                address_of_names = struct.unpack('<I', export_directory[0x20:0x24])[0]
-                address_of_ordinals = struct.unpack('<I', export_directory[0x24:0x28])[0]
-                name_table = self.read_process_memory(base_address + address_of_names, num_of_names * 4)
-
-                # Perform a binary search across the function names.
-                low = 0
-                high = num_of_names
-
-                while low <= high:
-                    # Python does not suffer from integer overflows:
-                    # http://googleresearch.blogspot.com/2006/06/extra-extra-read-all-about-it-nearly.html
-                    middle = (low + high) / 2
-                    current_address = base_address + struct.unpack('<I', name_table[middle*4:(middle+1)*4])[0]
-
-                    # We use a crude approach here:
-                    # Read 256 bytes and cut on NULL char. not very beautiful,
-                    # but reading 1 byte at a time is very slow.
-                    name_buffer = self.read_process_memory(current_address, 256)
-                    name_buffer = name_buffer[:name_buffer.find('\0')]
-
-                    if name_buffer < func_name:
-                        low = middle + 1
-                    elif name_buffer > func_name:
-                        high = middle - 1
-                    else:
-                        # MSFT documentation is misleading - see http://www.bitsum.com/pedocerrors.htm
-                        bin_ordinal = self.read_process_memory(base_address + address_of_ordinals + middle * 2, 2)
-                        ordinal = struct.unpack('<H', bin_ordinal)[0]   # ordinalBase has already been subtracted
-                        bin_func_address = self.read_process_memory(base_address + address_of_functions + ordinal * 4, 4)
-                        function_address = struct.unpack('<I', bin_func_address)[0]
-
-                        return base_address + function_address
+        if not module:
+            # module was not found.
+            return None
 
-                # function was not found.
-                return None
+        # the export index is built once per module and dropped when the module unloads.
+        try:
+            exports = self._export_cache.get(self.read_process_memory, module.base)
+        except PDError:
+            return None
 
-        # module was not found.
-        return None
+        return exports.resolve(func_name)
 
+    @pure
     def get_ascii_string(self, data):
         """
         Retrieve the ASCII string, if any, from data.
@@ -2039,6 +2418,7 @@ class PyDBG(object):
 
         return pydasm.get_instruction(data, pydasm.MODE_32)
 
+    @pure
     def get_printable_string(self, data, print_dots=True):
         """
         description
@@ -2074,7 +2454,8 @@ class PyDBG(object):
         @return:    Value of specified register.
         """
 
-        self._log('getting {} in thread id {}'.format(register, self.dbg.dwThreadId))
+        if self.logger.debug_enabled:
+            self._log('getting %s in thread id %s', register, self.dbg.dwThreadId)
 
         # TODO: Need to refactor this code
         register = register.upper()
@@ -2151,19 +2532,16 @@ class PyDBG(object):
 
         # if a thread handle was not specified, get one from the thread id.
         if not thread_handle:
-            h_thread = self.open_thread(thread_id)
+            h_thread = self._thread_handle(thread_id)
         else:
             h_thread = thread_handle
 
         if not kernel32.GetThreadContext(h_thread, byref(context)):
             raise PDError('GetThreadContext()', True)
 
-        # if we had to resolve the thread handle, close it.
-        if not thread_handle:
-            self.close_handle(h_thread)
-
         return context
 
+    @pure
     def get_unicode_string(self, data):
         """
         description
@@ -2193,6 +2571,7 @@ class PyDBG(object):
 
         return discovered
 
+    @pure
     def hex_dump(self, data, addr=0, prefix=""):
         """
         Utility function that converts data into hex dump format.
@@ -2277,6 +2656,25 @@ class PyDBG(object):
 
         return self.ret_self()
 
+    def _image_size(self, base, default=0):
+        """
+        Read SizeOfImage from the PE headers of the module loaded at the specified base.
+
+        @type  base:    DWORD
+        @param base:    Module base address
+        @type  default: Integer
+        @param default: (Optional, def=0) Size to fall back on if the headers can not be read
+
+        @rtype:  Integer
+        @return: Size of the module image in memory.
+        """
+
+        try:
+            e_lfanew = struct.unpack('<I', self.read_process_memory(base + 0x3C, 4))[0]
+            return struct.unpack('<I', self.read_process_memory(base + e_lfanew + 0x50, 4))[0]
+        except (PDError, struct.error):
+            return default
+
     def is_address_on_stack(self, address, context=None):
         """
         Utility function to determine if the specified address exists
@@ -2414,6 +2812,7 @@ class PyDBG(object):
         # if the above loop is "broken" out of, then this handle leaks.
         self.close_handle(snapshot)
 
+    @pure(memoize=True)
     def flip_endian(self, dword):
         """
         Utility function to flip the endianess a given DWORD into raw bytes.
@@ -2435,6 +2834,7 @@ class PyDBG(object):
 
         return '%c%c%c%c' % (byte1, byte2, byte3, byte4)
 
+    @pure(memoize=True)
     def flip_endian_dword(self, bytes):
         """
         Utility function to flip the endianess of
@@ -2538,6 +2938,23 @@ class PyDBG(object):
         # we keep the process handle open but don't need the thread handle.
         self.close_handle(pi.hThread)
 
+    def memory_regions(self):
+        """
+        Return the list of regions making up the debuggee address space.
+        While a debug event is being handled the address space is only walked
+        once, subsequent calls (and virtual_query() lookups) are served from the region map.
+
+        @see: virtual_query()
+
+        @rtype:  List
+        @return: List of MemoryRegion objects ordered by base address.
+        """
+
+        if self._region_map.enabled:
+            return self._region_map.walk(self._virtual_query)
+
+        return RegionMap(self.page_size).walk(self._virtual_query)
+
     def open_process(self, pid):
         """
         Convenience wrapper around OpenProcess().
@@ -2565,6 +2982,8 @@ class PyDBG(object):
         @raise PDError: An exception is raised on failure.
         """
 
+        self.counters['open_thread'] += 1
+
         h_thread = kernel32.OpenThread(THREAD_ALL_ACCESS, False, thread_id)
 
         if not h_thread:
@@ -2572,6 +2991,59 @@ class PyDBG(object):
 
         return h_thread
 
+    def _thread_handle(self, thread_id):
+        """
+        Return a handle to the specified thread from the thread handle cache.
+        Handles of threads not seen yet are opened once and kept until the
+        thread exits or the debugger detaches, handles delivered by
+        CREATE_PROCESS / CREATE_THREAD events are used as is.
+
+        @type  thread_id: Integer
+        @param thread_id: ID of thread to obtain handle to
+
+        @raise PDError: An exception is raised on failure.
+        """
+
+        entry = self._thread_handles.get(thread_id)
+
+        if entry is None:
+            entry = self._thread_handles[thread_id] = (self.open_thread(thread_id), True)
+
+        return entry[0]
+
+    def _release_thread_handle(self, thread_id):
+        """
+        Drop the cached handle of the specified thread, closing it if we opened it.
+
+        @type  thread_id: Integer
+        @param thread_id: ID of thread whose handle to release
+        """
+
+        handle, owned = self._thread_handles.pop(thread_id, (None, False))
+
+        if owned:
+            self.close_handle(handle)
+
+    def _release_thread_handles(self):
+        """
+        Drop all cached thread handles, closing the ones we opened.
+        """
+
+        for thread_id in list(self._thread_handles):
+            self._release_thread_handle(thread_id)
+
+    def page_cache_stats(self):
+        """
+        Return the hit / miss counters of the per debug event page cache.
+
+        @see: read_process_memory()
+
+        @rtype:  Dictionary
+        @return: Dictionary with 'hits', 'misses' and 'pages' (currently resident) keys.
+        """
+
+        return self._page_cache.stats()
+
     def page_guard_clear(self):
         """
         Clear all debugger-set PAGE_GUARDs from memory.
@@ -2712,16 +3184,27 @@ class PyDBG(object):
 
         return port_list
 
-    def process_restore(self):
+    def process_restore(self, incremental=False):
         """
         Restore memory / context snapshot of the debuggee.
         All threads must be suspended before calling this routine.
 
+        In incremental mode every snapshotted block is read back first and only the pages whose content
+        changed since the snapshot are written. Page counts and latency of the restore are left in
+        self.last_restore and accumulated in self.counters under 'restore_pages' and 'restore_pages_written'.
+
+        @type  incremental: Bool
+        @param incremental: (Optional, def=False) Only write back the pages modified since the snapshot
+
         @raise PDError: An exception is raised on failure.
         @rtype:     PyDBG
         @return:    Self
         """
 
+        started = time.perf_counter()
+        pages = 0
+        pages_written = 0
+
         # fetch the current list of threads.
         current_thread_list = self.enumerate_threads()
 
@@ -2732,24 +3215,63 @@ class PyDBG(object):
 
         # restore all saved memory blocks.
         for memory_block in self.memory_snapshot_blocks:
-            try:
-                self.write_process_memory(
-                    memory_block.mbi.BaseAddress,
-                    memory_block.data,
-                    memory_block.mbi.RegionSize
-                )
-            except PDError as err:
-                self._err('-- IGNORING ERROR --')
-                self._err('process_restore: ' + err.__str__().rstrip('\r\n'))
-                pass
+            address = memory_block.mbi.BaseAddress or 0
+            size = memory_block.mbi.RegionSize
+            runs = [(0, size)]
+
+            if incremental:
+                try:
+                    runs = memory_block.dirty_runs(self.read_process_memory(address, size), self.page_size)
+                except PDError:
+                    # unreadable block, write all of it back.
+                    pass
+
+            pages += -(-size // self.page_size)
+
+            for (offset, length) in runs:
+                try:
+                    self.write_process_memory(address + offset, memory_block.view(offset, length), length)
+                except PDError as err:
+                    self._err('-- IGNORING ERROR --')
+                    self._err('process_restore: %s', err.__str__().rstrip('\r\n'))
+                    continue
+
+                pages_written += -(-length // self.page_size)
+
+        self.counters['restore_pages'] += pages
+        self.counters['restore_pages_written'] += pages_written
+        self.last_restore = {
+            'pages': pages,
+            'pages_written': pages_written,
+            'seconds': time.perf_counter() - started,
+        }
+
+        self._log('restored %d of %d snapshot pages', pages_written, pages)
 
         return self.ret_self()
 
-    def process_snapshot(self, mem_only=False):
+    def process_snapshot(self, mem_only=False, store=None, workers=0):
         """
         Take memory / context snapshot of the debuggee.
         All threads must be suspended before calling this routine.
 
+        Snapshots taken into a shared page store are deduplicated page by page, so keeping several restore
+        points costs little more than one plus the pages that changed in between::
+
+            store = PageStore(dbg.page_size)
+            dbg.process_snapshot(store=store)
+            restore_point = (dbg.memory_snapshot_blocks, dbg.memory_snapshot_contexts)
+
+        Putting the lists back in place selects the snapshot process_restore() restores. A snapshot loaded by
+        process_snapshot_load() is unmapped once replaced, its blocks can not be put back.
+
+        @type  mem_only: Bool
+        @param mem_only: (Optional, def=False) Do not save the thread contexts
+        @type  store:    PageStore
+        @param store:    (Optional, def=None) Page store to keep the snapshot data in
+        @type  workers:  Integer
+        @param workers:  (Optional, def=0) Number of threads reading regions concurrently, 0 to read them in turn
+
         @raise PDError: An exception is raised on failure.
         @rtype:     PyDBG
         @return:    Self
@@ -2757,8 +3279,9 @@ class PyDBG(object):
 
         self._log('taking debuggee snapshot')
 
+        self._snapshot_file_close()
+
         do_not_snapshot = [PAGE_READONLY, PAGE_EXECUTE_READ, PAGE_GUARD, PAGE_NOACCESS]
-        cursor = 0
 
         # reset the internal snapshot data structure lists.
         self.memory_snapshot_blocks = []
@@ -2771,17 +3294,15 @@ class PyDBG(object):
 
                 self.memory_snapshot_contexts.append(MemSnapshotContext(thread_id, context))
 
-                self._log('saving thread context of thread id: 0x{:08x}'.format(thread_id))
+                self._log('saving thread context of thread id: 0x%08x', thread_id)
+
+        selected = []
 
         # Scan through the entire memory range and
         # save a copy of suitable memory blocks.
-        while cursor < 0xFFFFFFFF:
+        for region in self.memory_regions():
             save_block = True
-
-            try:
-                mbi = self.virtual_query(cursor)
-            except:
-                break
+            mbi = region.to_mbi()
 
             # Do not snapshot blocks of memory that match the following characteristics.
             # XXX - might want to drop the MEM_IMAGE check to accomodate for self modifying code.
@@ -2794,17 +3315,174 @@ class PyDBG(object):
                     break
 
             if save_block:
-                self._log('Adding 0x{:08x} +{} to memory snapsnot.'.format(mbi.BaseAddress, mbi.RegionSize))
+                self._log('Adding 0x%08x +%s to memory snapsnot.', mbi.BaseAddress, mbi.RegionSize)
+                selected.append(mbi)
 
-                # read the raw bytes from the memory block.
+        if workers:
+            blocks = self._snapshot_regions_parallel(selected, workers, store)
+        else:
+            blocks = []
+
+            # read the raw bytes from the memory blocks, each block is built as soon as its region is read so
+            # only one region is held outside of the store at a time.
+            for mbi in selected:
                 data = self.read_process_memory(mbi.BaseAddress, mbi.RegionSize)
+                blocks.append(MemSnapshotBlock(mbi, data, store))
+
+        self.memory_snapshot_blocks = blocks
+
+        return self.ret_self()
+
+    def _snapshot_regions_parallel(self, selected, workers, store=None):
+        """
+        Read the selected regions with a bounded pool of threads, each straight into a buffer of its own.
+        ReadProcessMemory() releases the GIL, the region map and page protections are only touched from the
+        calling thread. At most twice as many buffers as workers are in flight, so the pool stays busy while the
+        oldest read is turned into a block, in region order, and its buffer handed over or released. Like the
+        sequential path, the first region that can not be read at all raises.
+
+        @type  selected: List
+        @param selected: MEMORY_BASIC_INFORMATION of the regions to read
+        @type  workers:  Integer
+        @param workers:  Maximum number of concurrent reads
+        @type  store:    PageStore
+        @param store:    (Optional, def=None) Page store to keep the snapshot data in
+
+        @raise PDError: An exception is raised if a region can not be read.
+        @rtype:     List
+        @return:    MemSnapshotBlock objects in the order of selected.
+        """
+
+        restore = []
+
+        for mbi in selected:
+            if self.protection_aware_reads and self._is_readable(mbi.BaseAddress, mbi.RegionSize):
+                self.counters['virtual_protect_avoided'] += 2
+                continue
+
+            try:
+                restore.append((mbi, self.virtual_protect(mbi.BaseAddress, mbi.RegionSize, PAGE_EXECUTE_READWRITE)))
+            except:
+                pass
+
+        blocks = []
+        pending = collections.deque()  # (mbi, buffer, future) of the reads in flight, in region order
+
+        def collect():
+            (mbi, buffer, future) = pending.popleft()
+
+            # collected in region order so the error raised is the one the sequential path would raise.
+            # partial reads keep what was read, as read_process_memory() does.
+            del buffer[future.result():]
+            blocks.append(MemSnapshotBlock(mbi, buffer, store))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for mbi in selected:
+                    if len(pending) == 2 * workers:
+                        collect()
+
+                    buffer = bytearray(mbi.RegionSize)
+                    future = executor.submit(self._read_process_memory_into, mbi.BaseAddress, buffer)
+                    pending.append((mbi, buffer, future))
+
+                while pending:
+                    collect()
+        finally:
+            # restore the original page permissions on the target memory regions.
+            for (mbi, old_protect) in restore:
+                try:
+                    self.virtual_protect(mbi.BaseAddress, mbi.RegionSize, old_protect)
+                except:
+                    pass
+
+        return blocks
+
+    def process_snapshot_diff(self, blocks, contexts=(), workers=0):
+        """
+        Report what changed between an earlier snapshot and the last one taken by process_snapshot()::
+
+            dbg.process_snapshot()
+            before = (dbg.memory_snapshot_blocks, dbg.memory_snapshot_contexts)
+            ...
+            dbg.process_snapshot()
+            for changed in dbg.process_snapshot_diff(*before).ranges:
+                print("%08x: %s -> %s" % (changed.address, changed.old.hex(), changed.new.hex()))
+
+        @see: pydbg.snapshot_diff.diff_snapshots()
+
+        @type  blocks:   List
+        @param blocks:   MemSnapshotBlock objects of the earlier snapshot
+        @type  contexts: List
+        @param contexts: (Optional) MemSnapshotContext objects of the earlier snapshot
+        @type  workers:  Integer
+        @param workers:  (Optional, def=0) Number of worker processes searching changed pages, 0 for none
+
+        @rtype:  SnapshotDiff
+        @return: Changed byte ranges, register deltas and added / removed regions and threads.
+        """
+
+        return diff_snapshots(blocks, self.memory_snapshot_blocks, contexts, self.memory_snapshot_contexts,
+                              self.page_size, workers)
+
+    def process_snapshot_load(self, path):
+        """
+        Load a snapshot saved by process_snapshot_save() as the one process_restore() restores.
+        The file is memory mapped, restoring streams the block data from it without copies. It stays mapped
+        until the snapshot is replaced by another process_snapshot_load() or process_snapshot().
+
+        @type  path: String
+        @param path: Snapshot file
+
+        @raise PDError: An exception is raised if the file is not a valid snapshot.
+        @rtype:     PyDBG
+        @return:    Self
+        """
+
+        self._log('loading debuggee snapshot from %s', path)
+
+        snapshot = SnapshotFile(path)
+
+        self._snapshot_file_close()
+
+        self.snapshot_file = snapshot
+        self.memory_snapshot_blocks = snapshot.blocks
+        self.memory_snapshot_contexts = snapshot.contexts
+
+        return self.ret_self()
 
-                self.memory_snapshot_blocks.append(MemSnapshotBlock(mbi, data))
+    def process_snapshot_save(self, path):
+        """
+        Save the last snapshot taken by process_snapshot() to disk, see pydbg.snapshot_file for the layout.
+
+        @type  path: String
+        @param path: File to write
+
+        @rtype:     PyDBG
+        @return:    Self
+        """
 
-            cursor += mbi.RegionSize
+        size = save_snapshot(path, self.memory_snapshot_blocks, self.memory_snapshot_contexts, self.page_size)
+
+        self._log('saved %d byte debuggee snapshot to %s', size, path)
 
         return self.ret_self()
 
+    def _snapshot_file_close(self):
+        """
+        Unmap the snapshot file backing the memory snapshot, if any, and drop the blocks and contexts read from it.
+        """
+
+        if self.snapshot_file is None:
+            return
+
+        if self.memory_snapshot_blocks is self.snapshot_file.blocks:
+            self.memory_snapshot_blocks = []
+            self.memory_snapshot_contexts = []
+
+        self.snapshot_file.close()
+        self.snapshot_file = None
+
     def read(self, address, length):
         """
         Alias to read_process_memory().
@@ -2844,6 +3522,17 @@ class PyDBG(object):
         """
         Read from the debuggee process space.
 
+        While a debug event is being handled the debuggee is stopped, so reads
+        are served from a page granular cache that is invalidated by
+        write_process_memory() and dropped when the event is continued.
+
+        Page protections are only changed for the duration of the read if the
+        target range is not already readable (see self.protection_aware_reads).
+        The number of VirtualProtectEx() calls issued and avoided are tracked
+        in self.counters under 'virtual_protect' and 'virtual_protect_avoided'.
+
+        @see: page_cache_stats()
+
         @type  address: DWORD
         @param address: Address to read from.
         @type  length:  Integer
@@ -2854,7 +3543,23 @@ class PyDBG(object):
         @return:    Read data.
         """
 
-        data = ''
+        if self._page_cache.enabled and length <= self.PAGE_CACHE_MAX_READ:
+            try:
+                return self._page_cache.read_cached(address, length)
+            except PDError:
+                # partially readable range, let the uncached path deal with it.
+                pass
+
+        return self._read_process_memory(address, length)
+
+    def _read_process_memory(self, address, length):
+        """
+        Uncached read from the debuggee process space.
+
+        @see: read_process_memory()
+        """
+
+        data = b''
         read_buf = create_string_buffer(length)
         count = c_ulong(0)
         orig_length = length
@@ -2863,11 +3568,15 @@ class PyDBG(object):
         # ensure we can read from the requested memory space.
         _address = address
         _length = length
+        old_protect = None
 
-        try:
-            old_protect = self.virtual_protect(_address, _length, PAGE_EXECUTE_READWRITE)
-        except:
-            pass
+        if self.protection_aware_reads and self._is_readable(_address, _length):
+            self.counters['virtual_protect_avoided'] += 2
+        else:
+            try:
+                old_protect = self.virtual_protect(_address, _length, PAGE_EXECUTE_READWRITE)
+            except:
+                pass
 
         while length:
             if not kernel32.ReadProcessMemory(self.h_process, address, read_buf, length, byref(count)):
@@ -2877,18 +3586,85 @@ class PyDBG(object):
                 else:
                     return data
 
-            data += read_buf.raw
+            data += read_buf.raw[:count.value]
             length -= count.value
             address += count.value
 
         # restore the original page permissions on the target memory region.
-        try:
-            self.virtual_protect(_address, _length, old_protect)
-        except:
-            pass
+        if old_protect is not None:
+            try:
+                self.virtual_protect(_address, _length, old_protect)
+            except:
+                pass
 
         return data
 
+    def _read_process_memory_into(self, address, buffer):
+        """
+        Read from the debuggee process space straight into a writable buffer.
+        Page protections are left alone and no shared state is touched, so this is safe to call from worker threads.
+
+        @type  address: DWORD
+        @param address: Address to read from
+        @type  buffer:  Writable bytes-like object
+        @param buffer:  Buffer to fill, its length is the number of bytes to read
+
+        @raise PDError: An exception is raised if nothing could be read.
+        @rtype:     Integer
+        @return:    Number of bytes read, short of len(buffer) on partial reads.
+        """
+
+        view = memoryview(buffer).cast('B')
+        count = c_ulong(0)
+        read = 0
+
+        while read < len(view):
+            length = len(view) - read
+            read_buf = (c_char * length).from_buffer(view, read)
+
+            if not kernel32.ReadProcessMemory(self.h_process, address + read, read_buf, length, byref(count)):
+                if not read:
+                    raise PDError('ReadProcessMemory(0x{:08x}, {}, read={})'.format(
+                        address, length, count.value), True)
+
+                break
+
+            read += count.value
+
+        return read
+
+    def _is_readable(self, address, length):
+        """
+        Determine whether the specified range can be read without changing page protections.
+        Region information is served from the region map, see virtual_query().
+
+        @type  address: DWORD
+        @param address: Start of the range to check
+        @type  length:  Integer
+        @param length:  Length, in bytes, of the range to check
+
+        @rtype:  Bool
+        @return: True if every page in the range is committed, readable and not guarded.
+        """
+
+        end = address + length
+
+        while address < end:
+            try:
+                mbi = self.virtual_query(address)
+            except PDError:
+                return False
+
+            if mbi.State != MEM_COMMIT or mbi.Protect & (PAGE_GUARD | PAGE_NOACCESS):
+                return False
+
+            if not mbi.Protect & self.READABLE_PROTECTIONS:
+                return False
+
+            address = (mbi.BaseAddress or 0) + mbi.RegionSize
+
+        return True
+
     def resume_all_threads(self):
         """
         Resume all process threads.
@@ -2917,15 +3693,13 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('resuming thread: 0x{:08x}'.format(thread_id))
+        self._log('resuming thread: 0x%08x', thread_id)
 
-        thread_handle = self.open_thread(thread_id)
+        thread_handle = self._thread_handle(thread_id)
 
         if kernel32.ResumeThread(thread_handle) == -1:
             raise PDError('ResumeThread()', True)
 
-        self.close_handle(thread_handle)
-
         return self.ret_self()
 
     def ret_self(self):
@@ -3063,7 +3837,7 @@ class PyDBG(object):
         @param enable: Flag controlling the main debug event loop.
         """
 
-        self._log('setting debug event loop flag to {}'.format(enable))
+        self._log('setting debug event loop flag to %s', enable)
         self.debugger_active = enable
 
     def set_register(self, register, value):
@@ -3080,7 +3854,8 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('setting {} to 0x{:08x} in thread id {}'.format(register, value, self.dbg.dwThreadId))
+        if self.logger.debug_enabled:
+            self._log('setting %s to 0x%08x in thread id %s', register, value, self.dbg.dwThreadId)
 
         register = register.upper()
         if register not in ('EAX', 'EBX', 'ECX', 'EDX', 'ESI', 'EDI', 'ESP', 'EBP', 'EIP'):
@@ -3136,7 +3911,7 @@ class PyDBG(object):
 
         # if a thread handle was not specified, get one from the thread id.
         elif not thread_handle:
-            h_thread = self.open_thread(thread_id)
+            h_thread = self._thread_handle(thread_id)
 
         # use the specified thread handle.
         else:
@@ -3145,10 +3920,6 @@ class PyDBG(object):
         if not kernel32.SetThreadContext(h_thread, byref(context)):
             raise PDError('SetThreadContext()', True)
 
-        # if we had to resolve the thread handle, close it.
-        if not thread_handle and thread_id:
-            self.close_handle(h_thread)
-
         return self.ret_self()
 
     def sigint_handler(self, signal_number, stack_frame):
@@ -3180,7 +3951,7 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('single_step({})'.format(enable))
+        self._log('single_step(%s)', enable)
 
         if not thread_handle:
             thread_handle = self.h_thread
@@ -3414,17 +4185,60 @@ class PyDBG(object):
         @return:    Self
         """
 
-        self._log('suspending thread: 0x{:08x}'.format(thread_id))
+        self._log('suspending thread: 0x%08x', thread_id)
 
-        thread_handle = self.open_thread(thread_id)
+        thread_handle = self._thread_handle(thread_id)
 
         if kernel32.SuspendThread(thread_handle) == -1:
             raise PDError('SuspendThread()', True)
 
-        self.close_handle(thread_handle)
-
         return self.ret_self()
 
+    def symbolize(self, address):
+        """
+        Resolve an address, ex: a return address from stack_unwind() or the exception address, to the
+        nearest preceding export of the module containing it.
+
+        @see: symbolize_addresses()
+
+        @type  address: DWORD
+        @param address: Address to symbolize
+
+        @rtype:  String
+        @return: "module!export+0x10", "module+0x1234" if no export precedes the address or "0x00401000"
+                 for addresses outside of every module.
+        """
+
+        return self._refresh_symbolizer().symbolize(address)
+
+    def symbolize_addresses(self, addresses):
+        """
+        Batch counterpart of symbolize(), for entire call stacks and coverage traces.
+        Duplicate addresses are resolved once.
+
+        @type  addresses: List
+        @param addresses: Addresses to symbolize
+
+        @rtype:  List
+        @return: Symbols of the addresses, in the order given.
+        """
+
+        return self._refresh_symbolizer().symbolize_many(addresses)
+
+    def _refresh_symbolizer(self):
+        """
+        Copy the module map into the symbolizer if a module loaded or unloaded since the last copy.
+
+        @rtype:  Symbolizer
+        @return: Up to date symbolizer.
+        """
+
+        if self._symbolizer_stale:
+            self._symbolizer.set_modules((module.name, module.base, module.size) for module in self.module_map)
+            self._symbolizer_stale = False
+
+        return self._symbolizer
+
     def terminate_process(self, exit_code=0, method='terminateprocess'):
         """
         Terminate the debuggee using the specified method.
@@ -3449,6 +4263,7 @@ class PyDBG(object):
             if not kernel32.TerminateProcess(self.h_process, exit_code):
                 raise PDError('TerminateProcess({})'.format(exit_code), True)
 
+    @pure(memoize=True)
     def to_binary(self, number, bit_count=32):
         """
         Convert a number into a binary string.
@@ -3467,6 +4282,7 @@ class PyDBG(object):
 
         return ''.join(map(lambda x: str((number >> x) & 1), range(bit_count - 1, -1, -1)))
 
+    @pure(memoize=True)
     def to_decimal(self, binary):
         """
         Convert a binary string into a decimal number.
@@ -3505,10 +4321,9 @@ class PyDBG(object):
         """
 
         if address:
-            self._log('VirtualAllocEx(0x{:08x}, {}, 0x{:08x}, 0x{:08x})'.format(
-                address, size, alloc_type, protection))
+            self._log('VirtualAllocEx(0x%08x, %d, 0x%08x, 0x%08x)', address, size, alloc_type, protection)
         else:
-            self._log('VirtualAllocEx(NULL, {}, 0x{:08x}, 0x{:08x})'.format(size, alloc_type, protection))
+            self._log('VirtualAllocEx(NULL, %d, 0x%08x, 0x%08x)', size, alloc_type, protection)
 
         allocated_address = kernel32.VirtualAllocEx(self.h_process, address, size, alloc_type, protection)
 
@@ -3517,6 +4332,9 @@ class PyDBG(object):
                 'VirtualAllocEx(0x{:08x}, {}, 0x{:08x}, 0x{:08x})'.format(
                 address, size, alloc_type, protection), True)
 
+        if self._region_map.enabled:
+            self._region_map.allocate(allocated_address, size, alloc_type, protection)
+
         return allocated_address
 
     def virtual_free(self, address, size, free_type):
@@ -3533,11 +4351,14 @@ class PyDBG(object):
         @raise PDError: An exception is raised on failure.
         """
 
-        self._log('VirtualFreeEx(0x{:08x}, {}, 0x{:08x})'.format(address, size, free_type))
+        self._log('VirtualFreeEx(0x%08x, %s, 0x%08x)', address, size, free_type)
 
         if not kernel32.VirtualFreeEx(self.h_process, address, size, free_type):
             raise PDError('VirtualFreeEx(0x{:08x}, {}, 0x{:08x})'.format(address, size, free_type), True)
 
+        if self._region_map.enabled:
+            self._region_map.free(address, size, free_type)
+
     def virtual_protect(self, base_address, size, protection):
         """
         Convenience wrapper around VirtualProtectEx()
@@ -3557,6 +4378,7 @@ class PyDBG(object):
         # self._log("VirtualProtectEx( , 0x%08x, %d, %08x, ,)" % (base_address, size, protection))
 
         old_protect = c_ulong(0)
+        self.counters['virtual_protect'] += 1
 
         success = kernel32.VirtualProtectEx(self.h_process, base_address,
                                             size, protection,
@@ -3565,11 +4387,19 @@ class PyDBG(object):
             raise PDError('VirtualProtectEx(0x{:08x}, {}, 0x{:08x})'.format(
                           base_address, size, protection), True)
 
+        if self._region_map.enabled:
+            self._region_map.set_protect(base_address, size, protection)
+
         return old_protect.value
 
     def virtual_query(self, address):
         """
         Convenience wrapper around VirtualQueryEx().
+        While a debug event is being handled, results are kept in a region map
+        (kept up to date by virtual_protect(), virtual_alloc() and virtual_free())
+        so repeated lookups do not go to the kernel.
+
+        @see: memory_regions()
 
         @type  address: DWORD
         @param address: Address to query
@@ -3580,6 +4410,26 @@ class PyDBG(object):
         @return: MEMORY_BASIC_INFORMATION
         """
 
+        if not self._region_map.enabled:
+            return self._virtual_query(address)
+
+        region = self._region_map.find(address)
+
+        if region is None:
+            mbi = self._virtual_query(address)
+            self._region_map.insert(MemoryRegion.from_mbi(mbi))
+
+            return mbi
+
+        return region.to_mbi(address, self.page_size)
+
+    def _virtual_query(self, address):
+        """
+        Uncached VirtualQueryEx() wrapper.
+
+        @see: virtual_query()
+        """
+
         mbi = MEMORY_BASIC_INFORMATION()
 
         if kernel32.VirtualQueryEx(self.h_process, address, byref(mbi), sizeof(mbi)) < sizeof(mbi):
@@ -3661,8 +4511,8 @@ class PyDBG(object):
 
         @type  address: DWORD
         @param address: Address to write to
-        @type  data:    Raw Bytes
-        @param data:    Data to write
+        @type  data:    Bytes-like object
+        @param data:    Data to write, writable buffers (ex: views of a snapshot file) are written without a copy
         @type  length:  DWORD
         @param length:  (Optional, Def:len(data)) Length of data, in bytes, to write
 
@@ -3670,12 +4520,23 @@ class PyDBG(object):
         """
 
         count = c_ulong(0)
+        written = 0
+
+        if not isinstance(data, bytes):
+            data = memoryview(data).cast('B')
+
+            # ctypes can only point into writable buffers.
+            if data.readonly:
+                data = data.tobytes()
 
         # if the optional data length parameter was omitted,
         # calculate the length ourselves.
         if not length:
             length = len(data)
 
+        # the cached copy of the target range is now stale.
+        self._page_cache.invalidate(address, length)
+
         # ensure we can write to the requested memory space.
         _address = address
         _length = length
@@ -3685,13 +4546,17 @@ class PyDBG(object):
             pass
 
         while length:
-            c_data = c_char_p(data[count.value:])
+            if isinstance(data, bytes):
+                c_data = c_char_p(data[written:])
+            else:
+                c_data = (c_char * length).from_buffer(data, written)
 
             if not kernel32.WriteProcessMemory(self.h_process, address, c_data, length, byref(count)):
                 raise PDError('WriteProcessMemory(0x{:08x}, ..., {})'.format(address, length), True)
 
             length -= count.value
             address += count.value
+            written += count.value
 
         # restore the original page permissions on the target memory region.
         try:
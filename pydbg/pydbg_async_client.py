@@ -0,0 +1,349 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import asyncio
+import inspect
+
+from pydbg import codec  # compact pickling of the ctypes structures we ship
+from pydbg.defines import DBG_CONTINUE, USER_CALLBACK_DEBUG_EVENT
+from pydbg.errors import PDError
+from pydbg.pydbg import PyDBG
+from pydbg.pydbg_client import LocalHelpers
+from pydbg.wire import AsyncChannel, Delta, DeltaCodec
+
+
+class AsyncPyDBGClient(object):
+    """
+    asyncio counterpart of PyDBGClient, speaking the same wire protocol to a PyDBG server.
+    Remote routines are coroutines and callbacks may be coroutine functions::
+
+        dbg = await AsyncPyDBGClient.connect(host, port)
+        await dbg.set_callback(EXCEPTION_BREAKPOINT, handler)
+        await dbg.debug_event_loop()
+
+    Every call is pipelined with a sequence id and answered through a future, so any number of
+    tasks may share a client, and a single process can drive many remote debuggees concurrently.
+    Helpers declared with @pure in PyDBG are run locally and return their value directly.
+    """
+
+    def __init__(self, channel, pydbg_class=PyDBG):
+        """
+        Use connect() rather than instantiating the client directly.
+
+        @type  channel:     AsyncChannel
+        @param channel:     Channel connected to the PyDBG server
+        @type  pydbg_class: Class object
+        @param pydbg_class: (Optional, def=PyDBG) Class whose @pure helpers are run locally
+        """
+
+        self.channel = channel
+
+        # pure helpers only rely on class attributes, spare the debugger initialization.
+        self.local = LocalHelpers(pydbg_class.__new__(pydbg_class))
+        self.callbacks = {}
+        self.delta = None    # DeltaCodec, once negotiated
+        self.sequence = 0    # sequence id of the last call
+        self.pending = {}    # sequence id -> future of outstanding calls
+        self.events = asyncio.Queue()  # callback events, exceptions and end of loop notifications
+
+        # convenience variables of the last callback event, as in PyDBGClient.
+        self.dbg = None
+        self.context = None
+        self.exception_address = None
+        self.write_violation = None
+        self.violation_address = None
+
+        self.reader = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host, port, compression=None, delta=False):
+        """
+        Connect to a PyDBG server.
+
+        @type  host:        String
+        @param host:        Host address of PyDBG server (dotted quad IP address or hostname)
+        @type  port:        Integer
+        @param port:        Port that the PyDBG server is listening on.
+        @type  compression: String
+        @param compression: (Optional, def=None) Frame compression to negotiate, 'zlib' or 'lzma'
+        @type  delta:       Bool
+        @param delta:       (Optional, def=False) Negotiate delta encoding of memory reads and contexts
+
+        @raise PDError: An exception is raised if a connection to the PyDbg server can not be established.
+        @rtype:     AsyncPyDBGClient
+        @return:    Connected client.
+        """
+
+        try:
+            (reader, writer) = await asyncio.open_connection(host, port)
+        except OSError:
+            raise PDError("connection severed")
+
+        client = cls(AsyncChannel(reader, writer))
+
+        if compression or delta:
+            await client.negotiate(compression, delta)
+
+        return client
+
+    def __getattr__(self, method_name):
+        """
+        Mirror PyDBG routines, see PyDBGClient.__getattr__.
+
+        @rtype:  Lambda
+        @return: Lambda returning the coroutine of the remote call, or the value of a local helper.
+        """
+
+        if method_name in self.local:
+            return lambda *args, **kwargs: self.local.call(method_name, *args, **kwargs)
+
+        return lambda *args, **kwargs: self.call(method_name, *args, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def call(self, method_name, *args, **kwargs):
+        """
+        Call the specified remote routine.
+
+        @type  method_name: String
+        @param method_name: Name of the remote routine (or attribute)
+
+        @raise PDError: An exception is raised if the routine raised on the server side.
+        @rtype:     Mixed
+        @return:    Return value of the remote routine.
+        """
+
+        return await self.request(method_name, (args, kwargs))
+
+    async def close(self):
+        """
+        Close the connection, failing any outstanding call.
+        """
+
+        await self.channel.close()
+
+        try:
+            await self.reader
+        except asyncio.CancelledError:
+            pass
+
+    async def debug_event_loop(self):
+        """
+        Run the debug event loop on the server. Callback events are delivered to the registered
+        callbacks, awaited if they return an awaitable, and their continue status sent back with
+        the **DONE** token. Returns once the server side loop is over.
+
+        @raise PDError: An exception is raised if the server side loop raised.
+        """
+
+        await self.channel.send_object(("debug_event_loop", ()))
+
+        while True:
+            received = await self.events.get()
+
+            if received[0] == "**EXIT**":
+                break
+
+            if received[0] == "exception":
+                raise PDError(received[1])
+
+            (msg_type, dbg, context) = received
+            ret = DBG_CONTINUE
+
+            # debugger callback event
+            if dbg and context:
+                self.dbg = dbg
+                self.context = context
+                self.exception_address = dbg.u.Exception.ExceptionRecord.ExceptionAddress
+                self.write_violation = dbg.u.Exception.ExceptionRecord.ExceptionInformation[0]
+                self.violation_address = dbg.u.Exception.ExceptionRecord.ExceptionInformation[1]
+
+                exception_code = dbg.u.Exception.ExceptionRecord.ExceptionCode
+
+                if exception_code in self.callbacks:
+                    ret = self.callbacks[exception_code](self)
+
+            # user callback event.
+            elif USER_CALLBACK_DEBUG_EVENT in self.callbacks:
+                ret = self.callbacks[USER_CALLBACK_DEBUG_EVENT](self)
+
+            if inspect.isawaitable(ret):
+                ret = await ret
+
+            await self.channel.send_object(("**DONE**", ret))
+
+    async def negotiate(self, compression=None, delta=False, threshold=None):
+        """
+        Negotiate frame compression and delta encoding with the server, see PyDBGClient.negotiate().
+
+        @rtype:  Dictionary
+        @return: Accepted "compression" (or None) and "delta" flag.
+        """
+
+        # the codec must be in place before the first delta encoded response shows up.
+        if delta:
+            self.delta = DeltaCodec()
+
+        try:
+            accepted = await self.request("**HELLO**", {"compression": [compression] if compression else [],
+                                                        "threshold": threshold,
+                                                        "delta": delta})
+        except PDError:
+            accepted = {"compression": None, "delta": False}
+
+        self.channel.set_compression(accepted["compression"], threshold)
+
+        if not accepted["delta"]:
+            self.delta = None
+
+        return accepted
+
+    async def request(self, method_name, payload):
+        """
+        Send a request as a pipelined call and wait for its response.
+
+        @type  method_name: String
+        @param method_name: Name of the remote routine
+        @type  payload:     Mixed
+        @param payload:     (args, kwargs) tuple, or the raw payload of the special requests
+
+        @raise PDError: An exception is raised if the routine raised on the server side.
+        @rtype:     Mixed
+        @return:    Return value of the remote routine.
+        """
+
+        if self.reader.done():
+            raise PDError("connection severed")
+
+        self.sequence += 1
+        seq = self.sequence
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[seq] = future
+
+        try:
+            await self.channel.send_object(("**SEQ**", seq, method_name, payload))
+            return await future
+        finally:
+            # cancelled calls are forgotten, their late responses are dropped by the reader.
+            self.pending.pop(seq, None)
+
+    async def set_callback(self, exception_code, callback_func, filters=None):
+        """
+        Register a callback, see PyDBGClient.set_callback().
+        The callback is passed this client and may be a coroutine function.
+
+        @type  exception_code: Long
+        @param exception_code: Exception code to establish a callback for
+        @type  callback_func:  Function
+        @param callback_func:  Function to call when specified exception code is caught.
+        @type  filters:        List
+        @param filters:        (Optional, def=None) EventFilter objects evaluated by the server
+        """
+
+        self.callbacks[exception_code] = callback_func
+
+        ret = await self.request("set_callback", exception_code)
+
+        if filters:
+            await self.set_event_filter(exception_code, filters)
+
+        return ret
+
+    async def set_event_filter(self, exception_code, filters):
+        """
+        Set the server side filters of an exception code, see PyDBGClient.set_event_filter().
+        """
+
+        return await self.request("set_event_filter", (exception_code, list(filters)))
+
+    def unwrap(self, ret):
+        """
+        Translate the special values of a remote return value, see PyDBGClient.unwrap().
+        """
+
+        if isinstance(ret, Delta):
+            data = self.delta.decode(ret)
+            return codec.decode(data) if ret.structure else data
+
+        if isinstance(ret, tuple) and len(ret) == 2 and ret[0] == "exception":
+            raise PDError(ret[1])
+
+        if ret == "**SELF**":
+            return self
+        else:
+            return ret
+
+    async def _read_loop(self):
+        """
+        Route everything the server sends: responses to their futures, anything else to the event queue.
+        Values are unwrapped in arrival order, which keeps the delta codec in sync with the server's.
+        Once the reader stops, for whatever reason, every outstanding call fails.
+        """
+
+        reason = "connection closed"
+
+        try:
+            while True:
+                received = await self.channel.recv_object()
+
+                if isinstance(received, tuple) and received[0] == "**SEQ**":
+                    (_, seq, ret) = received
+                    future = self.pending.pop(seq, None)
+
+                    # unwrapped even when nobody waits for it any more, for the delta codec's sake.
+                    try:
+                        value = self.unwrap(ret)
+                    except PDError as err:
+                        # without the reader's frames, callers clearing the traceback would close the reader.
+                        if future is not None and not future.done():
+                            future.set_exception(err.with_traceback(None))
+                    else:
+                        if future is not None and not future.done():
+                            future.set_result(value)
+
+                    continue
+
+                if isinstance(received, tuple) and received[0] == "callback":
+                    (msg_type, dbg, context) = received
+                    received = (msg_type, dbg, self.unwrap(context))
+
+                self.events.put_nowait(received)
+        except PDError as err:
+            reason = str(err)
+        except Exception as err:
+            # undecodable frames and the like, the stream can't be trusted any more.
+            reason = "connection severed: {}: {}".format(type(err).__name__, err)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(PDError(reason))
+
+            self.pending.clear()
+            self.events.put_nowait(("exception", reason))
@@ -28,14 +28,223 @@
 """
 
 import socket
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
 
-from pydbg.pydbg import PyDBG
+from pydbg.pydbg import PyDBG, pure_methods
+from pydbg import codec  # compact pickling of the ctypes structures we ship
 from pydbg.defines import *
 from pydbg.errors import PDError
+from pydbg.wire import Channel, Delta, DeltaCodec
+
+
+class LocalHelpers(object):
+    """
+    Runs the routines of a PyDBG instance declared with @pure locally, memoizing the results of the
+    ones declared safe to memoize.
+    """
+
+    def __init__(self, pydbg, memo_size: int = 4096):
+        """
+        @type  pydbg:     PyDBG
+        @param pydbg:     Instance the helpers are run on
+        @type  memo_size: Integer
+        @param memo_size: (Optional, def=4096) Number of memoized results kept before the memo is reset
+        """
+
+        self.pydbg = pydbg
+        self.methods = pure_methods(type(pydbg))  # name -> memoize flag
+        self.memo = {}
+        self.memo_size = memo_size
+
+        self.calls = 0  # number of helper calls served locally
+        self.hits = 0   # number of those served from the memo
+
+    def __contains__(self, method_name):
+        return method_name in self.methods
+
+    def call(self, method_name, *args, **kwargs):
+        """
+        Run the specified helper locally.
+
+        @type  method_name: String
+        @param method_name: Name of a routine declared with @pure
+
+        @rtype:  Mixed
+        @return: Return value of the helper.
+        """
+
+        self.calls += 1
+        method = getattr(self.pydbg, method_name)
+
+        if not self.methods[method_name]:
+            return method(*args, **kwargs)
+
+        key = (method_name, args, tuple(sorted(kwargs.items())))
+
+        try:
+            ret = self.memo[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments.
+            return method(*args, **kwargs)
+        else:
+            self.hits += 1
+            return ret
+
+        ret = method(*args, **kwargs)
+
+        if len(self.memo) >= self.memo_size:
+            self.memo.clear()
+
+        self.memo[key] = ret
+
+        return ret
+
+
+class RemoteResult(object):
+    """
+    Placeholder for the result of a batched or pipelined remote call.
+    """
+
+    def __init__(self, client, method_name, seq=None):
+        """
+        @type  client:      PyDBGClient
+        @param client:      Client the call was issued through
+        @type  method_name: String
+        @param method_name: Name of the remote routine
+        @type  seq:         Integer
+        @param seq:         (Optional, def=None) Sequence id of a pipelined call
+        """
+
+        self.client = client
+        self.method_name = method_name
+        self.seq = seq
+        self.finished = False
+        self.value = None
+        self.error = None
+
+    def done(self):
+        return self.finished
+
+    def result(self):
+        """
+        Return the result of the call, waiting for it if it was pipelined.
+
+        @raise PDError: An exception is raised if the call failed or the batch was not executed yet.
+        @rtype:     Mixed
+        @return:    Return value of the remote routine.
+        """
+
+        if not self.finished:
+            if self.seq is None:
+                raise PDError("{}(): batch not executed yet".format(self.method_name))
+
+            self.client.flush_pipeline(self.seq)
+
+        if self.error:
+            raise self.error
+
+        return self.value
+
+    def set(self, ret):
+        try:
+            self.value = self.client.unwrap(ret)
+        except PDError as err:
+            self.error = err
+
+        self.finished = True
+
+
+class RemoteBatch(object):
+    """
+    Queue of remote calls sent in a single frame and answered together. Calls are made on the batch
+    as they would be on the client and return RemoteResult placeholders::
+
+        with dbg.batch() as batch:
+            esp = batch.get_register("ESP")
+            eip = batch.get_register("EIP")
+
+        print(esp.result(), eip.result())
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+        self.results = []
+
+    def __getattr__(self, method_name):
+        return lambda *args, **kwargs: self.call(method_name, *args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def call(self, method_name, *args, **kwargs):
+        """
+        Queue a call to the specified remote routine.
+
+        @rtype:  RemoteResult
+        @return: Placeholder filled in by execute().
+        """
+
+        result = RemoteResult(self.client, method_name)
+
+        # pure helpers don't need to go over the network.
+        if method_name in self.client.local:
+            result.value = self.client.local.call(method_name, *args, **kwargs)
+            result.finished = True
+            return result
+
+        self.calls.append((method_name, (args, kwargs)))
+        self.results.append(result)
+
+        return result
+
+    def execute(self):
+        """
+        Send the queued calls and collect their results.
+
+        @raise PDError: An exception is raised if any of the calls failed.
+        @rtype:     List
+        @return:    Return values of the queued calls, in order.
+        """
+
+        (calls, results) = (self.calls, self.results)
+        (self.calls, self.results) = ([], [])
+
+        if calls:
+            self.client.flush_pipeline()
+            self.client.pickle_send(("**BATCH**", calls))
+
+            for (result, ret) in zip(results, self.client.pickle_recv()):
+                result.set(ret)
+
+        return [result.result() for result in results]
+
+
+class RemotePipeline(object):
+    """
+    Proxy issuing pipelined calls: every call is sent immediately and returns a RemoteResult, responses
+    are matched by sequence id as they are needed. Outstanding calls are collected on exit::
+
+        with dbg.pipeline() as pipe:
+            slots = [pipe.read_process_memory(esp + i * 4, 4) for i in range(20)]
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, method_name):
+        return lambda *args, **kwargs: self.client.call_async(method_name, *args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.client.flush_pipeline()
 
 
 class PyDBGClient(object):
@@ -56,14 +265,18 @@ class PyDBGClient(object):
     used locally or remotely.
     """
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, compression=None, delta=False):
         """
         Set the default client attributes. The target host and port are required.
 
-        @type  host: String
-        @param host: Host address of PyDBG server (dotted quad IP address or hostname)
-        @type  port: Integer
-        @param port: Port that the PyDBG server is listening on.
+        @type  host:        String
+        @param host:        Host address of PyDBG server (dotted quad IP address or hostname)
+        @type  port:        Integer
+        @param port:        Port that the PyDBG server is listening on.
+        @type  compression: String
+        @param compression: (Optional, def=None) Frame compression to negotiate, 'zlib' or 'lzma'
+        @type  delta:       Bool
+        @param delta:       (Optional, def=False) Negotiate delta encoding of memory reads and contexts
 
         @raise PDError: An exception is raised if a connection to the PyDbg server can not be established.
         """
@@ -71,7 +284,11 @@ class PyDBGClient(object):
         self.host = host
         self.port = port
         self.pydbg = PyDBG()
+        self.local = LocalHelpers(self.pydbg)  # helpers declared @pure in PyDBG, run without a round trip
         self.callbacks = {}
+        self.delta = None   # DeltaCodec, once negotiated
+        self.sequence = 0   # sequence id of the last pipelined call
+        self.pending = {}   # sequence id -> RemoteResult of outstanding pipelined calls
 
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -79,6 +296,11 @@ class PyDBGClient(object):
         except:
             raise PDError("connection severed")
 
+        self.channel = Channel(self.sock)
+
+        if compression or delta:
+            self.negotiate(compression, delta)
+
     def __getattr__(self, method_name):
         """
         This routine is called by default when a requested attribute
@@ -98,6 +320,44 @@ class PyDBGClient(object):
 
         return lambda *args, **kwargs: self.method_missing(method_name, *args, **kwargs)
 
+    def batch(self):
+        """
+        Start a batch of remote calls, sent in a single round trip.
+
+        @see: RemoteBatch
+
+        @rtype:  RemoteBatch
+        @return: Batch to queue calls on.
+        """
+
+        return RemoteBatch(self)
+
+    def call_async(self, method_name, *args, **kwargs):
+        """
+        Send a pipelined call to the specified remote routine without waiting for its result.
+
+        @type  method_name: String
+        @param method_name: Name of the remote routine
+
+        @rtype:  RemoteResult
+        @return: Placeholder, its result() waits for the response.
+        """
+
+        # pure helpers don't need to go over the network.
+        if method_name in self.local:
+            result = RemoteResult(self, method_name)
+            result.value = self.local.call(method_name, *args, **kwargs)
+            result.finished = True
+            return result
+
+        self.sequence += 1
+
+        result = RemoteResult(self, method_name, self.sequence)
+        self.pending[self.sequence] = result
+        self.pickle_send(("**SEQ**", self.sequence, method_name, (args, kwargs)))
+
+        return result
+
     def debug_event_loop(self):
         """
         Overriden debug event handling loop.
@@ -112,6 +372,7 @@ class PyDBGClient(object):
         the exception and it is free to move on.
         """
 
+        self.flush_pipeline()
         self.pickle_send(("debug_event_loop", ()))
 
         while 1:
@@ -124,11 +385,18 @@ class PyDBGClient(object):
             #   - debugger callback event
             #   - user callback event
             #   - raised exception
+            #   - end of the server side debug event loop
 
             if isinstance(received, tuple):
+                ret = DBG_CONTINUE
+
+                if received[0] == "**EXIT**":
+                    break
+
                 # callback type
                 if received[0] == "callback":
                     (msg_type, dbg, context) = received
+                    context = self.unwrap(context)
 
                     # debugger callback event
                     if dbg and context:
@@ -158,6 +426,22 @@ class PyDBGClient(object):
                     
                 self.pickle_send(('**DONE**', ret))
 
+    def flush_pipeline(self, until=None):
+        """
+        Collect the responses of outstanding pipelined calls.
+
+        @type  until: Integer
+        @param until: (Optional, def=None) Stop once the response to this sequence id was received
+        """
+
+        while self.pending:
+            (_, seq, ret) = self.pickle_recv()
+
+            self.pending.pop(seq).set(ret)
+
+            if seq == until:
+                break
+
     def method_missing(self, method_name, *args, **kwargs):
         """
         See the notes for __getattr__ for related notes.
@@ -182,19 +466,46 @@ class PyDBGClient(object):
         @return: Return value of the mirrored method.
         """
 
-        # some functions shouldn't go over the network.
-        # XXX - there may be more routines we have to add to this list.
-        if method_name in ("hex_dump", "flip_endian", "flip_endian_dword"):
-            exec("method_pointer = self.pydbg.%s" % method_name)
-            ret = method_pointer(*args, **kwargs)
+        # pure helpers, declared with @pure in PyDBG, don't need to go over the network.
+        if method_name in self.local:
+            ret = self.local.call(method_name, *args, **kwargs)
         else:
+            self.flush_pipeline()
             self.pickle_send((method_name, (args, kwargs)))
             ret = self.pickle_recv()
 
-        if ret == "**SELF**":
-            return self
-        else:
-            return ret
+        return self.unwrap(ret)
+
+    def negotiate(self, compression=None, delta=False, threshold=None):
+        """
+        Negotiate frame compression and delta encoding with the server.
+        Servers predating the negotiation leave both disabled.
+
+        @type  compression: String
+        @param compression: (Optional, def=None) Frame compression, 'zlib' or 'lzma'
+        @type  delta:       Bool
+        @param delta:       (Optional, def=False) Delta encode memory reads and contexts
+        @type  threshold:   Integer
+        @param threshold:   (Optional, def=pydbg.wire.COMPRESS_THRESHOLD) Size under which frames are sent uncompressed
+
+        @rtype:  Dictionary
+        @return: Accepted "compression" (or None) and "delta" flag.
+        """
+
+        self.flush_pipeline()
+        self.pickle_send(("**HELLO**", {"compression": [compression] if compression else [],
+                                        "threshold": threshold,
+                                        "delta": delta}))
+
+        accepted = self.pickle_recv()
+
+        if not isinstance(accepted, dict):
+            return {"compression": None, "delta": False}
+
+        self.channel.set_compression(accepted["compression"], threshold)
+        self.delta = DeltaCodec() if accepted["delta"] else None
+
+        return accepted
 
     def pickle_recv(self):
         """
@@ -202,21 +513,15 @@ class PyDBGClient(object):
         the PyDbg server. We can send pretty much anything here.
         For example a tuple containing integers, strings, arbitrary objects
         and structures. Our "protocol" is a simple length-value protocol
-        where each datagram is prefixed by a 4-byte length of
-        the data to be received.
+        where each frame is prefixed by an 8-byte binary length of
+        the data to be received, see pydbg.wire.
 
         @raise pdx: An exception is raised if the connection was severed.
         @rtype:     Mixed
         @return:    Whatever is received over the socket.
         """
 
-        try:
-            length = int(self.sock.recv(4), 16)
-            received = self.sock.recv(length)
-        except:
-            raise PDError("connection severed")
-        
-        return pickle.loads(received)
+        return self.channel.recv_object()
 
     def pickle_send(self, data):
         """
@@ -224,8 +529,8 @@ class PyDBGClient(object):
         We can send pretty much anything here.
         For example a tuple containing integers, strings, arbitrary objects
         and structures. Our "protocol" is a simple length-value protocol
-        where each datagram is prefixed by a 4-byte length of
-        the data to be received.
+        where each frame is prefixed by an 8-byte binary length of
+        the data to be received, see pydbg.wire.
 
         @type  data: Mixed
         @param data: Data to marshal and transmit. Data can *pretty much* contain anything you throw at it.
@@ -233,13 +538,19 @@ class PyDBGClient(object):
         @raise pdx: An exception is raised if the connection was severed.
         """
 
-        data = pickle.dumps(data)
+        self.channel.send_object(data)
 
-        try:
-            self.sock.send("%04x" % len(data))
-            self.sock.send(data)
-        except:
-            raise PDError("connection severed")
+    def pipeline(self):
+        """
+        Start issuing pipelined remote calls.
+
+        @see: RemotePipeline
+
+        @rtype:  RemotePipeline
+        @return: Proxy issuing pipelined calls.
+        """
+
+        return RemotePipeline(self)
 
     def run(self):
         """
@@ -249,7 +560,7 @@ class PyDBGClient(object):
         """
         self.debug_event_loop()
 
-    def set_callback(self, exception_code, callback_func):
+    def set_callback(self, exception_code, callback_func, filters=None):
         """
         Overriden callback setting routing.
         A transparent mirror here with method_missing() would not do.
@@ -257,14 +568,68 @@ class PyDBGClient(object):
         and then tell the PyDbg server about it. For more information
         see the documentation of pydbg.set_callback().
 
+        @see: set_event_filter()
+
         @type  exception_code: Long
         @param exception_code: Exception code to establish a callback for
         @type  callback_func:  Function
         @param callback_func:  Function to call when specified exception code is caught.
+        @type  filters:        List
+        @param filters:        (Optional, def=None) EventFilter objects evaluated by the server
         """
 
         self.callbacks[exception_code] = callback_func
 
+        self.flush_pipeline()
         self.pickle_send(("set_callback", exception_code))
-        
+        ret = self.pickle_recv()
+
+        if filters:
+            self.set_event_filter(exception_code, filters)
+
+        return ret
+
+    def set_event_filter(self, exception_code, filters):
+        """
+        Have the server only forward the events of the specified exception code that match any of
+        the filters. Other events are continued by the server without a round trip, with the status
+        PyDBG uses when no callback is registered: DBG_EXCEPTION_NOT_HANDLED for access violations and
+        other faults, DBG_CONTINUE for breakpoints, guard pages and debug events.
+        An empty list of filters forwards every event again.
+
+        @type  exception_code: Long
+        @param exception_code: Exception code the filters apply to
+        @type  filters:        List
+        @param filters:        EventFilter objects
+        """
+
+        self.flush_pipeline()
+        self.pickle_send(("set_event_filter", (exception_code, list(filters))))
+
         return self.pickle_recv()
+
+    def unwrap(self, ret):
+        """
+        Translate the special values of a remote return value.
+
+        @type  ret: Mixed
+        @param ret: Value returned by the server
+
+        @raise PDError: An exception is raised if the routine raised on the server side.
+        @rtype:     Mixed
+        @return:    Return value of the remote routine.
+        """
+
+        # value delta encoded against the previous one we received.
+        if isinstance(ret, Delta):
+            data = self.delta.decode(ret)
+            return codec.decode(data) if ret.structure else data
+
+        # the routine raised on the server side.
+        if isinstance(ret, tuple) and len(ret) == 2 and ret[0] == "exception":
+            raise PDError(ret[1])
+
+        if ret == "**SELF**":
+            return self
+        else:
+            return ret
@@ -0,0 +1,344 @@
+#!c:\python\python.exe
+
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import argparse
+import socket
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pydbg import codec  # compact pickling of the ctypes structures we ship
+from pydbg.errors import PDError
+from pydbg.event_filter import any_match
+from pydbg.wire import Channel, DeltaCodec, COMPRESSIONS
+
+# routines whose results are delta encoded once the client negotiated it, keyed by their arguments.
+DELTA_METHODS = ("read_process_memory", "read", "get_thread_context")
+
+
+def default_pydbg_factory():
+    """
+    Instantiate a local PyDBG in client / server mode.
+    The import is deferred so the server can be driven by a stand-in class on hosts without kernel32.
+    """
+
+    from pydbg.pydbg import PyDBG
+
+    return PyDBG(cs=True)
+
+
+class PyDBGRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serve a single PyDBGClient connection.
+    Each connection is backed by its own PyDBG instance, obtained from the server's pydbg_factory.
+    """
+
+    def setup(self):
+        self.channel = Channel(self.request)
+        self.pydbg = self.server.pydbg_factory()
+        self.filters = {}           # exception code -> EventFilter list, see set_event_filter
+        self.events_forwarded = 0   # number of callback events sent to the client
+        self.events_filtered = 0    # number of callback events continued locally
+        self.delta = None           # DeltaCodec, if negotiated by the client
+
+    def handle(self):
+        while True:
+            try:
+                request = self.channel.recv_object()
+            except PDError:
+                # client went away.
+                break
+
+            if request[0] == "debug_event_loop":
+                self.debug_event_loop()
+            else:
+                self.reply(request)
+
+    def finish(self):
+        self.channel.close()
+
+    def debug_event_loop(self):
+        """
+        Run the debug event loop of the local PyDBG. Events the client registered callbacks for are
+        forwarded by forward_callback(). Once the loop is over the client is told so with **EXIT**.
+        """
+
+        try:
+            self.pydbg.debug_event_loop()
+        except PDError as err:
+            self.channel.send_object(("exception", str(err)))
+            return
+
+        self.channel.send_object(("**EXIT**",))
+
+    def dispatch(self, method_name, payload):
+        """
+        Call the requested PyDBG routine and return its result.
+        Plain attributes are returned as is. Failures are returned as an ("exception", message) tuple.
+
+        @type  method_name: String
+        @param method_name: Name of the requested routine (or attribute)
+        @type  payload:     Tuple
+        @param payload:     (args, kwargs) tuple, the exception code for set_callback or
+                            the (exception code, filters) tuple for set_event_filter
+
+        @rtype:  Mixed
+        @return: Return value of the routine.
+        """
+
+        if method_name == "set_callback":
+            # the client keeps the real callback, we only forward the event to it.
+            try:
+                self.pydbg.set_callback(payload, lambda pydbg, code=payload: self.forward_callback(pydbg, code))
+            except Exception as err:
+                return ("exception", "{}(): {}".format(method_name, err))
+
+            return None
+
+        if method_name == "**HELLO**":
+            return self.negotiate(payload)
+
+        if method_name == "set_event_filter":
+            (exception_code, filters) = payload
+
+            if filters:
+                self.filters[exception_code] = list(filters)
+            else:
+                self.filters.pop(exception_code, None)
+
+            return None
+
+        try:
+            attribute = getattr(self.pydbg, method_name)
+
+            if not callable(attribute):
+                return attribute
+
+            (args, kwargs) = payload
+            ret = attribute(*args, **kwargs)
+        except Exception as err:
+            return ("exception", "{}(): {}".format(method_name, err))
+
+        if self.delta and method_name in DELTA_METHODS and not kwargs:
+            if isinstance(ret, (bytes, bytearray)):
+                return self.delta.encode((method_name, args), ret)
+
+            if type(ret) in codec.TYPES:
+                return self.delta.encode((method_name, args), codec.encode(ret), structure=True)
+
+        return ret
+
+    def negotiate(self, offer):
+        """
+        Settle the wire options offered by the client.
+
+        @type  offer: Dictionary
+        @param offer: "compression" list of acceptable compressions, in order of preference,
+                      "threshold" frame size to start compressing at and "delta" flag
+
+        @rtype:  Dictionary
+        @return: Accepted "compression" (or None) and "delta" flag.
+        """
+
+        compression = None
+
+        for name in offer.get("compression") or []:
+            if name in COMPRESSIONS:
+                compression = name
+                break
+
+        self.channel.set_compression(compression, offer.get("threshold"))
+
+        if offer.get("delta"):
+            self.delta = DeltaCodec()
+
+        return {"compression": compression, "delta": self.delta is not None}
+
+    def respond(self, request):
+        """
+        Build the response to a client request, which is one of:
+
+            (method_name, payload)                         - single call, answered with its result
+            ("**BATCH**", [(method_name, payload), ...])   - batched calls, answered with the list of results
+            ("**SEQ**", seq, method_name, payload)         - pipelined call, answered with ("**SEQ**", seq, result)
+
+        @type  request: Tuple
+        @param request: Request received from the client
+
+        @rtype:  Mixed
+        @return: Response to send back.
+        """
+
+        if request[0] == "**BATCH**":
+            return [self.dispatch(method_name, payload) for (method_name, payload) in request[1]]
+
+        if request[0] == "**SEQ**":
+            (_, seq, method_name, payload) = request
+            return ("**SEQ**", seq, self.dispatch(method_name, payload))
+
+        return self.dispatch(*request)
+
+    def forward_callback(self, pydbg, exception_code=None):
+        """
+        Callback registered on behalf of the client. The event is sent over the wire and requests are
+        served until the client flags it is done with the **DONE** token, along with the continue status.
+        Events matching none of the filters the client set for the exception code are continued locally,
+        with the status PyDBG uses when no callback is registered for them.
+
+        @type  pydbg:          PyDBG
+        @param pydbg:          Local PyDBG instance
+        @type  exception_code: Long
+        @param exception_code: (Optional, def=None) Exception code the callback was registered for
+
+        @rtype:  DWORD
+        @return: Continue status returned by the client callback, or the default one for filtered events.
+        """
+
+        if pydbg.dbg and not any_match(self.filters.get(exception_code), pydbg):
+            self.events_filtered += 1
+            return pydbg.default_continue_status()
+
+        self.events_forwarded += 1
+
+        if pydbg.dbg:
+            context = pydbg.context
+
+            # consecutive contexts of a thread differ in a handful of registers.
+            if self.delta and context:
+                context = self.delta.encode(("context", pydbg.dbg.dwThreadId), codec.encode(context), structure=True)
+
+            self.channel.send_object(("callback", pydbg.dbg, context))
+        else:
+            # user callback event.
+            self.channel.send_object(("callback", None, None))
+
+        while True:
+            request = self.channel.recv_object()
+
+            if request[0] == "**DONE**":
+                return request[1]
+
+            self.reply(request)
+
+    def reply(self, request):
+        """
+        Send the response to a client request. Responses too large for a frame have their results replaced
+        with ("exception", message) tuples, the client would wait for them forever otherwise.
+
+        @type  request: Tuple
+        @param request: Request received from the client
+
+        @raise PDError: An exception is raised if the connection was severed.
+        """
+
+        try:
+            self.channel.send_object(self.respond(request))
+        except PDError as err:
+            # values delta encoded in the response never made it to the client.
+            if self.delta:
+                self.delta.clear()
+
+            if request[0] == "**BATCH**":
+                response = [("exception", "{}(): {}".format(method_name, err)) for (method_name, payload) in request[1]]
+            elif request[0] == "**SEQ**":
+                response = ("**SEQ**", request[1], ("exception", "{}(): {}".format(request[2], err)))
+            else:
+                response = ("exception", "{}(): {}".format(request[0], err))
+
+            self.channel.send_object(response)
+
+
+class PyDBGServer(socketserver.TCPServer):
+    """
+    Server counterpart of PyDBGClient. Connections are served concurrently by a pool of worker threads.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, address, pydbg_factory=None, max_workers: int = 8,
+                 handler_class=PyDBGRequestHandler):
+        """
+        @type  address:       Tuple
+        @param address:       (host, port) to listen on
+        @type  pydbg_factory: Function Pointer
+        @param pydbg_factory: (Optional, def=default_pydbg_factory) Routine returning the PyDBG instance backing a connection
+        @type  max_workers:   Integer
+        @param max_workers:   (Optional, def=8) Maximum number of connections served concurrently
+        """
+
+        self.pydbg_factory = pydbg_factory or default_pydbg_factory
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.connections = set()  # sockets of the connections being served
+        self.connections_lock = threading.Lock()
+
+        socketserver.TCPServer.__init__(self, address, handler_class)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def server_close(self):
+        socketserver.TCPServer.server_close(self)
+
+        # wake up the workers blocked on their clients.
+        with self.connections_lock:
+            for request in self.connections:
+                try:
+                    request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        self.executor.shutdown(wait=True)
+
+    def _process_request(self, request, client_address):
+        with self.connections_lock:
+            self.connections.add(request)
+
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self.connections_lock:
+                self.connections.discard(request)
+
+            self.shutdown_request(request)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PyDBG server")
+    # requests are unpickled unauthenticated, only listen on other interfaces when told to.
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (def=127.0.0.1)")
+    parser.add_argument("--port", type=int, default=7373, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=8, help="maximum number of concurrent clients")
+    options = parser.parse_args()
+
+    server = PyDBGServer((options.host, options.port), max_workers=options.workers)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,389 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import bisect
+from collections import namedtuple
+
+from pydbg.defines import (
+    MEMORY_BASIC_INFORMATION, MEM_COMMIT, MEM_RESERVE, MEM_PRIVATE, MEM_DECOMMIT, MEM_FREE,
+)
+
+
+class MemoryRegion(namedtuple('MemoryRegion', ('base', 'size', 'state', 'protect', 'type',
+                                               'allocation_base', 'allocation_protect'))):
+    """Immutable description of a run of pages sharing the same attributes"""
+
+    __slots__ = ()
+
+    @property
+    def end(self):
+        return self.base + self.size
+
+    @classmethod
+    def from_mbi(cls, mbi: MEMORY_BASIC_INFORMATION):
+        """
+        @type  mbi: MEMORY_BASIC_INFORMATION
+        @param mbi: Region information as returned by VirtualQueryEx()
+
+        @rtype:  MemoryRegion
+        @return: Region describing the same range as mbi.
+        """
+
+        return cls(mbi.BaseAddress or 0, mbi.RegionSize, mbi.State, mbi.Protect, mbi.Type,
+                   mbi.AllocationBase or 0, mbi.AllocationProtect)
+
+    def to_mbi(self, address: int = None, page_size: int = 0x1000):
+        """
+        Build the MEMORY_BASIC_INFORMATION VirtualQueryEx() would return for an address in this region.
+
+        @type  address:   DWORD
+        @param address:   (Optional, def=self.base) Queried address
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) System page size
+
+        @rtype:  MEMORY_BASIC_INFORMATION
+        @return: Region information starting at the page containing address.
+        """
+
+        if address is None:
+            page = self.base
+        else:
+            page = max(self.base, address - address % page_size)
+
+        mbi = MEMORY_BASIC_INFORMATION()
+        mbi.BaseAddress = page
+        mbi.AllocationBase = self.allocation_base
+        mbi.AllocationProtect = self.allocation_protect
+        mbi.RegionSize = self.end - page
+        mbi.State = self.state
+        mbi.Protect = self.protect
+        mbi.Type = self.type
+
+        return mbi
+
+
+class RegionMap(object):
+    """Sorted, bisect searchable map of the debuggee address space
+
+    Regions are kept in two parallel lists sorted by base address. The map
+    may be sparse: lookups of unknown addresses return None and the caller
+    is expected to query the kernel and insert() the result. A map populated
+    through walk() is complete and covers the whole scanned address space.
+    Adjacent regions sharing all attributes are merged, so the map splits
+    the address space the way VirtualQueryEx() does.
+    """
+
+    def __init__(self, page_size: int = 0x1000):
+        """
+        @type  page_size: Integer
+        @param page_size: (Optional, def=0x1000) System page size
+        """
+
+        self.page_size = page_size
+        self.enabled = False
+        self.complete = False  # flag specifying that walk() populated the whole address space
+        self.bases = []
+        self.regions = []
+
+        self.hits = 0    # number of lookups served from the map
+        self.misses = 0  # number of lookups of unknown addresses
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+    def enable(self):
+        """Start tracking regions. Any previously known region is dropped."""
+
+        self.clear()
+        self.enabled = True
+
+    def disable(self):
+        """Stop tracking regions and drop all known regions."""
+
+        self.clear()
+        self.enabled = False
+
+    def clear(self):
+        """Drop all known regions."""
+
+        self.bases = []
+        self.regions = []
+        self.complete = False
+
+    def find(self, address: int):
+        """
+        Find the region containing the specified address.
+
+        @type  address: DWORD
+        @param address: Address to look up
+
+        @rtype:  MemoryRegion
+        @return: Region containing address or None if the address is unknown.
+        """
+
+        i = bisect.bisect_right(self.bases, address) - 1
+
+        if i >= 0 and address < self.regions[i].end:
+            self.hits += 1
+            return self.regions[i]
+
+        self.misses += 1
+        return None
+
+    def insert(self, region: MemoryRegion):
+        """
+        Add a region to the map, replacing whatever was known about the range it covers.
+
+        @type  region: MemoryRegion
+        @param region: Region to add
+        """
+
+        if region.size <= 0:
+            return
+
+        self._cut(region.base, region.end)
+        self._put(region)
+
+    def load(self, mbis):
+        """
+        Replace the content of the map with the specified regions.
+
+        @type  mbis: List
+        @param mbis: MEMORY_BASIC_INFORMATION (or MemoryRegion) structures, in any order
+        """
+
+        regions = [mbi if isinstance(mbi, MemoryRegion) else MemoryRegion.from_mbi(mbi) for mbi in mbis]
+        regions.sort(key=lambda region: region.base)
+
+        self.clear()
+
+        for region in regions:
+            self.insert(region)
+
+    def walk(self, query, limit: int = 0xFFFFFFFF):
+        """
+        Populate the map by walking the address space region by region.
+        If the map is already complete, no queries are issued.
+
+        @type  query: Function Pointer
+        @param query: Routine returning the MEMORY_BASIC_INFORMATION of an address, raising on failure
+        @type  limit: DWORD
+        @param limit: (Optional, def=0xFFFFFFFF) Address to stop the walk at
+
+        @rtype:  List
+        @return: List of MemoryRegion objects ordered by base address.
+        """
+
+        if self.complete:
+            return list(self.regions)
+
+        regions = []
+        cursor = 0
+
+        while cursor < limit:
+            try:
+                mbi = query(cursor)
+            except Exception:
+                break
+
+            region = MemoryRegion.from_mbi(mbi)
+
+            if region.size <= 0:
+                break
+
+            regions.append(region)
+            cursor = region.end
+
+        self.bases = [region.base for region in regions]
+        self.regions = regions
+        self.complete = True
+
+        return list(regions)
+
+    def set_protect(self, address: int, size: int, protect: int):
+        """
+        Record a protection change on the known regions overlapping the specified range.
+
+        @type  address: DWORD
+        @param address: Start of the range whose protection changed
+        @type  size:    Integer
+        @param size:    Size of the range whose protection changed
+        @type  protect: DWORD
+        @param protect: New protection
+        """
+
+        start, end = self._page_range(address, size)
+
+        for region in self._cut(start, end):
+            self._put(region._replace(protect=protect))
+
+    def allocate(self, address: int, size: int, alloc_type: int, protect: int):
+        """
+        Record a VirtualAllocEx() of the specified range.
+
+        @type  address:    DWORD
+        @param address:    Base address of the allocated range
+        @type  size:       Integer
+        @param size:       Size of the allocated range
+        @type  alloc_type: DWORD
+        @param alloc_type: Allocation type (MEM_COMMIT and / or MEM_RESERVE)
+        @type  protect:    DWORD
+        @param protect:    Protection of the allocated range
+        """
+
+        start, end = self._page_range(address, size)
+        known = self._cut(start, end)
+
+        # committing reserved pages keeps their allocation, anything else starts a new one.
+        if known and known[0].state != MEM_FREE:
+            allocation_base = known[0].allocation_base
+        else:
+            allocation_base = start
+
+        if alloc_type & MEM_COMMIT:
+            state = MEM_COMMIT
+        else:
+            state = MEM_RESERVE
+            protect = 0
+
+        self._put(MemoryRegion(start, end - start, state, protect, MEM_PRIVATE, allocation_base, protect))
+
+    def free(self, address: int, size: int, free_type: int):
+        """
+        Record a VirtualFreeEx() of the specified range. Released allocations
+        are simply forgotten and will be queried again on the next lookup.
+
+        @type  address:   DWORD
+        @param address:   Base address of the freed range
+        @type  size:      Integer
+        @param size:      Size of the freed range
+        @type  free_type: DWORD
+        @param free_type: Free type (MEM_DECOMMIT or MEM_RELEASE)
+        """
+
+        if free_type & MEM_DECOMMIT:
+            start, end = self._page_range(address, size)
+
+            for region in self._cut(start, end):
+                self._put(region._replace(state=MEM_RESERVE, protect=0))
+
+            return
+
+        released = [region for region in self.regions if region.allocation_base == address]
+
+        for region in released:
+            self._cut(region.base, region.end)
+
+        self.complete = False
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Lookup hit / miss counters and the number of known regions.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'regions': len(self.regions)}
+
+    def _page_range(self, address, size):
+        start = address - address % self.page_size
+        end = address + max(size, 1)
+
+        if end % self.page_size:
+            end += self.page_size - end % self.page_size
+
+        return start, end
+
+    def _put(self, region):
+        i = bisect.bisect_left(self.bases, region.base)
+
+        # merge with the neighbours the region extends, ex: the pieces of a region whose protection was
+        # changed then restored.
+        if i > 0 and self._extends(self.regions[i - 1], region):
+            i -= 1
+            region = self.regions[i]._replace(size=region.end - self.regions[i].base)
+            del self.bases[i]
+            del self.regions[i]
+
+        if i < len(self.regions) and self._extends(region, self.regions[i]):
+            region = region._replace(size=self.regions[i].end - region.base)
+            del self.bases[i]
+            del self.regions[i]
+
+        self.bases.insert(i, region.base)
+        self.regions.insert(i, region)
+
+    @staticmethod
+    def _extends(left, right):
+        """
+        Determine whether right starts where left ends with the same attributes.
+        """
+
+        # fields past base and size: state, protect, type, allocation base and protection.
+        return left.end == right.base and left[2:] == right[2:]
+
+    def _cut(self, start, end):
+        """
+        Remove the range [start, end) from the map. Regions straddling the
+        boundaries are trimmed. Returns the removed pieces, clipped to the range.
+        """
+
+        lo = bisect.bisect_right(self.bases, start) - 1
+
+        if lo < 0 or self.regions[lo].end <= start:
+            lo += 1
+
+        hi = bisect.bisect_left(self.bases, end)
+
+        if lo >= hi:
+            return []
+
+        removed = self.regions[lo:hi]
+        keep = []
+
+        first, last = removed[0], removed[-1]
+
+        if first.base < start:
+            keep.append(first._replace(size=start - first.base))
+
+        if last.end > end:
+            keep.append(last._replace(base=end, size=last.end - end))
+
+        del self.bases[lo:hi]
+        del self.regions[lo:hi]
+
+        for region in keep:
+            self._put(region)
+
+        clipped = []
+
+        for region in removed:
+            base = max(region.base, start)
+            clipped.append(region._replace(base=base, size=min(region.end, end) - base))
+
+        return clipped
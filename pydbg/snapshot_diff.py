@@ -0,0 +1,256 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# runs of differing bytes in the XOR of two buffers.
+NON_ZERO_RUN = re.compile(rb'[^\x00]+')
+
+# changed pages are narrowed down to differing stripes of this many bytes before being XOR-ed.
+STRIPE = 64
+
+# consecutive changed pages are searched as a single chunk of up to this many pages.
+CHUNK_PAGES = 64
+
+# chunks handed to a worker process at once.
+WORKER_BATCH = 16
+
+
+class ChangedRange(namedtuple('ChangedRange', ('address', 'old', 'new'))):
+    """Run of bytes that differ between two snapshots"""
+
+    __slots__ = ()
+
+
+class SnapshotDiff(object):
+    """Differences between two snapshots, see diff_snapshots()"""
+
+    def __init__(self):
+        self.ranges = []             # ChangedRange objects, sorted by address
+        self.registers = {}          # thread id -> {register: (old, new)}
+        self.regions_added = []      # MEMORY_BASIC_INFORMATION of the blocks only in the new snapshot
+        self.regions_removed = []    # MEMORY_BASIC_INFORMATION of the blocks only in the old snapshot
+        self.regions_resized = []    # (base, old size, new size) of the blocks compared over their overlap
+        self.threads_added = []      # ids of the threads only in the new snapshot
+        self.threads_removed = []    # ids of the threads only in the old snapshot
+        self.pages_compared = 0
+        self.pages_changed = 0
+
+    def __bool__(self):
+        return bool(self.ranges or self.registers or self.regions_added or self.regions_removed or
+                    self.regions_resized or self.threads_added or self.threads_removed)
+
+    @property
+    def bytes_changed(self):
+        return sum(len(changed.new) for changed in self.ranges)
+
+
+def changed_ranges(address: int, old: bytes, new: bytes):
+    """
+    Find the runs of differing bytes between two equally sized buffers. Differing stripes are located
+    with memcmp() first, then XOR-ed as big integers and the non-zero runs of the result located by the
+    regex engine, nothing loops per byte in Python.
+
+    @type  address: DWORD
+    @param address: Address of the first byte of the buffers
+    @type  old:     Raw Bytes
+    @param old:     Old content
+    @type  new:     Raw Bytes
+    @param new:     New content
+
+    @rtype:  List
+    @return: ChangedRange objects.
+    """
+
+    spans = []  # [start, end] of runs of differing stripes
+
+    for start in range(0, len(old), STRIPE):
+        if old[start:start + STRIPE] == new[start:start + STRIPE]:
+            continue
+
+        if spans and spans[-1][1] == start:
+            spans[-1][1] = min(start + STRIPE, len(old))
+        else:
+            spans.append([start, min(start + STRIPE, len(old))])
+
+    ranges = []
+
+    # spans are separated by identical stripes, so runs never continue from one span to the next.
+    for (start, end) in spans:
+        xor = (int.from_bytes(old[start:end], 'little') ^ int.from_bytes(new[start:end], 'little')).to_bytes(
+            end - start, 'little')
+
+        for match in NON_ZERO_RUN.finditer(xor):
+            (low, high) = (start + match.start(), start + match.end())
+            ranges.append(ChangedRange(address + low, old[low:high], new[low:high]))
+
+    return ranges
+
+
+def _changed_ranges_batch(chunks):
+    """
+    Worker process entry point.
+
+    @type  chunks: List
+    @param chunks: (address, old, new) tuples of changed chunks
+
+    @rtype:  List
+    @return: ChangedRange objects of all the chunks.
+    """
+
+    ranges = []
+
+    for (address, old, new) in chunks:
+        ranges.extend(changed_ranges(address, old, new))
+
+    return ranges
+
+
+def diff_snapshots(old_blocks, new_blocks, old_contexts=(), new_contexts=(), page_size: int = 0x1000,
+                   workers: int = 0):
+    """
+    Compare two snapshots. Blocks are aligned by base address and compared page by page, pages shared
+    through a PageStore compare by identity and others with a single memcmp(). Byte ranges are only
+    searched for within the changed pages, optionally by a pool of worker processes.
+
+    @type  old_blocks:   List
+    @param old_blocks:   MemSnapshotBlock objects of the old snapshot
+    @type  new_blocks:   List
+    @param new_blocks:   MemSnapshotBlock objects of the new snapshot
+    @type  old_contexts: List
+    @param old_contexts: (Optional) MemSnapshotContext objects of the old snapshot
+    @type  new_contexts: List
+    @param new_contexts: (Optional) MemSnapshotContext objects of the new snapshot
+    @type  page_size:    Integer
+    @param page_size:    (Optional, def=0x1000) System page size
+    @type  workers:      Integer
+    @param workers:      (Optional, def=0) Number of worker processes searching changed pages, 0 for none
+
+    @rtype:  SnapshotDiff
+    @return: Differences between the snapshots.
+    """
+
+    diff = SnapshotDiff()
+    old_by_base = {block.mbi.BaseAddress or 0: block for block in old_blocks}
+    new_by_base = {block.mbi.BaseAddress or 0: block for block in new_blocks}
+    chunks = []  # [address, end, old pages, new pages] of runs of changed pages
+
+    for (base, block) in sorted(old_by_base.items()):
+        if base not in new_by_base:
+            diff.regions_removed.append(block.mbi)
+
+    for (base, new_block) in sorted(new_by_base.items()):
+        old_block = old_by_base.get(base)
+
+        if old_block is None:
+            diff.regions_added.append(new_block.mbi)
+            continue
+
+        if old_block.size != new_block.size:
+            diff.regions_resized.append((base, old_block.size, new_block.size))
+
+        for (offset, old, new) in zip(range(0, min(old_block.size, new_block.size), page_size),
+                                      old_block.iter_pages(page_size), new_block.iter_pages(page_size)):
+            diff.pages_compared += 1
+
+            if old is new or old == new:
+                continue
+
+            diff.pages_changed += 1
+
+            # compare the overlap only of the last page of resized blocks.
+            length = min(len(old), len(new))
+            address = base + offset
+
+            if chunks and chunks[-1][1] == address and len(chunks[-1][2]) < CHUNK_PAGES:
+                chunks[-1][1] += length
+                chunks[-1][2].append(old[:length])
+                chunks[-1][3].append(new[:length])
+            else:
+                chunks.append([address, address + length, [old[:length]], [new[:length]]])
+
+    chunks = [(address, b''.join(old), b''.join(new)) for (address, end, old, new) in chunks]
+
+    if workers and len(chunks) > WORKER_BATCH:
+        batches = [chunks[index:index + WORKER_BATCH] for index in range(0, len(chunks), WORKER_BATCH)]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ranges = [changed for batch in executor.map(_changed_ranges_batch, batches) for changed in batch]
+    else:
+        ranges = _changed_ranges_batch(chunks)
+
+    # runs crossing chunk boundaries come in one range per chunk, stitch them back together.
+    pending = None  # [address, old parts, new parts, end] of the range being stitched
+
+    for changed in ranges:
+        if pending and pending[3] == changed.address:
+            pending[1].append(changed.old)
+            pending[2].append(changed.new)
+            pending[3] += len(changed.new)
+            continue
+
+        if pending:
+            diff.ranges.append(ChangedRange(pending[0], b''.join(pending[1]), b''.join(pending[2])))
+
+        pending = [changed.address, [changed.old], [changed.new], changed.address + len(changed.new)]
+
+    if pending:
+        diff.ranges.append(ChangedRange(pending[0], b''.join(pending[1]), b''.join(pending[2])))
+
+    _diff_contexts(diff, old_contexts, new_contexts)
+
+    return diff
+
+
+def _diff_contexts(diff, old_contexts, new_contexts):
+    old_by_thread = {context.thread_id: context.context for context in old_contexts}
+    new_by_thread = {context.thread_id: context.context for context in new_contexts}
+
+    diff.threads_removed = sorted(set(old_by_thread) - set(new_by_thread))
+    diff.threads_added = sorted(set(new_by_thread) - set(old_by_thread))
+
+    for (thread_id, new) in sorted(new_by_thread.items()):
+        old = old_by_thread.get(thread_id)
+
+        if old is None:
+            continue
+
+        deltas = {}
+
+        for field in new._fields_:
+            (old_value, new_value) = (getattr(old, field[0]), getattr(new, field[0]))
+
+            # nested structures and arrays, ex: FloatSave, compare by content.
+            if not isinstance(new_value, int):
+                (old_value, new_value) = (bytes(old_value), bytes(new_value))
+
+            if old_value != new_value:
+                deltas[field[0]] = (old_value, new_value)
+
+        if deltas:
+            diff.registers[thread_id] = deltas
@@ -0,0 +1,190 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import mmap
+import struct
+from ctypes import addressof, sizeof, string_at
+
+from pydbg.defines import CONTEXT, MEMORY_BASIC_INFORMATION
+from pydbg.errors import PDError
+from pydbg.mem_snapshot import MemSnapshotBlock, MemSnapshotContext
+
+# snapshot file layout, all fields little endian:
+#
+#     header         magic, version, page size, block count, context count, context size
+#     region table   one entry per block: MEMORY_BASIC_INFORMATION fields, data offset and length
+#     contexts       one record per thread: thread id followed by the raw CONTEXT structure
+#     data           block contents, each starting on a page boundary
+MAGIC = b'PYDBGSNP'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIIII')
+REGION = struct.Struct('<QQIQIIIQQ')
+THREAD = struct.Struct('<I')
+
+
+def save_snapshot(path, blocks, contexts, page_size: int = 0x1000):
+    """
+    Write a snapshot to disk.
+
+    @type  path:      String
+    @param path:      File to write
+    @type  blocks:    List
+    @param blocks:    MemSnapshotBlock objects, see PyDBG.process_snapshot()
+    @type  contexts:  List
+    @param contexts:  MemSnapshotContext objects
+    @type  page_size: Integer
+    @param page_size: (Optional, def=0x1000) System page size, block data is aligned on it
+
+    @rtype:  Integer
+    @return: Size of the written file.
+    """
+
+    context_size = sizeof(CONTEXT)
+    offset = HEADER.size + len(blocks) * REGION.size + len(contexts) * (THREAD.size + context_size)
+    regions = []
+
+    for block in blocks:
+        offset = -(-offset // page_size) * page_size
+        regions.append((block, offset))
+        offset += block.size
+
+    with open(path, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, page_size, len(blocks), len(contexts), context_size))
+
+        for (block, data_offset) in regions:
+            mbi = block.mbi
+            # partially read regions are saved as the part that was read, the loader requires both to match.
+            fh.write(REGION.pack(mbi.BaseAddress or 0, mbi.AllocationBase or 0, mbi.AllocationProtect,
+                                 block.size, mbi.State, mbi.Protect, mbi.Type, data_offset, block.size))
+
+        for context in contexts:
+            fh.write(THREAD.pack(context.thread_id))
+            fh.write(string_at(addressof(context.context), context_size))
+
+        for (block, data_offset) in regions:
+            fh.write(bytes(data_offset - fh.tell()))
+            fh.write(block.view())
+
+        return fh.tell()
+
+
+class SnapshotFile(object):
+    """Snapshot loaded from disk
+
+    The file is mapped copy-on-write: block data are memoryviews over the
+    mapping, restoring a block streams its pages straight from the page
+    cache and nothing is ever written back to the file.
+    """
+
+    def __init__(self, path):
+        """
+        @type  path: String
+        @param path: File written by save_snapshot()
+
+        @raise PDError: An exception is raised if the file is not a snapshot of a supported version or is
+                        truncated, in which case nothing is left mapped.
+        """
+
+        self.path = path
+        self.blocks = []    # MemSnapshotBlock objects, data backed by the mapping
+        self.contexts = []  # MemSnapshotContext objects
+
+        with open(path, 'rb') as fh:
+            try:
+                self.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+            except ValueError:
+                # empty files can not be mapped.
+                raise PDError('SnapshotFile: {} is truncated'.format(path))
+
+        self.view = memoryview(self.mmap)
+
+        try:
+            self._parse()
+        except:
+            self.close()
+            raise
+
+    def _parse(self):
+        path = self.path
+
+        if len(self.view) < HEADER.size:
+            raise PDError('SnapshotFile: {} is truncated'.format(path))
+
+        (magic, version, self.page_size, block_count, context_count, context_size) = HEADER.unpack_from(self.view)
+
+        if magic != MAGIC or version != VERSION:
+            raise PDError('SnapshotFile: {} is not a version {} snapshot'.format(path, VERSION))
+
+        if context_size != sizeof(CONTEXT):
+            raise PDError('SnapshotFile: {} holds {} byte contexts, expected {}'.format(path, context_size, sizeof(CONTEXT)))
+
+        offset = HEADER.size
+        data_start = offset + block_count * REGION.size + context_count * (THREAD.size + context_size)
+
+        if data_start > len(self.view):
+            raise PDError('SnapshotFile: {} is truncated, its tables need {} bytes'.format(path, data_start))
+
+        for (base, allocation_base, allocation_protect, region_size, state, protect, type_,
+             data_offset, data_length) in REGION.iter_unpack(self.view[offset:offset + block_count * REGION.size]):
+            if data_length != region_size:
+                raise PDError('SnapshotFile: {} holds {} bytes of the 0x{:x} byte region at 0x{:08x}'.format(
+                    path, data_length, region_size, base))
+
+            if data_offset < data_start or data_offset + data_length > len(self.view):
+                raise PDError('SnapshotFile: {} is truncated, the region at 0x{:08x} lies outside its data'.format(
+                    path, base))
+
+            mbi = MEMORY_BASIC_INFORMATION()
+            mbi.BaseAddress = base
+            mbi.AllocationBase = allocation_base
+            mbi.AllocationProtect = allocation_protect
+            mbi.RegionSize = region_size
+            mbi.State = state
+            mbi.Protect = protect
+            mbi.Type = type_
+
+            self.blocks.append(MemSnapshotBlock(mbi, self.view[data_offset:data_offset + data_length]))
+
+        offset += block_count * REGION.size
+
+        for index in range(context_count):
+            (thread_id,) = THREAD.unpack_from(self.view, offset)
+            context = CONTEXT.from_buffer_copy(self.view, offset + THREAD.size)
+            self.contexts.append(MemSnapshotContext(thread_id, context))
+            offset += THREAD.size + context_size
+
+    def close(self):
+        """
+        Unmap the file. Blocks loaded from it must not be used afterwards.
+        """
+
+        for block in self.blocks:
+            block.data.release()
+
+        self.blocks = []
+        self.view.release()
+        self.mmap.close()
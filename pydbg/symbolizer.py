@@ -0,0 +1,207 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import bisect
+
+from pydbg.errors import PDError
+from pydbg.pe_exports import ExportCache, ExportIndex
+
+
+class Symbolizer(object):
+    """Address to module!export+offset resolution
+
+    Module ranges are kept sorted by base and the export RVAs of each module
+    sorted by ExportIndex, so resolving an address is two bisections once the
+    export index of its module has been built.
+    """
+
+    def __init__(self, read, exports=None):
+        """
+        @type  read:    Function Pointer
+        @param read:    Routine reading debuggee memory, read(address, length) -> bytes
+        @type  exports: ExportCache
+        @param exports: (Optional) Export index cache to share, a private one is used otherwise
+        """
+
+        self.read = read
+        self.exports = exports if exports is not None else ExportCache()
+
+        self.bases = []    # sorted module bases
+        self.modules = []  # (name, base, size) tuples, parallel to self.bases
+        self.failed = {}   # module base -> empty ExportIndex, for modules whose exports could not be read
+
+    def __len__(self):
+        return len(self.modules)
+
+    def drop(self, base: int):
+        """
+        Forget the module at the specified base could not be indexed, on unload or when another module loads there.
+
+        @type  base: DWORD
+        @param base: Module base address
+        """
+
+        self.failed.pop(base, None)
+
+    def clear(self):
+        self.failed.clear()
+
+    def set_modules(self, modules):
+        """
+        Replace the known module ranges.
+
+        @type  modules: List
+        @param modules: (name, base, size) tuples of the modules loaded in the debuggee
+        """
+
+        self.modules = sorted((tuple(module) for module in modules), key=lambda module: module[1])
+        self.bases = [base for (name, base, size) in self.modules]
+
+    def module_at(self, address: int):
+        """
+        @type  address: DWORD
+        @param address: Address to look up
+
+        @rtype:  Tuple
+        @return: (name, base, size) of the module containing the address, or None if not found.
+        """
+
+        position = bisect.bisect_right(self.bases, address)
+
+        if not position:
+            return None
+
+        module = self.modules[position - 1]
+
+        if address >= module[1] + module[2]:
+            return None
+
+        return module
+
+    def resolve(self, address: int):
+        """
+        @type  address: DWORD
+        @param address: Address to resolve
+
+        @rtype:  Tuple
+        @return: (module name, export name, offset) tuple. Export name is None if no export precedes
+                 the address, in which case the offset is relative to the module base. None if the
+                 address lies outside of every module.
+        """
+
+        module = self.module_at(address)
+
+        if not module:
+            return None
+
+        (name, base, size) = module
+        nearest = self._index(base).nearest(address - base)
+
+        if not nearest:
+            return (name, None, address - base)
+
+        return (name,) + nearest
+
+    def symbolize(self, address: int):
+        """
+        @type  address: DWORD
+        @param address: Address to symbolize
+
+        @rtype:  String
+        @return: "module!export+0x10", "module+0x1234" or "0x00401000" for addresses outside of every module.
+        """
+
+        return self.format(address, self.resolve(address))
+
+    def symbolize_many(self, addresses):
+        """
+        Symbolize a batch of addresses, ex: an entire call stack or coverage trace.
+        Duplicates are resolved once and addresses are walked in order, so consecutive addresses share
+        their module lookup.
+
+        @type  addresses: List
+        @param addresses: Addresses to symbolize
+
+        @rtype:  List
+        @return: Symbols of the addresses, in the order given.
+        """
+
+        addresses = list(addresses)
+        symbols = {}
+        module = None
+
+        for address in sorted(set(addresses)):
+            if not module or not module[1] <= address < module[1] + module[2]:
+                module = self.module_at(address)
+
+            if not module:
+                symbols[address] = self.format(address, None)
+                continue
+
+            (name, base, size) = module
+            nearest = self._index(base).nearest(address - base)
+            symbols[address] = self.format(address, (name,) + nearest if nearest else (name, None, address - base))
+
+        return [symbols[address] for address in addresses]
+
+    @staticmethod
+    def format(address: int, resolved):
+        """
+        @type  address:  DWORD
+        @param address:  Symbolized address
+        @type  resolved: Tuple
+        @param resolved: Output of resolve()
+
+        @rtype:  String
+        @return: Symbol of the address.
+        """
+
+        if not resolved:
+            return '0x{:08x}'.format(address)
+
+        (module, export, offset) = resolved
+
+        if export is None:
+            return '{}+0x{:x}'.format(module, offset)
+
+        if not offset:
+            return '{}!{}'.format(module, export)
+
+        return '{}!{}+0x{:x}'.format(module, export, offset)
+
+    def _index(self, base):
+        index = self.failed.get(base)
+
+        if index is not None:
+            return index
+
+        try:
+            return self.exports.get(self.read, base)
+        except PDError:
+            # unreadable headers, remember the module exports nothing rather than retrying each time. the
+            # export cache may be shared, its other users must still see the failure.
+            index = self.failed[base] = ExportIndex(base)
+            return index
@@ -34,6 +34,7 @@ from ctypes import (
 from pydbg.defines import PAGE_READONLY, FILE_MAP_READ
 from pydbg.windows_h import HANDLE, DWORD
 from pydbg.errors import PDError
+from pydbg.module_map import ansi_string
 
 # MAC OS compatibility
 try:
@@ -96,15 +97,19 @@ class SystemDLL:
             psapi.GetMappedFileNameA(kernel32.GetCurrentProcess(),
                                      file_ptr, byref(filename), 2048)
 
+            # the name comes back as ANSI bytes, ex: \Device\HarddiskVolume1\WINDOWS\system32\ntdll.dll
+            mapped_name = ansi_string(filename.value)
+
             # Store the full path. this is kind of ghetto,
             # but i didn't want to mess with QueryDosDevice() etc ...
-            self.path = os.sep + filename.value.split(os.sep, 3)[3]
+            parts = mapped_name.split(os.sep, 3)
+            self.path = os.sep + parts[3] if len(parts) == 4 else mapped_name
 
             # Store the file name.
             # XXX - this really shouldn't be failing. but i've seen it happen.
             try:
-                self.name = filename.value[filename.value.rindex(os.sep)+1:]
-            except Exception:
+                self.name = mapped_name[mapped_name.rindex(os.sep)+1:]
+            except ValueError:
                 self.name = self.path
 
             kernel32.UnmapViewOfFile(file_ptr)
@@ -0,0 +1,556 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+@author:       Pedram Amini
+@license:      GNU General Public License 2.0 or later
+@contact:      pedram.amini@gmail.com
+@organization: www.openrce.org
+"""
+
+import re
+import lzma
+import asyncio
+import time
+import zlib
+import socket
+import struct
+import collections
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from pydbg.errors import PDError
+
+# every frame is prefixed by an 8-byte little endian integer. the top byte flags
+# the compression of the payload, the remaining bytes hold the payload length.
+FRAME_HEADER = struct.Struct('<Q')
+FRAME_LENGTH_MASK = (1 << 56) - 1
+
+# refuse frames larger than this, before and after decompression. a corrupted header or a
+# decompression bomb would otherwise allocate the world. senders refuse to write larger frames
+# up front, which leaves the stream in sync. larger transfers have to be chunked.
+MAX_FRAME_SIZE = 64 << 20
+
+# compression name -> (frame flag, compress, decompressor factory).
+# decompressors are fed whole payloads through decompress(data, max_length) and flag the end of the stream with eof.
+COMPRESSIONS = {
+    'zlib': (1, lambda data: zlib.compress(data, 1), zlib.decompressobj),
+    'lzma': (2, lambda data: lzma.compress(data, preset=1), lambda: lzma.LZMADecompressor(lzma.FORMAT_XZ)),
+}
+
+DECOMPRESSORS = {flag: decompressor for (flag, compress, decompressor) in COMPRESSIONS.values()}
+
+# frames smaller than this are never compressed.
+COMPRESS_THRESHOLD = 0x1000
+
+# runs of differing bytes, see diff_runs().
+NON_ZERO_RUN = re.compile(b'[^\x00]+')
+
+
+class FrameCodec(object):
+    """Framing state shared by the blocking and asyncio channels
+
+    Once a compression was negotiated, frames above the threshold are sent
+    compressed if that makes them smaller. Compressed frames are flagged in
+    their header and always accepted.
+    """
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        """
+        @type  max_frame_size: Integer
+        @param max_frame_size: (Optional, def=MAX_FRAME_SIZE) Largest frame sent or accepted
+        """
+
+        self.max_frame_size = max_frame_size
+        self.compression = None  # name of the compression applied to sent frames, see set_compression()
+        self.compress_threshold = COMPRESS_THRESHOLD
+
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.bytes_saved = 0         # payload bytes not sent thanks to compression
+        self.compress_time = 0.0     # seconds spent compressing
+        self.decompress_time = 0.0   # seconds spent decompressing
+
+    def set_compression(self, compression, threshold: int = None):
+        """
+        Select the compression applied to sent frames.
+
+        @type  compression: String
+        @param compression: 'zlib', 'lzma' or None to send frames uncompressed
+        @type  threshold:   Integer
+        @param threshold:   (Optional, def=COMPRESS_THRESHOLD) Size under which frames are sent uncompressed
+        """
+
+        if compression and compression not in COMPRESSIONS:
+            raise PDError('unsupported compression {}'.format(compression))
+
+        self.compression = compression or None
+
+        if threshold is not None:
+            self.compress_threshold = threshold
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Byte and frame counters of both directions, bytes saved and time spent by compression.
+        """
+
+        return {
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'frames_sent': self.frames_sent,
+            'frames_received': self.frames_received,
+            'bytes_saved': self.bytes_saved,
+            'compress_time': self.compress_time,
+            'decompress_time': self.decompress_time,
+        }
+
+    def _frame(self, buffers):
+        """
+        Build the header and payload views of a frame out of the specified buffers, compressing them if worth it.
+        Payloads the peer would refuse, even once decompressed, are refused before anything is written.
+        """
+
+        views = [memoryview(buf).cast('B') for buf in buffers]
+        length = sum(len(view) for view in views)
+        flag = 0
+
+        if length > self.max_frame_size:
+            raise PDError('frame of {} bytes exceeds the {} bytes limit'.format(length, self.max_frame_size))
+
+        if self.compression and length >= self.compress_threshold:
+            (compress_flag, compress, decompressor) = COMPRESSIONS[self.compression]
+
+            started = time.perf_counter()
+            packed = compress(b''.join(views))
+            self.compress_time += time.perf_counter() - started
+
+            if len(packed) < length:
+                self.bytes_saved += length - len(packed)
+                views = [memoryview(packed)]
+                length = len(packed)
+                flag = compress_flag
+
+        views.insert(0, memoryview(FRAME_HEADER.pack(flag << 56 | length)))
+
+        self.bytes_sent += FRAME_HEADER.size + length
+        self.frames_sent += 1
+
+        return views
+
+    def _header(self, header):
+        """
+        Split a received frame header into its compression flag and payload length.
+        """
+
+        (header,) = FRAME_HEADER.unpack(header)
+        (flag, length) = (header >> 56, header & FRAME_LENGTH_MASK)
+
+        if length > self.max_frame_size:
+            raise PDError('frame of {} bytes exceeds the {} bytes limit'.format(length, self.max_frame_size))
+
+        if flag and flag not in DECOMPRESSORS:
+            raise PDError('frame compressed with unknown method {}'.format(flag))
+
+        return (flag, length)
+
+    def _payload(self, flag, view):
+        """
+        Account for a received payload and decompress it if flagged.
+        Decompressed payloads are held to the frame size limit too.
+        """
+
+        self.bytes_received += FRAME_HEADER.size + len(view)
+        self.frames_received += 1
+
+        if flag:
+            started = time.perf_counter()
+            decompressor = DECOMPRESSORS[flag]()
+
+            try:
+                data = decompressor.decompress(view, self.max_frame_size)
+            except (zlib.error, lzma.LZMAError) as err:
+                raise PDError('corrupted compressed frame: {}'.format(err))
+
+            # the stream must be over by now, else it either inflates past the limit or was cut short.
+            if not decompressor.eof:
+                raise PDError('compressed frame exceeds the {} bytes limit or is truncated'.format(self.max_frame_size))
+
+            view = memoryview(data)
+            self.decompress_time += time.perf_counter() - started
+
+        return view
+
+
+class Channel(FrameCodec):
+    """Length prefixed framing over a connected stream socket
+
+    Frames are sent with a single scatter / gather sendmsg() of the header
+    and payload where the platform supports it, and received with
+    recv_into() into a receive buffer that is reused across frames.
+    """
+
+    def __init__(self, sock, max_frame_size: int = MAX_FRAME_SIZE):
+        """
+        @type  sock:           socket
+        @param sock:           Connected stream socket
+        @type  max_frame_size: Integer
+        @param max_frame_size: (Optional, def=MAX_FRAME_SIZE) Largest frame sent or accepted
+        """
+
+        FrameCodec.__init__(self, max_frame_size)
+
+        self.sock = sock
+        self.buffer = bytearray(0x10000)  # receive buffer, grown on demand
+        self.header = bytearray(FRAME_HEADER.size)
+
+        # frames are written in one go, don't let small pipelined frames wait on delayed acks.
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (OSError, AttributeError):
+            pass
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, *buffers):
+        """
+        Send a single frame made of the concatenation of the specified buffers.
+
+        @type  buffers: Bytes-like objects
+        @param buffers: Payload pieces
+
+        @raise PDError: An exception is raised if the connection was severed or the frame is too large.
+        """
+
+        views = self._frame(buffers)
+
+        try:
+            if hasattr(self.sock, 'sendmsg'):
+                self._sendmsg_all(views)
+            else:
+                for view in views:
+                    self.sock.sendall(view)
+        except (OSError, ValueError):
+            raise PDError('connection severed')
+
+    def recv(self):
+        """
+        Receive a single frame.
+
+        @raise PDError: An exception is raised if the connection was severed or the frame is too large.
+        @rtype:     memoryview
+        @return:    Frame payload. The view is only valid until the next call to recv().
+        """
+
+        self._recv_into(memoryview(self.header))
+        (flag, length) = self._header(self.header)
+
+        if length > len(self.buffer):
+            self.buffer = bytearray(length)
+
+        view = memoryview(self.buffer)[:length]
+        self._recv_into(view)
+
+        return self._payload(flag, view)
+
+    def send_object(self, data):
+        """
+        Marshal and send arbitrary data as a single frame.
+
+        @type  data: Mixed
+        @param data: Data to marshal and transmit
+
+        @raise PDError: An exception is raised if the connection was severed.
+        """
+
+        self.send(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    def recv_object(self):
+        """
+        Receive and unmarshal a single frame.
+
+        @raise PDError: An exception is raised if the connection was severed.
+        @rtype:     Mixed
+        @return:    Whatever was sent by the peer.
+        """
+
+        view = self.recv()
+
+        try:
+            return pickle.loads(view)
+        finally:
+            view.release()
+
+    def _recv_into(self, view):
+        received = 0
+        length = len(view)
+
+        while received < length:
+            try:
+                count = self.sock.recv_into(view[received:], length - received)
+            except OSError:
+                raise PDError('connection severed')
+
+            if not count:
+                raise PDError('connection severed')
+
+            received += count
+
+    def _sendmsg_all(self, views):
+        views = [view for view in views if len(view)]
+
+        while views:
+            sent = self.sock.sendmsg(views)
+
+            # drop the fully sent buffers and trim the partially sent one.
+            while sent:
+                if sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
+
+
+class AsyncChannel(FrameCodec):
+    """Length prefixed framing over an asyncio stream, wire compatible with Channel"""
+
+    def __init__(self, reader, writer, max_frame_size: int = MAX_FRAME_SIZE):
+        """
+        @type  reader:         asyncio.StreamReader
+        @param reader:         Stream frames are read from
+        @type  writer:         asyncio.StreamWriter
+        @param writer:         Stream frames are written to
+        @type  max_frame_size: Integer
+        @param max_frame_size: (Optional, def=MAX_FRAME_SIZE) Largest frame sent or accepted
+        """
+
+        FrameCodec.__init__(self, max_frame_size)
+
+        self.reader = reader
+        self.writer = writer
+
+        sock = writer.get_extra_info('socket')
+
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except (OSError, AttributeError):
+                pass
+
+    async def close(self):
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+    async def send(self, *buffers):
+        """
+        Send a single frame made of the concatenation of the specified buffers.
+        Frames are queued whole, so concurrent senders never interleave.
+
+        @raise PDError: An exception is raised if the connection was severed or the frame is too large.
+        """
+
+        self.writer.writelines(self._frame(buffers))
+
+        try:
+            await self.writer.drain()
+        except OSError:
+            raise PDError('connection severed')
+
+    async def recv(self):
+        """
+        Receive a single frame.
+
+        @raise PDError: An exception is raised if the connection was severed or the frame is too large.
+        @rtype:     memoryview
+        @return:    Frame payload.
+        """
+
+        try:
+            (flag, length) = self._header(await self.reader.readexactly(FRAME_HEADER.size))
+            data = await self.reader.readexactly(length)
+        except (asyncio.IncompleteReadError, OSError):
+            raise PDError('connection severed')
+
+        return self._payload(flag, memoryview(data))
+
+    async def send_object(self, data):
+        await self.send(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def recv_object(self):
+        return pickle.loads(await self.recv())
+
+
+class Delta(object):
+    """
+    A value sent as the runs of bytes that changed since the previous value sent under
+    the same key, or in full when the peer does not hold a comparable previous value.
+    """
+
+    __slots__ = ('key', 'data', 'runs', 'structure')
+
+    def __init__(self, key, data=None, runs=None, structure=False):
+        self.key = key
+        self.data = data            # full value, or None
+        self.runs = runs            # list of (offset, bytes) runs, or None
+        self.structure = structure  # flag specifying that the value is a pydbg.codec encoded structure
+
+
+def diff_runs(previous, data):
+    """
+    @type  previous: Raw Bytes
+    @param previous: Previous value
+    @type  data:     Raw Bytes
+    @param data:     New value, of the same length
+
+    @rtype:  List
+    @return: List of (offset, bytes) runs where data differs from previous.
+    """
+
+    xored = (int.from_bytes(previous, 'little') ^ int.from_bytes(data, 'little')).to_bytes(len(data), 'little')
+
+    return [(match.start(), data[match.start():match.end()]) for match in NON_ZERO_RUN.finditer(xored)]
+
+
+class DeltaCodec(object):
+    """Delta encoding of values against the previous value the peer holds
+
+    Each side of a connection keeps the last values exchanged per key, the
+    sender through encode() and the receiver through decode(). Both caches
+    stay in sync as long as every Delta is decoded, in the order it was encoded.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        @type  max_entries: Integer
+        @param max_entries: (Optional, def=1024) Number of keys remembered, least recently used ones are dropped first
+        """
+
+        self.values = collections.OrderedDict()  # key -> last value
+        self.max_entries = max_entries
+
+        self.bytes_in = 0   # size of the values encoded or decoded
+        self.bytes_out = 0  # size of the values and runs actually shipped
+        self.time = 0.0     # seconds spent encoding and decoding
+
+    def encode(self, key, data, structure: bool = False):
+        """
+        @type  key:       Hashable
+        @param key:       Identity of the value, such as the address and length of a memory read
+        @type  data:      Bytes-like object
+        @param data:      Value to send
+        @type  structure: Bool
+        @param structure: (Optional, def=False) Flag specifying that data is a pydbg.codec encoded structure
+
+        @rtype:  Delta
+        @return: Delta to ship to the peer.
+        """
+
+        started = time.perf_counter()
+
+        data = bytes(data)
+        previous = self.values.get(key)
+        delta = Delta(key, data=data, structure=structure)
+        size = len(data)
+
+        if previous is not None and len(previous) == len(data):
+            runs = diff_runs(previous, data)
+            runs_size = sum(8 + len(run) for (offset, run) in runs)
+
+            # only worth it if it saves at least half.
+            if runs_size < len(data) // 2:
+                delta = Delta(key, runs=runs, structure=structure)
+                size = runs_size
+
+        self._remember(key, data)
+
+        self.bytes_in += len(data)
+        self.bytes_out += size
+        self.time += time.perf_counter() - started
+
+        return delta
+
+    def decode(self, delta):
+        """
+        @type  delta: Delta
+        @param delta: Delta received from the peer
+
+        @raise PDError: An exception is raised if the previous value is unknown.
+        @rtype:     Raw Bytes
+        @return:    Rebuilt value.
+        """
+
+        started = time.perf_counter()
+
+        if delta.runs is None:
+            data = delta.data
+            size = len(data)
+        else:
+            previous = self.values.get(delta.key)
+
+            if previous is None:
+                raise PDError('delta against unknown value {!r}'.format(delta.key))
+
+            value = bytearray(previous)
+
+            for (offset, run) in delta.runs:
+                value[offset:offset + len(run)] = run
+
+            data = bytes(value)
+            size = sum(8 + len(run) for (offset, run) in delta.runs)
+
+        self._remember(delta.key, data)
+
+        self.bytes_in += len(data)
+        self.bytes_out += size
+        self.time += time.perf_counter() - started
+
+        return data
+
+    def stats(self):
+        """
+        @rtype:  Dictionary
+        @return: Bytes encoded, bytes shipped and seconds spent.
+        """
+
+        return {'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out, 'time': self.time}
+
+    def clear(self):
+        """
+        Forget every value. Values are then sent in full, which the peer accepts whatever it holds,
+        so this is safe after a value was encoded but never made it to the peer.
+        """
+
+        self.values.clear()
+
+    def _remember(self, key, data):
+        self.values[key] = data
+        self.values.move_to_end(key)
+
+        while len(self.values) > self.max_entries:
+            self.values.popitem(last=False)
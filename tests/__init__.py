@@ -0,0 +1,36 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+PyDBG test suite, run with "python -m pytest tests" or "python -m unittest discover -s tests -t .".
+Benchmarks live next to the tests as bench_*.py, run them with "python -m tests.bench_<name>".
+
+The debuggee is an in-memory fake of the kernel32 routines PyDBG drives it through (see fake_process.py).
+Off Windows the package imports against the stand-ins conftest.py installs, which is imported here first so
+unittest and the benchmarks get them as well as pytest.
+"""
+
+import unittest
+
+import tests.conftest
+
+try:
+    import pydbg
+except (ImportError, AssertionError) as exception:
+    raise unittest.SkipTest('pydbg can not be imported on this platform: {!r}'.format(exception))
@@ -0,0 +1,111 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Cost of logging in the soft breakpoint handler.
+
+Each hit is the full restore cycle against the fake process: the EXCEPTION_BREAKPOINT event restoring the
+original byte, then the EXCEPTION_SINGLE_STEP event setting the breakpoint again, both dispatched through
+debug_event_iteration().
+
+    python -m tests.bench_breakpoint_logging
+"""
+
+import time
+
+import pydbg.pydbg
+from pydbg.defines import EXCEPTION_BREAKPOINT, EXCEPTION_DEBUG_EVENT, EXCEPTION_SINGLE_STEP
+from pydbg.logger import LOG_DEBUG, LOG_OFF
+
+from tests.fake_process import FakeProcess
+
+ADDRESS = 0x00401000
+HITS = 5000
+
+
+class NullStream(object):
+    def write(self, data):
+        pass
+
+
+def configure_stream(dbg):
+    dbg.logger.route_to_stream(NullStream())
+
+
+def configure_ring(dbg):
+    dbg.logger.route_to_ring(1024)
+
+
+def configure_override(dbg):
+    # scripts silencing PyDBG the traditional way, messages are formatted then dropped.
+    dbg._log = lambda msg: None
+
+
+def configure_off(dbg):
+    dbg.logger.set_level(LOG_OFF)
+
+
+def run(configure):
+    process = FakeProcess()
+    process.map(ADDRESS, b'\x90' * 0x1000)
+
+    with process.patch():
+        dbg = pydbg.pydbg.PyDBG()
+        dbg.h_process = 1
+        dbg.logger.set_level(LOG_DEBUG)
+        dbg.logger.route_to_stream(NullStream())
+        dbg.bp_set(ADDRESS)
+
+        configure(dbg)
+        started = time.perf_counter()
+
+        for _ in range(HITS):
+            process.queue_event(EXCEPTION_DEBUG_EVENT, EXCEPTION_BREAKPOINT, address=ADDRESS)
+            process.queue_event(EXCEPTION_DEBUG_EVENT, EXCEPTION_SINGLE_STEP, address=ADDRESS + 1)
+            dbg.debug_event_iteration()
+            dbg.debug_event_iteration()
+
+        elapsed = time.perf_counter() - started
+
+    # the breakpoint must have been restored after every hit.
+    if process.peek(ADDRESS, 1) != b'\xCC':
+        raise RuntimeError('breakpoint was not restored')
+
+    return elapsed / HITS
+
+
+def main():
+    print('{} breakpoint hits\n'.format(HITS))
+    print('{:<38} {:>10} {:>10}'.format('logging', 'us/hit', 'speedup'))
+
+    baseline = None
+
+    for (label, configure) in (
+            ('debug, written to a stream', configure_stream),
+            ('debug, kept in a ring buffer', configure_ring),
+            ('debug, _log replaced by a script', configure_override),
+            ('off', configure_off)):
+        per_hit = run(configure)
+        baseline = baseline or per_hit
+
+        print('{:<38} {:>10.2f} {:>9.2f}x'.format(label, per_hit * 1e6, baseline / per_hit))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Size and speed of the structures shipped over the wire, pydbg.codec against plain pickle.
+
+Plain pickle is the ctypes __reduce__, used when the codec's copyreg entries are bypassed. The last rows
+ship a stream of CONTEXTs differing in a few registers through DeltaCodec.
+
+    python -m tests.bench_codec
+"""
+
+import io
+import pickle
+import time
+
+from pydbg import codec
+from pydbg.defines import DEBUG_EVENT, MEMORY_BASIC_INFORMATION, MODULEENTRY32
+from pydbg.wire import DeltaCodec
+
+from tests.test_codec import sample_context
+
+ROUNDS = 20000
+
+
+def plain_dumps(obj):
+    stream = io.BytesIO()
+    pickler = pickle.Pickler(stream, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = {}  # bypass the codec's copyreg registrations
+    pickler.dump(obj)
+    return stream.getvalue()
+
+
+def codec_dumps(obj):
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+def timed(operation, argument):
+    started = time.perf_counter()
+
+    for _ in range(ROUNDS):
+        operation(argument)
+
+    return (time.perf_counter() - started) / ROUNDS
+
+
+def main():
+    module = MODULEENTRY32()
+    module.szModule = b'kernel32.dll'
+
+    print('{:<28} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+        'structure', 'pickle', 'codec', 'dump (us)', 'dump (us)', 'load (us)', 'load (us)'))
+    print('{:<28} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+        '', 'bytes', 'bytes', 'pickle', 'codec', 'pickle', 'codec'))
+
+    for obj in (sample_context(), DEBUG_EVENT(), MEMORY_BASIC_INFORMATION(), module):
+        packed = codec_dumps(obj)
+        row = [type(obj).__name__.lstrip('_')]
+
+        try:
+            plain = plain_dumps(obj)
+        except ValueError:
+            # structures holding pointers, such as DEBUG_EVENT, can't be pickled by ctypes.
+            row += ['-', len(packed), '-', timed(codec_dumps, obj) * 1e6, '-', timed(pickle.loads, packed) * 1e6]
+        else:
+            row += [len(plain), len(packed), timed(plain_dumps, obj) * 1e6, timed(codec_dumps, obj) * 1e6,
+                    timed(pickle.loads, plain) * 1e6, timed(pickle.loads, packed) * 1e6]
+
+        print('{:<28} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            *(cell if not isinstance(cell, float) else '{:.2f}'.format(cell) for cell in row)))
+
+    # single stepping through a function: EIP moves, a register or two change.
+    contexts = []
+
+    for i in range(ROUNDS):
+        context = sample_context(0x00401000 + i * 3)
+        context.Eax = i
+        contexts.append(codec.encode(context))
+
+    (sender, receiver) = (DeltaCodec(), DeltaCodec())
+    started = time.perf_counter()
+
+    for data in contexts:
+        receiver.decode(pickle.loads(codec_dumps(sender.encode(('context', 1), data, structure=True))))
+
+    elapsed = (time.perf_counter() - started) / ROUNDS
+    stats = sender.stats()
+
+    print('\n{} consecutive CONTEXTs through DeltaCodec: {:.1f} bytes each instead of {}, {:.2f} us round trip'.format(
+        ROUNDS, stats['bytes_out'] / ROUNDS, len(contexts[0]), elapsed * 1e6))
+
+
+if __name__ == '__main__':
+    main()
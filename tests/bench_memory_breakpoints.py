@@ -0,0 +1,102 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Memory breakpoint hit resolution and removal, linear scans against MemBreakpointIndex.
+
+The linear paths are the bp_is_ours_mem() / bp_del_mem() loops the index replaced, minus the kernel calls,
+which both paths issue alike. Operations are timed over a sample and reported per operation.
+
+    python -m tests.bench_memory_breakpoints
+"""
+
+import random
+import time
+
+from pydbg.breakpoints import MemBreakpoint, MemBreakpointIndex
+
+PAGE_SIZE = 0x1000
+BASE = 0x01000000
+COUNTS = (10, 1000, 100000)
+
+
+def linear_is_ours(breakpoints, address_to_check):
+    for address in breakpoints:
+        size = breakpoints[address].size
+
+        if address <= address_to_check <= address + size:
+            return address
+
+    return False
+
+
+def linear_delete(breakpoints, address):
+    size = breakpoints[address].size
+    del breakpoints[address]
+
+    end = address + size
+    end = end + PAGE_SIZE - (end % PAGE_SIZE)
+    released = []
+
+    for page in range(address - address % PAGE_SIZE, end, PAGE_SIZE):
+        for mem_bp in breakpoints.values():
+            if page <= mem_bp.address < page + PAGE_SIZE or page <= mem_bp.address + size < page + PAGE_SIZE:
+                break
+        else:
+            released.append(page)
+
+    return released
+
+
+def timed(operation, arguments):
+    started = time.perf_counter()
+
+    for argument in arguments:
+        operation(argument)
+
+    return (time.perf_counter() - started) / len(arguments)
+
+
+def main():
+    print('{:>8} {:>16} {:>16} {:>16} {:>16}'.format(
+        'bps', 'linear hit (us)', 'index hit (us)', 'linear del (us)', 'index del (us)'))
+
+    for count in COUNTS:
+        rng = random.Random(count)
+
+        # 64 byte buffers, four to a page, as a buffer tracking session lays them out.
+        buffers = [(BASE + i * 0x400, 0x40) for i in range(count)]
+        plain = {address: MemBreakpoint(address, size) for (address, size) in buffers}
+        index = MemBreakpointIndex(PAGE_SIZE, plain)
+
+        samples = max(10, min(1000, 1000000 // count))
+        probes = [rng.choice(buffers)[0] + rng.randrange(0x80) for _ in range(samples)]
+        victims = rng.sample([address for (address, size) in buffers], min(samples, count))
+
+        linear_hit = timed(lambda address: linear_is_ours(plain, address), probes)
+        index_hit = timed(index.find, probes)
+        linear_del = timed(lambda address: linear_delete(plain, address), victims)
+        index_del = timed(index.remove, victims)
+
+        print('{:>8} {:>16.2f} {:>16.2f} {:>16.2f} {:>16.2f}'.format(
+            count, linear_hit * 1e6, index_hit * 1e6, linear_del * 1e6, index_del * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Module lookups per second with 300 loaded modules, linear scans against the module map.
+
+The modules are loaded through LOAD_DLL_DEBUG_EVENTs against the fake process, as a debug session loads
+them. The linear paths are the scans of addr_to_module() / addr_to_dll() the module map replaced, minus
+the toolhelp snapshot addr_to_module() used to take on every call.
+
+    python -m tests.bench_module_map
+"""
+
+import random
+import time
+
+import pydbg.pydbg
+from pydbg.defines import LOAD_DLL_DEBUG_EVENT
+
+from tests.fake_process import FakeProcess
+from tests.test_module_map import map_image
+
+MODULES = 300
+LOOKUPS = 100000
+BASE = 0x10000000
+SIZE = 0x40000
+
+
+def linear_addr_to_module(modules, address):
+    for module in modules:
+        if module.base < address < module.base + module.size:
+            return module
+
+    return None
+
+
+def linear_addr_to_dll(system_dlls, address):
+    for dll in system_dlls:
+        if dll.base < address < dll.base + dll.size:
+            return dll
+
+    return None
+
+
+def timed(lookup, arguments):
+    started = time.perf_counter()
+
+    for argument in arguments:
+        lookup(argument)
+
+    return len(arguments) / (time.perf_counter() - started)
+
+
+def main():
+    process = FakeProcess()
+
+    with process.patch(), process.patch_system_dlls():
+        dbg = pydbg.pydbg.PyDBG()
+        dbg.h_process = 1
+        dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+
+        for i in range(MODULES):
+            base = BASE + i * SIZE
+            map_image(process, base, SIZE)
+
+            event = process.queue_event(LOAD_DLL_DEBUG_EVENT)
+            event.u.LoadDll.hFile = process.open_file('\\Device\\HarddiskVolume1\\mod{:03}.dll'.format(i).encode(), SIZE)
+            event.u.LoadDll.lpBaseOfDll = base
+            dbg.debug_event_iteration()
+
+        if len(dbg.module_map) != MODULES:
+            raise RuntimeError('{} modules loaded'.format(len(dbg.module_map)))
+
+        rng = random.Random(0)
+        addresses = [BASE + rng.randrange(MODULES * SIZE) for _ in range(LOOKUPS)]
+        names = ['MOD{:03}.DLL'.format(rng.randrange(MODULES)) for _ in range(LOOKUPS)]
+        modules = list(dbg.module_map)
+
+        print('{} modules, {} lookups\n'.format(MODULES, LOOKUPS))
+        print('{:<24} {:>16} {:>16} {:>10}'.format('lookup', 'linear (/s)', 'module map (/s)', 'speedup'))
+
+        for (label, linear, indexed, arguments) in (
+                ('addr_to_module()', lambda address: linear_addr_to_module(modules, address),
+                 dbg.addr_to_module, addresses),
+                ('addr_to_dll()', lambda address: linear_addr_to_dll(dbg.system_dlls, address),
+                 dbg.addr_to_dll, addresses),
+                ('module by name', lambda name: [m for m in modules if m.name.lower() == name.lower()],
+                 dbg.module_map.find_name, names)):
+            (slow, fast) = (timed(linear, arguments), timed(indexed, arguments))
+
+            print('{:<24} {:>16,.0f} {:>16,.0f} {:>9.1f}x'.format(label, slow, fast, fast / slow))
+
+
+if __name__ == '__main__':
+    main()
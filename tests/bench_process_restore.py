@@ -0,0 +1,103 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+process_restore() cost, full against incremental, as a function of the share of pages dirtied.
+
+A simulated address space is snapshotted once, then a fraction of its pages is modified before each
+restore. Incremental restores read every block back and only write the runs of changed pages, with the
+snapshot held as plain bytes and in a page store.
+
+    python -m tests.bench_process_restore
+"""
+
+import random
+import time
+
+import pydbg.pydbg
+from pydbg.mem_snapshot import PageStore
+
+from tests.fake_process import FakeProcess
+
+BASE = 0x01000000
+REGION_SIZE = 0x10000
+REGIONS = 256
+DIRTY_SHARES = (0.0, 0.01, 0.1, 1.0)
+ROUNDS = 5
+
+
+def debugger(process):
+    for index in range(REGIONS):
+        # regions mapped on their own, a page apart, so they are not merged.
+        process.map(BASE + index * (REGION_SIZE + 0x1000), bytes([index % 255 + 1]) * REGION_SIZE)
+
+    dbg = pydbg.pydbg.PyDBG()
+    dbg.h_process = 1
+    dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+
+    return dbg
+
+
+def dirty(process, share, rng):
+    pages = [BASE + index * (REGION_SIZE + 0x1000) + offset
+             for index in range(REGIONS) for offset in range(0, REGION_SIZE, process.page_size)]
+
+    for page in rng.sample(pages, int(len(pages) * share)):
+        process.poke(page + rng.randrange(process.page_size), b'\xCC')
+
+
+def run(share, incremental, store):
+    process = FakeProcess()
+    rng = random.Random(share)
+    elapsed = 0.0
+
+    with process.patch():
+        dbg = debugger(process)
+        dbg.process_snapshot(mem_only=True, store=PageStore(process.page_size) if store else None)
+
+        for _ in range(ROUNDS):
+            dirty(process, share, rng)
+            process.calls.clear()
+
+            started = time.perf_counter()
+            dbg.process_restore(incremental=incremental)
+            elapsed += time.perf_counter() - started
+
+    return (elapsed / ROUNDS, dbg.last_restore['pages_written'], process.calls['WriteProcessMemory'])
+
+
+def main():
+    modes = (('full', False, False), ('incremental', True, False), ('incr+store', True, True))
+
+    print('{} regions of {} KiB, ms per restore (pages written / WriteProcessMemory calls)\n'
+          .format(REGIONS, REGION_SIZE >> 10))
+    print('{:>8}'.format('dirty') + ''.join('{:>26}'.format(name) for (name, incremental, store) in modes))
+
+    for share in DIRTY_SHARES:
+        row = []
+
+        for (name, incremental, store) in modes:
+            (seconds, pages, writes) = run(share, incremental, store)
+            row.append('{:.1f} ({}/{})'.format(seconds * 1e3, pages, writes))
+
+        print('{:>7.0%} '.format(share) + ''.join('{:>26}'.format(cell) for cell in row))
+
+
+if __name__ == '__main__':
+    main()
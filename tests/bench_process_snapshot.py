@@ -0,0 +1,106 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+process_snapshot() throughput against region and worker counts.
+
+Every ReadProcessMemory() of the fake process sleeps for a fixed latency, standing in for the kernel
+copying pages out of a large target, so concurrent reads overlap as they do against a real debuggee.
+The peak Python allocations of a snapshot taken into a page store show the buffers held in flight.
+
+    python -m tests.bench_process_snapshot
+"""
+
+import time
+import tracemalloc
+
+import pydbg.pydbg
+from pydbg.mem_snapshot import PageStore
+
+from tests.fake_process import FakeProcess
+
+BASE = 0x01000000
+REGION_SIZE = 0x10000
+LATENCY = 0.0005
+REGION_COUNTS = (64, 256, 1024)
+WORKER_COUNTS = (0, 1, 4, 16)
+
+
+def debugger(process, regions):
+    for index in range(regions):
+        # regions mapped on their own, a page apart, so they are not merged.
+        process.map(BASE + index * (REGION_SIZE + 0x1000), bytes([index % 255 + 1]) * REGION_SIZE)
+
+    dbg = pydbg.pydbg.PyDBG()
+    dbg.h_process = 1
+    dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+
+    return dbg
+
+
+def run(regions, workers):
+    process = FakeProcess()
+    process.read_latency = LATENCY
+
+    with process.patch():
+        dbg = debugger(process, regions)
+
+        started = time.perf_counter()
+        dbg.process_snapshot(mem_only=True, workers=workers)
+        elapsed = time.perf_counter() - started
+
+    if len(dbg.memory_snapshot_blocks) != regions:
+        raise RuntimeError('{} blocks taken'.format(len(dbg.memory_snapshot_blocks)))
+
+    return elapsed
+
+
+def peak(regions, workers):
+    process = FakeProcess()
+
+    with process.patch():
+        dbg = debugger(process, regions)
+
+        tracemalloc.start()
+        dbg.process_snapshot(mem_only=True, store=PageStore(process.page_size), workers=workers)
+        (current, highest) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return highest
+
+
+def main():
+    print('{} KiB regions, {:.1f} ms per read, MiB/s\n'.format(REGION_SIZE >> 10, LATENCY * 1e3))
+    print('{:>8}'.format('regions') + ''.join('{:>12}'.format('workers={}'.format(w)) for w in WORKER_COUNTS))
+
+    for regions in REGION_COUNTS:
+        mib = regions * REGION_SIZE / (1 << 20)
+        row = [mib / run(regions, workers) for workers in WORKER_COUNTS]
+
+        print('{:>8}'.format(regions) + ''.join('{:>12.0f}'.format(rate) for rate in row))
+
+    regions = REGION_COUNTS[-1]
+    print('\npeak allocations, {} regions ({} MiB) into a page store\n'.format(regions, regions * REGION_SIZE >> 20))
+
+    for workers in WORKER_COUNTS:
+        print('{:>12} {:>10.1f} MiB'.format('workers={}'.format(workers), peak(regions, workers) / (1 << 20)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Kernel calls per read_process_memory(), with and without protection aware reads.
+
+Reads 4 byte values scattered over readable memory, as dump_context_list() and smart_dereference() do, plus
+a share of reads of a guarded page that still needs its protection flipped. The page cache is left disabled
+so every read reaches the backend.
+
+    python -m tests.bench_protection_aware_reads
+"""
+
+import random
+import time
+
+import pydbg.pydbg
+from pydbg.defines import PAGE_GUARD, PAGE_READWRITE
+
+from tests.fake_process import PAGE_SIZE, FakeProcess
+
+BASE = 0x00400000
+PAGES = 64
+READS = 20000
+GUARDED_SHARE = 0.05
+
+
+def run(protection_aware, region_map):
+    process = FakeProcess()
+    process.map(BASE, size=PAGES * PAGE_SIZE, protection=PAGE_READWRITE)
+    process.map(BASE + PAGES * PAGE_SIZE, size=PAGE_SIZE, protection=PAGE_READWRITE | PAGE_GUARD)
+
+    rng = random.Random(0)
+    addresses = [BASE + PAGES * PAGE_SIZE + rng.randrange(PAGE_SIZE - 4) if rng.random() < GUARDED_SHARE
+                 else BASE + rng.randrange(PAGES * PAGE_SIZE - 4) for _ in range(READS)]
+
+    with process.patch():
+        dbg = pydbg.pydbg.PyDBG()
+        dbg.h_process = 1
+        dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+        dbg.protection_aware_reads = protection_aware
+
+        # the region map lives for the duration of a debug event, as the page cache does.
+        if region_map:
+            dbg._region_map.enable()
+
+        process.calls.clear()
+        started = time.perf_counter()
+
+        for address in addresses:
+            dbg.read_process_memory(address, 4)
+
+        elapsed = time.perf_counter() - started
+
+    return (process.calls, dbg.counters, elapsed)
+
+
+def main():
+    print('{} reads of 4 bytes, {:.0%} of them from a guarded page\n'.format(READS, GUARDED_SHARE))
+    print('{:<34} {:>8} {:>8} {:>8} {:>8} {:>10} {:>10}'.format(
+        'mode', 'read', 'protect', 'query', 'calls', 'avoided', 'us/read'))
+
+    for (label, protection_aware, region_map) in (
+            ('always flip protections', False, False),
+            ('protection aware', True, False),
+            ('protection aware, region map', True, True)):
+        (calls, counters, elapsed) = run(protection_aware, region_map)
+
+        print('{:<34} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f} {:>10} {:>10.2f}'.format(
+            label,
+            calls['ReadProcessMemory'] / READS,
+            calls['VirtualProtectEx'] / READS,
+            calls['VirtualQueryEx'] / READS,
+            sum(calls.values()) / READS,
+            counters['virtual_protect_avoided'],
+            elapsed / READS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
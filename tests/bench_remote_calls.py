@@ -0,0 +1,163 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Synchronous, batched and pipelined PyDBGClient calls over loopback TCP with injected latency.
+
+The client reaches a PyDBGServer backed by the stub PyDBG of tests/test_pydbg_server.py through a proxy
+delaying every chunk by a fixed one-way latency, in both directions. The workload is the one of a remote
+breakpoint callback: 20 stack slot reads and 8 register reads.
+
+    python -m tests.bench_remote_calls
+"""
+
+import queue
+import socket
+import threading
+import time
+
+from pydbg.pydbg_client import PyDBGClient
+
+from tests.test_pydbg_server import StubPyDBG, StubServer
+
+LATENCIES = (0.0, 0.0005, 0.002, 0.010)  # one-way, in seconds
+ROUNDS = 5
+STACK = 0x0012F000
+REGISTERS = ('EAX', 'EBX', 'ECX', 'EDX', 'ESI', 'EDI', 'EBP', 'ESP')
+
+
+class RegisterStubPyDBG(StubPyDBG):
+    def get_register(self, register):
+        return REGISTERS.index(register)
+
+
+class LatencyProxy(object):
+    """Loopback TCP proxy delivering every chunk it forwards a fixed delay after it was received"""
+
+    def __init__(self, target, delay):
+        self.target = target
+        self.delay = delay
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.address = self.listener.getsockname()
+
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        (client, address) = self.listener.accept()
+        server = socket.create_connection(self.target)
+
+        for sock in (client, server):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._pump(client, server)
+        self._pump(server, client)
+
+    def _pump(self, source, destination):
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(0x100000)
+                except OSError:
+                    data = b''
+
+                chunks.put((time.perf_counter() + self.delay, data))
+
+                if not data:
+                    break
+
+        def write():
+            while True:
+                (deadline, data) = chunks.get()
+                wait = deadline - time.perf_counter()
+
+                if wait > 0:
+                    time.sleep(wait)
+
+                if not data:
+                    try:
+                        destination.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    break
+
+                destination.sendall(data)
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def synchronous(dbg):
+    slots = [dbg.read_process_memory(STACK + i * 4, 4) for i in range(20)]
+    registers = [dbg.get_register(register) for register in REGISTERS]
+    return (slots, registers)
+
+
+def batched(dbg):
+    with dbg.batch() as batch:
+        slots = [batch.read_process_memory(STACK + i * 4, 4) for i in range(20)]
+        registers = [batch.get_register(register) for register in REGISTERS]
+
+    return ([slot.result() for slot in slots], [register.result() for register in registers])
+
+
+def pipelined(dbg):
+    with dbg.pipeline() as pipe:
+        slots = [pipe.read_process_memory(STACK + i * 4, 4) for i in range(20)]
+        registers = [pipe.get_register(register) for register in REGISTERS]
+
+    return ([slot.result() for slot in slots], [register.result() for register in registers])
+
+
+def main():
+    stub = StubServer()
+    stub.factory = lambda: RegisterStubPyDBG()
+    stub.server.pydbg_factory = stub.factory
+
+    print('{} calls per hit, {} hits per mode\n'.format(20 + len(REGISTERS), ROUNDS))
+    print('{:>12} {:>16} {:>16} {:>16}'.format('latency (ms)', 'sync (ms/hit)', 'batch (ms/hit)', 'pipe (ms/hit)'))
+
+    try:
+        for latency in LATENCIES:
+            proxy = LatencyProxy(stub.server.server_address, latency)
+            dbg = PyDBGClient(*proxy.address)
+            expected = synchronous(dbg)
+            timings = []
+
+            for mode in (synchronous, batched, pipelined):
+                started = time.perf_counter()
+
+                for _ in range(ROUNDS):
+                    if mode(dbg) != expected:
+                        raise RuntimeError('{} returned different results'.format(mode.__name__))
+
+                timings.append((time.perf_counter() - started) / ROUNDS)
+
+            dbg.sock.close()
+
+            print('{:>12.1f} {:>16.2f} {:>16.2f} {:>16.2f}'.format(latency * 1e3, *(t * 1e3 for t in timings)))
+    finally:
+        stub.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Snapshot file save, load and restore throughput.
+
+The snapshot is taken of 64 KiB regions of the fake process and saved with process_snapshot_save().
+Loading is process_snapshot_load(), which validates and maps the file, restoring is a full
+process_restore() streaming the blocks from the mapping, against the same restore of the in memory
+snapshot it was saved from.
+
+    python -m tests.bench_snapshot_file
+"""
+
+import os
+import tempfile
+import time
+
+import pydbg.pydbg
+
+from tests.fake_process import FakeProcess
+
+BASE = 0x01000000
+REGION_SIZE = 0x10000
+SIZES = (4 << 20, 16 << 20, 64 << 20)
+
+
+def timed(operation):
+    started = time.perf_counter()
+    operation()
+    return time.perf_counter() - started
+
+
+def run(size, path):
+    process = FakeProcess()
+
+    for address in range(BASE, BASE + size, REGION_SIZE):
+        process.map(address, os.urandom(256) * (REGION_SIZE // 256))
+
+    with process.patch():
+        dbg = pydbg.pydbg.PyDBG()
+        dbg.h_process = 1
+        dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+        dbg.enumerate_threads = lambda: []
+
+        dbg.process_snapshot(mem_only=True)
+
+        save = timed(lambda: dbg.process_snapshot_save(path))
+        restore_memory = timed(dbg.process_restore)
+        load = timed(lambda: dbg.process_snapshot_load(path))
+        restore_file = timed(dbg.process_restore)
+
+        if len(dbg.memory_snapshot_blocks) != size // REGION_SIZE:
+            raise RuntimeError('{} blocks loaded'.format(len(dbg.memory_snapshot_blocks)))
+
+        dbg.process_snapshot(mem_only=True)
+
+    return (save, load, restore_memory, restore_file)
+
+
+def main():
+    print('{} byte regions, MiB/s\n'.format(REGION_SIZE))
+    print('{:>8} {:>10} {:>10} {:>16} {:>16}'.format('MiB', 'save', 'load', 'restore memory', 'restore file'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'snapshot')
+
+        for size in SIZES:
+            mib = size / (1 << 20)
+            (save, load, restore_memory, restore_file) = run(size, path)
+
+            print('{:>8.0f} {:>10.0f} {:>10.0f} {:>16.0f} {:>16.0f}'.format(
+                mib, mib / save, mib / load, mib / restore_memory, mib / restore_file))
+
+
+if __name__ == '__main__':
+    main()
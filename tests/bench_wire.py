@@ -0,0 +1,67 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Round trip throughput of Channel framing over loopback TCP.
+
+Each payload is sent by the client, echoed back whole by a peer thread and received again, so every byte
+crosses the socket twice. Throughput is reported as payload bytes moved in both directions per second.
+
+    python -m tests.bench_wire
+"""
+
+import os
+import time
+
+from tests.test_wire import Loopback
+
+SIZES = (0x1000, 0x10000, 1 << 20, 8 << 20, 32 << 20)
+BYTES_PER_SIZE = 512 << 20
+
+
+def main():
+    loopback = Loopback()
+
+    print('{:>12} {:>8} {:>14} {:>12}'.format('payload', 'frames', 'us/round trip', 'MB/s'))
+
+    try:
+        for size in SIZES:
+            payload = os.urandom(size)
+            rounds = max(4, BYTES_PER_SIZE // size // 2)
+
+            # first round grows the receive buffers.
+            loopback.client.send(payload)
+            loopback.client.recv()
+
+            started = time.perf_counter()
+
+            for _ in range(rounds):
+                loopback.client.send(payload)
+                loopback.client.recv()
+
+            elapsed = time.perf_counter() - started
+
+            print('{:>12} {:>8} {:>14.1f} {:>12.1f}'.format(
+                size, rounds, elapsed / rounds * 1e6, 2 * size * rounds / elapsed / 1e6))
+    finally:
+        loopback.close()
+
+
+if __name__ == '__main__':
+    main()
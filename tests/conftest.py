@@ -0,0 +1,107 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+Lets the pydbg package import off Windows, so the suite runs anywhere.
+
+Installed before pydbg is first imported, by the tests package itself so that "python -m unittest" and the
+benchmarks get it too:
+
+    - ctypes.windll, a stand-in whose routines do nothing and return 0. Tests patch FakeProcess over the
+      kernel32 of the modules they drive.
+    - pydasm, an empty module, disassembly is not exercised.
+    - pydbg.windows_h compiled without its assert statements when the native layouts are not the 32-bit
+      Windows ones, ex: a DWORD is 8 bytes on 64-bit Linux. The structures keep the native layouts.
+
+On Windows nothing is installed.
+"""
+
+import ctypes
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import types
+
+WINDOWS_H = 'pydbg.windows_h'
+
+
+class StubRoutine(object):
+    def __init__(self, name):
+        self.__name__ = name
+        self.restype = None
+        self.argtypes = None
+
+    def __call__(self, *args):
+        return 0
+
+
+class StubDLL(object):
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        routine = StubRoutine(name)
+        setattr(self, name, routine)
+        return routine
+
+
+class StubWinDLL(object):
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        dll = StubDLL()
+        setattr(self, name, dll)
+        return dll
+
+
+class NoAssertLoader(importlib.machinery.SourceFileLoader):
+    """Source loader stripping assert statements, bytecode is neither read from nor written to __pycache__."""
+
+    def get_code(self, fullname):
+        source = self.get_data(self.path)
+        return compile(source, self.path, 'exec', dont_inherit=True, optimize=1)
+
+
+class NoAssertFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if fullname != WINDOWS_H or not path:
+            return None
+
+        location = os.path.join(path[0], 'windows_h.py')
+        return importlib.util.spec_from_file_location(fullname, location, loader=NoAssertLoader(fullname, location))
+
+
+def install():
+    if not hasattr(ctypes, 'windll'):
+        ctypes.windll = StubWinDLL()
+
+    try:
+        import pydasm
+    except ImportError:
+        sys.modules['pydasm'] = types.ModuleType('pydasm')
+
+    if ctypes.sizeof(ctypes.c_ulong) != 4 or ctypes.sizeof(ctypes.c_void_p) != 4:
+        if not any(isinstance(finder, NoAssertFinder) for finder in sys.meta_path):
+            sys.meta_path.insert(0, NoAssertFinder())
+
+
+install()
@@ -0,0 +1,373 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+"""
+In-memory debuggee for the test suite and benchmarks.
+
+FakeProcess implements the kernel32 routines PyDBG drives a debuggee through, over a page table held in
+Python, and counts every call. Patch it in place of pydbg.pydbg.kernel32 (see FakeProcess.patch() and
+DebuggerTestCase) and PyDBG runs unmodified against it.
+"""
+
+import bisect
+import collections
+import ctypes
+import gc
+import time
+import unittest
+from unittest import mock
+
+import pydbg.pydbg
+import pydbg.systemdll
+from pydbg.defines import (
+    DEBUG_EVENT, MEM_COMMIT, MEM_FREE, MEM_PRIVATE, PAGE_GUARD, PAGE_NOACCESS, PAGE_READWRITE,
+)
+
+PAGE_SIZE = 0x1000
+HIGHEST_ADDRESS = 0x80000000
+
+
+class FakeProcess(object):
+    """Fake kernel32 serving a single debuggee"""
+
+    def __init__(self, page_size: int = PAGE_SIZE):
+        self.page_size = page_size
+        self.pages = {}          # page base -> bytearray
+        self.protections = {}    # page base -> protection
+        self.bases = []          # sorted page bases, for VirtualQueryEx()
+        self.allocations = {}    # page base -> base of the region it was mapped with
+        self.events = collections.deque()  # DEBUG_EVENT objects handed out by WaitForDebugEvent()
+        self.calls = collections.Counter()
+        self.read_latency = 0    # seconds ReadProcessMemory() sleeps for, simulating a slow target
+        self.continued = []      # continue statuses passed to ContinueDebugEvent()
+        self.files = {}          # file handle -> (ANSI device path, size), see open_file()
+        self.mapped_file = None  # handle of the file mapped last
+        self.thread_handles = {}  # handle -> thread id, of the handles OpenThread() returned and not yet closed
+        self.opened_threads = 0   # number of handles OpenThread() returned
+        self.threads = [1]        # ids of the debuggee threads, listed by the toolhelp routines
+        self.snapshots = {}       # toolhelp snapshot handle -> [thread ids, position of the next entry]
+
+    def map(self, address: int, data=b'', size: int = 0, protection: int = PAGE_READWRITE):
+        """
+        Map a region of committed memory.
+
+        @type  address:    DWORD
+        @param address:    Page aligned base of the region
+        @type  data:       Raw Bytes
+        @param data:       (Optional) Initial content, the rest of the region is zero filled
+        @type  size:       Integer
+        @param size:       (Optional, def=len(data) rounded up to a page) Size of the region
+        @type  protection: DWORD
+        @param protection: (Optional, def=PAGE_READWRITE) Protection of every page of the region
+        """
+
+        size = size or -(-len(data) // self.page_size) * self.page_size
+
+        for page in range(address, address + size, self.page_size):
+            if page not in self.pages:
+                bisect.insort(self.bases, page)
+
+            self.pages[page] = bytearray(self.page_size)
+            self.protections[page] = protection
+            self.allocations[page] = address
+
+        self.poke(address, data)
+
+    def peek(self, address: int, length: int):
+        """Read mapped memory, bypassing protections and counters."""
+
+        data = bytearray()
+
+        while length:
+            page = address & ~(self.page_size - 1)
+            chunk = min(length, page + self.page_size - address)
+            data += self.pages[page][address - page:address - page + chunk]
+            (address, length) = (address + chunk, length - chunk)
+
+        return bytes(data)
+
+    def poke(self, address: int, data):
+        """Write mapped memory, bypassing protections and counters."""
+
+        data = bytes(data)
+
+        while data:
+            page = address & ~(self.page_size - 1)
+            chunk = min(len(data), page + self.page_size - address)
+            self.pages[page][address - page:address - page + chunk] = data[:chunk]
+            (address, data) = (address + chunk, data[chunk:])
+
+    def open_file(self, path: bytes, size: int = PAGE_SIZE):
+        """
+        Open a file, as the handles handed out by CREATE_PROCESS / LOAD_DLL debug events.
+
+        @type  path: Raw Bytes
+        @param path: Device path GetMappedFileNameA() reports, ex: \\Device\\HarddiskVolume1\\WINDOWS\\system32\\ntdll.dll
+        @type  size: Integer
+        @param size: (Optional, def=PAGE_SIZE) File size
+
+        @rtype:  HANDLE
+        @return: File handle.
+        """
+
+        handle = 0x1000 + 4 * len(self.files)
+        self.files[handle] = (path, size)
+        return handle
+
+    def patch(self):
+        """
+        @rtype:  Context Manager
+        @return: Patcher standing this process in for kernel32 in pydbg.pydbg.
+        """
+
+        return mock.patch.object(pydbg.pydbg, 'kernel32', self)
+
+    def patch_system_dlls(self):
+        """
+        @rtype:  Context Manager
+        @return: Patcher standing this process in for kernel32 and psapi in pydbg.systemdll.
+        """
+
+        return mock.patch.multiple(pydbg.systemdll, kernel32=self, psapi=self)
+
+    def _readable(self, page):
+        protection = self.protections.get(page)
+
+        return protection is not None and not protection & (PAGE_GUARD | PAGE_NOACCESS)
+
+    # kernel32 routines, arguments are the ctypes objects PyDBG passes.
+
+    def __getattr__(self, name):
+        # routines the tests do not care about succeed and do nothing.
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def routine(*args):
+            self.calls[name] += 1
+            return 1
+
+        return routine
+
+    # file mapping routines. views are left to the generic routine, SystemDLL sets MapViewOfFile.restype,
+    # so the name reported is the one of the file mapped last.
+
+    def GetFileSize(self, handle, size_high):
+        self.calls['GetFileSize'] += 1
+        return self.files[handle][1]
+
+    def CreateFileMappingA(self, handle, attributes, protection, size_high, size_low, name):
+        self.calls['CreateFileMappingA'] += 1
+
+        if handle not in self.files:
+            return 0
+
+        self.mapped_file = handle
+        return handle
+
+    def GetMappedFileNameA(self, process, address, filename, size):
+        self.calls['GetMappedFileNameA'] += 1
+        filename._obj.value = self.files[self.mapped_file][0]
+        return len(filename._obj.value)
+
+    def GetSystemInfo(self, system_info):
+        self.calls['GetSystemInfo'] += 1
+        system_info._obj.dwPageSize = self.page_size
+
+    def ReadProcessMemory(self, handle, address, buffer, length, count):
+        self.calls['ReadProcessMemory'] += 1
+
+        if self.read_latency:
+            time.sleep(self.read_latency)
+
+        # copy the readable prefix of the range, like the kernel does.
+        read = 0
+
+        while read < length and self._readable((address + read) & ~(self.page_size - 1)):
+            page = (address + read) & ~(self.page_size - 1)
+            read += min(length - read, page + self.page_size - address - read)
+
+        count._obj.value = read
+
+        if not read:
+            return 0
+
+        ctypes.memmove(buffer, self.peek(address, read), read)
+        return 1
+
+    def WriteProcessMemory(self, handle, address, data, length, count):
+        self.calls['WriteProcessMemory'] += 1
+
+        if any((page & ~(self.page_size - 1)) not in self.pages for page in range(address, address + length, self.page_size)):
+            count._obj.value = 0
+            return 0
+
+        self.poke(address, ctypes.string_at(data, length))
+        count._obj.value = length
+        return 1
+
+    def VirtualProtectEx(self, handle, address, size, protection, old_protection):
+        self.calls['VirtualProtectEx'] += 1
+        first = address & ~(self.page_size - 1)
+
+        if first not in self.protections:
+            return 0
+
+        old_protection._obj.value = self.protections[first]
+
+        for page in range(first, address + max(size, 1), self.page_size):
+            if page in self.protections:
+                self.protections[page] = protection
+
+        return 1
+
+    def VirtualQueryEx(self, handle, address, mbi, size):
+        self.calls['VirtualQueryEx'] += 1
+
+        if address >= HIGHEST_ADDRESS:
+            return 0
+
+        mbi = mbi._obj
+        page = address & ~(self.page_size - 1)
+        position = bisect.bisect_left(self.bases, page)
+
+        if page not in self.pages:
+            # free memory runs up to the next mapped page.
+            end = self.bases[position] if position < len(self.bases) else HIGHEST_ADDRESS
+            (mbi.BaseAddress, mbi.AllocationBase, mbi.RegionSize) = (page, 0, end - page)
+            (mbi.State, mbi.Protect, mbi.AllocationProtect, mbi.Type) = (MEM_FREE, PAGE_NOACCESS, 0, 0)
+            return ctypes.sizeof(mbi)
+
+        (allocation, protection) = (self.allocations[page], self.protections[page])
+        (start, end) = (page, page + self.page_size)
+
+        while self.allocations.get(start - self.page_size) == allocation and \
+                self.protections[start - self.page_size] == protection:
+            start -= self.page_size
+
+        while self.allocations.get(end) == allocation and self.protections[end] == protection:
+            end += self.page_size
+
+        (mbi.BaseAddress, mbi.AllocationBase, mbi.RegionSize) = (start, allocation, end - start)
+        (mbi.State, mbi.Protect, mbi.AllocationProtect, mbi.Type) = (MEM_COMMIT, protection, protection, MEM_PRIVATE)
+        return ctypes.sizeof(mbi)
+
+    def WaitForDebugEvent(self, dbg, timeout):
+        self.calls['WaitForDebugEvent'] += 1
+
+        if not self.events:
+            return 0
+
+        event = self.events.popleft()
+        ctypes.memmove(ctypes.addressof(dbg._obj), ctypes.addressof(event), ctypes.sizeof(DEBUG_EVENT))
+        return 1
+
+    def OpenThread(self, access, inherit, thread_id):
+        self.calls['OpenThread'] += 1
+        self.opened_threads += 1
+
+        # handles are never reused, so a stale one is told apart from a fresh one.
+        handle = 0x10000 + 4 * self.opened_threads
+        self.thread_handles[handle] = thread_id
+        return handle
+
+    def CloseHandle(self, handle):
+        self.calls['CloseHandle'] += 1
+        self.thread_handles.pop(handle, None)
+        self.snapshots.pop(handle, None)
+        return 1
+
+    # toolhelp routines, threads only. the debuggee threads are listed as of the snapshot.
+
+    def CreateToolhelp32Snapshot(self, flags, pid):
+        self.calls['CreateToolhelp32Snapshot'] += 1
+
+        handle = 0x20000 + 4 * self.calls['CreateToolhelp32Snapshot']
+        self.snapshots[handle] = [list(self.threads), 0]
+        return handle
+
+    def Thread32First(self, snapshot, entry):
+        self.calls['Thread32First'] += 1
+        self.snapshots[snapshot][1] = 0
+        return self._thread_entry(snapshot, entry._obj)
+
+    def Thread32Next(self, snapshot, entry):
+        self.calls['Thread32Next'] += 1
+        return self._thread_entry(snapshot, entry._obj)
+
+    def _thread_entry(self, snapshot, entry):
+        (threads, position) = self.snapshots[snapshot]
+
+        if position == len(threads):
+            return 0
+
+        (entry.th32OwnerProcessID, entry.th32ThreadID) = (1, threads[position])
+        self.snapshots[snapshot][1] += 1
+        return 1
+
+    def ContinueDebugEvent(self, pid, thread_id, continue_status):
+        self.calls['ContinueDebugEvent'] += 1
+        self.continued.append(continue_status)
+        return 1
+
+    def queue_event(self, event_code: int, exception_code: int = 0, thread_id: int = 1, address: int = 0):
+        """
+        Queue a debug event for WaitForDebugEvent().
+
+        @type  event_code:     DWORD
+        @param event_code:     Debug event code, ex: EXCEPTION_DEBUG_EVENT
+        @type  exception_code: DWORD
+        @param exception_code: (Optional) Exception code of exception events
+        @type  thread_id:      DWORD
+        @param thread_id:      (Optional, def=1) Id of the thread raising the event
+        @type  address:        DWORD
+        @param address:        (Optional) Exception address
+
+        @rtype:  DEBUG_EVENT
+        @return: Queued event.
+        """
+
+        dbg = DEBUG_EVENT()
+        dbg.dwDebugEventCode = event_code
+        dbg.dwProcessId = 1
+        dbg.dwThreadId = thread_id
+        dbg.u.Exception.ExceptionRecord.ExceptionCode = exception_code
+        dbg.u.Exception.ExceptionRecord.ExceptionAddress = address
+        self.events.append(dbg)
+
+        # for the callers filling in the other event types.
+        return dbg
+
+
+class DebuggerTestCase(unittest.TestCase):
+    """Test case providing self.process, a FakeProcess, and self.dbg, a PyDBG attached to it"""
+
+    def setUp(self):
+        self.process = FakeProcess()
+        for patcher in (self.process.patch(), self.process.patch_system_dlls()):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.dbg = pydbg.pydbg.PyDBG()
+        self.dbg.pid = 1
+        self.dbg.h_process = 1
+        self.dbg.logger.set_level(pydbg.pydbg.LOG_OFF)
+
+        # SystemDLL objects close their handle when collected, let them do so while this process is patched in.
+        self.addCleanup(gc.collect)
+        self.addCleanup(delattr, self, 'dbg')
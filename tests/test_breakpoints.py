@@ -0,0 +1,108 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+
+from pydbg.defines import PAGE_EXECUTE_READ
+from pydbg.errors import PDError
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00401000
+CODE = bytes(range(256)) * (2 * PAGE_SIZE // 256)
+
+# three breakpoints on the first page, two on the second.
+ADDRESSES = [BASE + 0x10, BASE + 0x20, BASE + 0x30, BASE + PAGE_SIZE + 0x40, BASE + PAGE_SIZE + 0x50]
+
+
+class BulkBreakpointTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.process.map(BASE, CODE, protection=PAGE_EXECUTE_READ)
+
+    def fail_writes_to(self, page):
+        """Make WriteProcessMemory() fail for the specified page only."""
+
+        write = self.process.WriteProcessMemory
+
+        def failing(handle, address, data, length, count):
+            if address - address % PAGE_SIZE == page:
+                count._obj.value = 0
+                return 0
+
+            return write(handle, address, data, length, count)
+
+        self.process.WriteProcessMemory = failing
+
+    def test_set_patches_each_page_once(self):
+        self.process.calls.clear()
+        self.dbg.bp_set(list(ADDRESSES))
+
+        self.assertEqual(sorted(self.dbg.breakpoints), ADDRESSES)
+        self.assertEqual(self.process.calls['ReadProcessMemory'], 2)
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 2)
+        # one protection flip and one restore per page.
+        self.assertEqual(self.process.calls['VirtualProtectEx'], 2 * 2)
+        self.assertEqual(self.process.protections[BASE], PAGE_EXECUTE_READ)
+
+        for address in ADDRESSES:
+            self.assertEqual(self.process.peek(address, 1), b'\xCC')
+            self.assertEqual(self.dbg.breakpoints[address].original_byte, CODE[address - BASE:address - BASE + 1])
+
+    def test_failed_set_restores_memory_and_records_nothing(self):
+        self.fail_writes_to(BASE + PAGE_SIZE)
+
+        with self.assertRaises(PDError):
+            self.dbg.bp_set(list(ADDRESSES))
+
+        self.assertEqual(self.dbg.breakpoints, {})
+        self.assertEqual(self.process.peek(BASE, len(CODE)), CODE)
+
+    def test_delete_restores_each_page_once(self):
+        self.dbg.bp_set(list(ADDRESSES))
+        self.process.calls.clear()
+
+        self.dbg.bp_del(list(ADDRESSES))
+
+        self.assertEqual(self.dbg.breakpoints, {})
+        self.assertEqual(self.process.peek(BASE, len(CODE)), CODE)
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 2)
+        self.assertEqual(self.process.calls['VirtualProtectEx'], 2 * 2)
+
+    def test_failed_delete_keeps_every_breakpoint(self):
+        self.dbg.bp_set(list(ADDRESSES))
+        patched = self.process.peek(BASE, len(CODE))
+        self.fail_writes_to(BASE + PAGE_SIZE)
+
+        with self.assertRaises(PDError):
+            self.dbg.bp_del_all()
+
+        self.assertEqual(sorted(self.dbg.breakpoints), ADDRESSES)
+        self.assertEqual(self.process.peek(BASE, len(CODE)), patched)
+
+    def test_delete_skips_unknown_addresses(self):
+        self.dbg.bp_set(ADDRESSES[0])
+        self.dbg.bp_del([ADDRESSES[0], ADDRESSES[1]])
+
+        self.assertEqual(self.dbg.breakpoints, {})
+        self.assertEqual(self.process.peek(BASE, len(CODE)), CODE)
+
+
+if __name__ == '__main__':
+    unittest.main()
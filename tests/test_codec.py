@@ -0,0 +1,234 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import lzma
+import os
+import pickle
+import zlib
+import unittest
+from ctypes import Structure, c_ulong, sizeof, string_at, addressof
+
+from pydbg import codec
+from pydbg.defines import CONTEXT, DEBUG_EVENT, MEMORY_BASIC_INFORMATION, MODULEENTRY32
+from pydbg.errors import PDError
+from pydbg.wire import FRAME_HEADER, FrameCodec, DeltaCodec
+
+
+def sample_context(eip=0x00401000):
+    context = CONTEXT()
+    context.ContextFlags = 0x10007
+    (context.Eax, context.Ebx, context.Esp, context.Eip) = (1, 2, 0x0012FF00, eip)
+    return context
+
+
+def raw(obj):
+    return string_at(addressof(obj), sizeof(obj))
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        dbg = DEBUG_EVENT()
+        dbg.dwDebugEventCode = 1
+        dbg.dwThreadId = 0x123
+        dbg.u.Exception.ExceptionRecord.ExceptionCode = 0xC0000005
+
+        mbi = MEMORY_BASIC_INFORMATION()
+        (mbi.BaseAddress, mbi.RegionSize, mbi.Protect) = (0x00400000, 0x1000, 0x04)
+
+        module = MODULEENTRY32()
+        module.szModule = b'kernel32.dll'
+
+        for obj in (sample_context(), dbg, mbi, module):
+            data = codec.encode(obj)
+            copy = codec.decode(data)
+
+            self.assertEqual(len(data), 1 + sizeof(obj))
+            self.assertIs(type(copy), type(obj))
+            self.assertEqual(raw(copy), raw(obj))
+
+        self.assertEqual(copy.szModule, b'kernel32.dll')
+
+    def test_decoded_structure_owns_its_bytes(self):
+        data = bytearray(codec.encode(sample_context()))
+        copy = codec.decode(data)
+        data[1:] = bytes(len(data) - 1)
+
+        self.assertEqual(copy.Eip, 0x00401000)
+
+    def test_pickle(self):
+        context = sample_context()
+        copy = pickle.loads(pickle.dumps(context, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEqual(raw(copy), raw(context))
+        self.assertIn(codec.encode(context), pickle.dumps(context, pickle.HIGHEST_PROTOCOL))
+
+    def test_errors(self):
+        class Unregistered(Structure):
+            _fields_ = [('value', c_ulong)]
+
+        with self.assertRaises(PDError):
+            codec.encode(Unregistered())
+
+        with self.assertRaises(PDError):
+            codec.decode(b'\xFF' + bytes(4))
+
+        with self.assertRaises(PDError):
+            codec.decode(codec.encode(sample_context())[:-1])
+
+        with self.assertRaises(PDError):
+            codec.register(1, Unregistered)
+
+
+class DeltaCodecTest(unittest.TestCase):
+    def setUp(self):
+        self.sender = DeltaCodec()
+        self.receiver = DeltaCodec()
+
+    def ship(self, key, data, structure=False):
+        delta = self.sender.encode(key, data, structure)
+        return (delta, self.receiver.decode(pickle.loads(pickle.dumps(delta))))
+
+    def test_round_trip(self):
+        page = bytearray(0x1000)
+
+        (delta, data) = self.ship(('read', 0x1000), page)
+        self.assertIsNone(delta.runs)
+        self.assertEqual(data, bytes(page))
+
+        page[0x10:0x14] = b'\x01\x02\x03\x04'
+        page[0x800] = 0xFF
+
+        (delta, data) = self.ship(('read', 0x1000), page)
+        self.assertIsNone(delta.data)
+        self.assertEqual(delta.runs, [(0x10, b'\x01\x02\x03\x04'), (0x800, b'\xFF')])
+        self.assertEqual(data, bytes(page))
+
+    def test_structures(self):
+        for eip in (0x00401000, 0x00401002, 0x00401005):
+            (delta, data) = self.ship(('context', 1), codec.encode(sample_context(eip)), structure=True)
+
+            self.assertTrue(delta.structure)
+            self.assertEqual(codec.decode(data).Eip, eip)
+
+        self.assertLess(self.sender.stats()['bytes_out'], self.sender.stats()['bytes_in'] // 2)
+
+    def test_values_sent_in_full_when_a_delta_is_not_worth_it(self):
+        self.ship('key', bytes(0x100))
+
+        # different length.
+        (delta, data) = self.ship('key', bytes(0x80))
+        self.assertIsNone(delta.runs)
+
+        # mostly different content.
+        (delta, data) = self.ship('key', os.urandom(0x80))
+        self.assertIsNone(delta.runs)
+
+    def test_reset(self):
+        sender = DeltaCodec(max_entries=2)
+
+        for key in ('a', 'b', 'c'):
+            self.receiver.decode(sender.encode(key, bytes(0x100)))
+
+        # 'a' was dropped by the sender, it starts over with the full value.
+        self.assertIsNone(sender.encode('a', bytes(0x100)).runs)
+
+        # a receiver without the previous value can not rebuild a delta.
+        delta = sender.encode('c', b'\x01' + bytes(0xFF))
+        self.assertIsNotNone(delta.runs)
+
+        with self.assertRaises(PDError):
+            DeltaCodec().decode(delta)
+
+    def test_clear(self):
+        self.ship('key', bytes(0x100))
+
+        # lost on the way, the receiver still holds the first value.
+        self.sender.encode('key', b'\x01' + bytes(0xFF))
+        self.sender.clear()
+
+        (delta, data) = self.ship('key', b'\x02' + bytes(0xFF))
+        self.assertIsNone(delta.runs)
+        self.assertEqual(data, b'\x02' + bytes(0xFF))
+
+
+class CompressionTest(unittest.TestCase):
+    def round_trip(self, sender, payload):
+        receiver = FrameCodec()
+        frame = b''.join(sender._frame([payload]))
+        (flag, length) = receiver._header(frame[:FRAME_HEADER.size])
+
+        self.assertEqual(length, len(frame) - FRAME_HEADER.size)
+        self.assertEqual(bytes(receiver._payload(flag, memoryview(frame)[FRAME_HEADER.size:])), payload)
+
+        return (flag, len(frame))
+
+    def test_uncompressed(self):
+        (flag, size) = self.round_trip(FrameCodec(), bytes(0x10000))
+
+        self.assertEqual(flag, 0)
+        self.assertEqual(size, FRAME_HEADER.size + 0x10000)
+
+    def test_compressed(self):
+        for compression in ('zlib', 'lzma'):
+            sender = FrameCodec()
+            sender.set_compression(compression)
+            (flag, size) = self.round_trip(sender, bytes(0x10000))
+
+            self.assertNotEqual(flag, 0)
+            self.assertLess(size, 0x1000)
+            self.assertEqual(sender.stats()['bytes_saved'], FRAME_HEADER.size + 0x10000 - size)
+
+    def test_small_and_incompressible_frames_are_sent_as_is(self):
+        sender = FrameCodec()
+        sender.set_compression('zlib', threshold=0x100)
+
+        self.assertEqual(self.round_trip(sender, bytes(0xFF))[0], 0)
+        self.assertEqual(self.round_trip(sender, os.urandom(0x1000))[0], 0)
+        self.assertEqual(sender.stats()['bytes_saved'], 0)
+
+    def test_decompressed_size_is_bounded(self):
+        receiver = FrameCodec(max_frame_size=0x1000)
+
+        for (flag, compress) in ((1, zlib.compress), (2, lzma.compress)):
+            # right at the limit.
+            self.assertEqual(len(receiver._payload(flag, memoryview(compress(bytes(0x1000))))), 0x1000)
+
+            # a few bytes on the wire, one past the limit once inflated.
+            with self.assertRaises(PDError):
+                receiver._payload(flag, memoryview(compress(bytes(0x1001))))
+
+    def test_corrupted_and_truncated_streams(self):
+        receiver = FrameCodec()
+
+        for (flag, compress) in ((1, zlib.compress), (2, lzma.compress)):
+            packed = compress(os.urandom(0x1000))
+
+            with self.assertRaises(PDError):
+                receiver._payload(flag, memoryview(packed[:len(packed) // 2]))
+
+            with self.assertRaises(PDError):
+                receiver._payload(flag, memoryview(b'\x00' * 0x20))
+
+    def test_unsupported_compression(self):
+        with self.assertRaises(PDError):
+            FrameCodec().set_compression('bz2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+
+from pydbg.defines import (
+    DBG_CONTINUE, DBG_EXCEPTION_NOT_HANDLED, EXCEPTION_BREAKPOINT, EXCEPTION_DEBUG_EVENT, PAGE_EXECUTE_READ,
+)
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00401000
+CODE = bytes(range(256)) * (PAGE_SIZE // 256)
+TRAP_FLAG = 0x100
+
+
+class CoverageTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.process.map(BASE, CODE, protection=PAGE_EXECUTE_READ)
+
+        # contexts written back, as (thread id, Eip, EFlags).
+        self.contexts = []
+        self.process.SetThreadContext = self.set_thread_context
+
+    def set_thread_context(self, thread, context):
+        self.process.calls['SetThreadContext'] += 1
+        self.contexts.append((context._obj.Eip, context._obj.EFlags))
+        return 1
+
+    def hit(self, address, thread_id=1):
+        self.process.queue_event(EXCEPTION_DEBUG_EVENT, EXCEPTION_BREAKPOINT, thread_id=thread_id, address=address)
+        self.dbg.debug_event_iteration()
+
+        return self.process.continued[-1]
+
+    def test_first_hit(self):
+        self.dbg.bp_set_coverage([BASE + 0x10, BASE + 0x80])
+
+        self.assertEqual(self.process.peek(BASE + 0x10, 1), b'\xCC')
+        self.assertEqual(self.hit(BASE + 0x10, thread_id=7), DBG_CONTINUE)
+
+        # original byte restored, breakpoint forgotten.
+        self.assertEqual(self.process.peek(BASE + 0x10, 1), CODE[0x10:0x11])
+        self.assertNotIn(BASE + 0x10, self.dbg.breakpoints)
+
+        # EIP rewound by a single context write, without arming a single step.
+        self.assertEqual(self.contexts, [(BASE + 0x10, 0)])
+        self.assertFalse(self.contexts[0][1] & TRAP_FLAG)
+        self.assertIsNone(self.dbg._restore_breakpoint)
+
+        self.assertEqual(list(self.dbg.coverage_addresses), [BASE + 0x10])
+        self.assertEqual(list(self.dbg.coverage_threads), [7])
+        self.assertEqual(self.dbg.coverage_bitmap(BASE, PAGE_SIZE)[2], 0x01)
+
+        # the other coverage breakpoint is still pending.
+        self.assertEqual(self.process.peek(BASE + 0x80, 1), b'\xCC')
+
+    def test_second_hit_is_not_a_coverage_hit(self):
+        self.dbg.bp_set_coverage(BASE + 0x10)
+        self.hit(BASE + 0x10)
+
+        self.assertEqual(self.hit(BASE + 0x10), DBG_EXCEPTION_NOT_HANDLED)
+        self.assertEqual(list(self.dbg.coverage_addresses), [BASE + 0x10])
+        self.assertEqual(len(self.contexts), 1)
+
+    def test_coverage_reset_keeps_pending_breakpoints(self):
+        self.dbg.bp_set_coverage([BASE + 0x10, BASE + 0x20])
+        self.hit(BASE + 0x10)
+
+        self.dbg.coverage_reset()
+        self.hit(BASE + 0x20)
+
+        self.assertEqual(list(self.dbg.coverage_addresses), [BASE + 0x20])
+        self.assertEqual(bytes(self.dbg.coverage_bitmap(BASE, 0x40)), b'\x00\x00\x00\x00\x01\x00\x00\x00')
+
+
+if __name__ == '__main__':
+    unittest.main()
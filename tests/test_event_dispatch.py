@@ -0,0 +1,119 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import time
+import unittest
+
+from pydbg.defines import (
+    DBG_CONTINUE, DBG_EXCEPTION_NOT_HANDLED, EXCEPTION_BREAKPOINT, EXCEPTION_DEBUG_EVENT, EXIT_THREAD_DEBUG_EVENT,
+    OUTPUT_DEBUG_STRING_EVENT, RIP_EVENT,
+)
+from pydbg.pydbg import PyDBG
+
+from tests.fake_process import DebuggerTestCase
+
+EXCEPTION_CUSTOM = 0xE0000001
+HANDLED = 0x12345678
+
+
+class EventDispatchTest(DebuggerTestCase):
+    def replace_handler(self, name):
+        """Stand a recording handler in for the named internal handler, keeping its @needs_context flag."""
+
+        calls = []
+        handler = getattr(self.dbg, name)
+
+        def recording():
+            calls.append(self.dbg.dbg.dwDebugEventCode)
+            return HANDLED
+
+        if getattr(handler, 'needs_context', False):
+            recording.needs_context = True
+
+        setattr(self.dbg, name, recording)
+        return calls
+
+    def dispatch(self, event_code, exception_code=0):
+        self.process.queue_event(event_code, exception_code)
+        self.dbg.debug_event_iteration()
+
+        return self.process.continued[-1]
+
+    def test_debug_events_reach_their_handlers(self):
+        for (code, name) in sorted(PyDBG.DEBUG_EVENT_HANDLERS.items()):
+            calls = self.replace_handler(name)
+
+            self.assertEqual(self.dispatch(code), HANDLED, name)
+            self.assertEqual(calls, [code], name)
+            self.assertEqual(self.dbg.event_counts[code], 1, name)
+
+    def test_exceptions_reach_their_handlers(self):
+        for (code, name) in sorted(PyDBG.EXCEPTION_HANDLERS.items()):
+            calls = self.replace_handler(name)
+
+            self.assertEqual(self.dispatch(EXCEPTION_DEBUG_EVENT, code), HANDLED, name)
+            self.assertEqual(calls, [EXCEPTION_DEBUG_EVENT], name)
+            self.assertEqual(self.dbg.event_counts[code], 1, name)
+
+    def test_context_is_fetched_for_handlers_that_need_it(self):
+        for (code, name) in sorted(PyDBG.EXCEPTION_HANDLERS.items()):
+            self.replace_handler(name)
+
+        self.process.calls.clear()
+        self.dispatch(EXCEPTION_DEBUG_EVENT, EXCEPTION_BREAKPOINT)
+
+        self.assertEqual(self.process.calls['GetThreadContext'], 1)
+
+    def test_unknown_codes_get_the_default_continue_status(self):
+        self.assertEqual(self.dispatch(OUTPUT_DEBUG_STRING_EVENT), DBG_CONTINUE)
+        self.assertEqual(self.dbg.default_continue_status(), DBG_CONTINUE)
+
+        self.assertEqual(self.dispatch(RIP_EVENT), DBG_CONTINUE)
+
+        self.assertEqual(self.dispatch(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM), DBG_EXCEPTION_NOT_HANDLED)
+        self.assertEqual(self.dbg.default_continue_status(), DBG_EXCEPTION_NOT_HANDLED)
+
+        self.assertEqual(self.dbg.event_counts[OUTPUT_DEBUG_STRING_EVENT], 1)
+        self.assertEqual(self.dbg.event_counts[EXCEPTION_CUSTOM], 1)
+
+    def test_context_free_events_never_fetch_the_context(self):
+        self.dbg.set_callback(EXCEPTION_CUSTOM, lambda dbg: DBG_CONTINUE)
+        self.process.calls.clear()
+
+        self.assertEqual(self.dispatch(EXIT_THREAD_DEBUG_EVENT), DBG_CONTINUE)
+        self.assertEqual(self.dispatch(OUTPUT_DEBUG_STRING_EVENT), DBG_CONTINUE)
+        self.assertEqual(self.dispatch(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM), DBG_CONTINUE)
+
+        self.assertEqual(self.process.calls['GetThreadContext'], 0)
+        self.assertEqual(self.process.calls['OpenThread'], 0)
+
+    def test_counters_and_timings_accumulate(self):
+        self.dbg.set_callback(EXCEPTION_CUSTOM, lambda dbg: time.sleep(0.002) or DBG_CONTINUE)
+
+        self.dispatch(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM)
+        first = self.dbg.event_times[EXCEPTION_CUSTOM]
+        self.dispatch(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM)
+
+        self.assertEqual(self.dbg.event_counts[EXCEPTION_CUSTOM], 2)
+        self.assertGreaterEqual(first, 0.002)
+        self.assertGreaterEqual(self.dbg.event_times[EXCEPTION_CUSTOM], first + 0.002)
+
+
+if __name__ == '__main__':
+    unittest.main()
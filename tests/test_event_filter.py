@@ -0,0 +1,96 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import unittest
+from unittest import mock
+
+from pydbg.defines import (
+    CREATE_PROCESS_DEBUG_EVENT, DBG_CONTINUE, EXCEPTION_DEBUG_EVENT, LOAD_DLL_DEBUG_EVENT,
+)
+from pydbg.errors import PDError
+from pydbg.event_filter import EventFilter
+
+from tests.fake_process import DebuggerTestCase
+from tests.test_module_map import map_image
+
+IMAGE_BASE = 0x00400000
+NTDLL_BASE = 0x7C900000
+DEVICE = b'\\Device\\HarddiskVolume1'
+EXCEPTION_CUSTOM = 0xE0000001
+
+
+class EventFilterTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        map_image(self.process, IMAGE_BASE, 0x20000)
+        map_image(self.process, NTDLL_BASE, 0xB0000)
+
+        process = self.process.queue_event(CREATE_PROCESS_DEBUG_EVENT)
+        process.u.CreateProcessInfo.hFile = self.process.open_file(DEVICE + b'\\Program Files\\App.exe')
+        process.u.CreateProcessInfo.lpBaseOfImage = IMAGE_BASE
+
+        dll = self.process.queue_event(LOAD_DLL_DEBUG_EVENT)
+        dll.u.LoadDll.hFile = self.process.open_file(DEVICE + b'\\WINDOWS\\system32\\ntdll.dll')
+        dll.u.LoadDll.lpBaseOfDll = NTDLL_BASE
+
+        # paths are split on os.sep, Windows' whatever the host.
+        with mock.patch.object(os, 'sep', '\\'):
+            self.dbg.debug_event_iteration()
+            self.dbg.debug_event_iteration()
+
+    def evaluate(self, event_filter, address, thread_id=1):
+        """Evaluate the filter while an exception at the specified address is being handled."""
+
+        results = []
+        self.dbg.set_callback(EXCEPTION_CUSTOM, lambda dbg: results.append(event_filter.matches(dbg)) or DBG_CONTINUE)
+        self.process.queue_event(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM, thread_id=thread_id, address=address)
+        self.dbg.debug_event_iteration()
+
+        return results[0]
+
+    def test_exception_in_the_main_image(self):
+        self.assertTrue(self.evaluate(EventFilter(module='APP.EXE'), IMAGE_BASE + 0x1234))
+        self.assertFalse(self.evaluate(EventFilter(module='ntdll.dll'), IMAGE_BASE + 0x1234))
+
+    def test_exception_in_a_dll(self):
+        self.assertTrue(self.evaluate(EventFilter(module='NtDll.dll'), NTDLL_BASE + 0x10))
+        self.assertFalse(self.evaluate(EventFilter(module='app.exe'), NTDLL_BASE + 0x10))
+
+    def test_exception_outside_any_module(self):
+        self.assertFalse(self.evaluate(EventFilter(module='app.exe'), 0x00100000))
+
+    def test_every_condition_must_hold(self):
+        event_filter = EventFilter(address_ranges=[(IMAGE_BASE, IMAGE_BASE + 0x2000)], module='app.exe', thread_ids=[4])
+
+        self.assertTrue(self.evaluate(event_filter, IMAGE_BASE + 0x10, thread_id=4))
+        self.assertFalse(self.evaluate(event_filter, IMAGE_BASE + 0x10, thread_id=5))
+        self.assertFalse(self.evaluate(event_filter, IMAGE_BASE + 0x3000, thread_id=4))
+
+    def test_invalid_predicates(self):
+        with self.assertRaises(PDError):
+            EventFilter(registers=[('XYZ', '==', 0)])
+
+        with self.assertRaises(PDError):
+            EventFilter(memory=[(IMAGE_BASE, 4, '<', b'')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import asyncio
+import unittest
+
+from pydbg.pydbg import PyDBG, pure_methods
+from pydbg.pydbg_async_client import AsyncPyDBGClient
+from pydbg.pydbg_client import PyDBGClient
+
+from tests.test_pydbg_server import StubServer
+
+# helper -> arguments, covering every routine declared @pure.
+CALLS = {
+    'flip_endian': (0x41424344,),
+    'flip_endian_dword': (b'ABCD',),
+    'get_ascii_string': ('hello world\x00',),
+    'get_printable_string': ('ab\x01c',),
+    'get_unicode_string': ('h\x00i\x00j\x00k\x00l\x00\x00\x00',),
+    'hex_dump': ('abc',),
+    'to_binary': (5,),
+    'to_decimal': ('101',),
+}
+
+
+class NoNetwork(object):
+    """Socket or channel failing the test on any use"""
+
+    def __getattr__(self, name):
+        raise AssertionError('network I/O: {}'.format(name))
+
+
+class PyDBGClientLocalHelpersTest(unittest.TestCase):
+    def setUp(self):
+        stub = StubServer()
+        self.addCleanup(stub.close)
+
+        self.dbg = PyDBGClient(*stub.server.server_address)
+        self.addCleanup(self.dbg.sock.close)
+
+        # one remote call, proving the client does reach the server.
+        self.assertEqual(self.dbg.read_process_memory(0x10, 2), b'\x10\x11')
+        self.frames_sent = self.dbg.channel.frames_sent
+
+        self.sock = self.dbg.channel.sock
+        self.dbg.channel.sock = NoNetwork()
+        self.addCleanup(setattr, self.dbg.channel, 'sock', self.sock)
+
+        self.local = PyDBG.__new__(PyDBG)
+
+    def test_every_pure_helper_is_covered(self):
+        self.assertEqual(set(pure_methods(PyDBG)), set(CALLS))
+
+    def test_direct_calls(self):
+        for (method_name, args) in CALLS.items():
+            self.assertEqual(getattr(self.dbg, method_name)(*args), getattr(self.local, method_name)(*args))
+
+        self.assertEqual(self.dbg.channel.frames_sent, self.frames_sent)
+
+    def test_batched_and_pipelined_calls(self):
+        with self.dbg.batch() as batch:
+            batched = {method_name: getattr(batch, method_name)(*args) for (method_name, args) in CALLS.items()}
+
+        with self.dbg.pipeline() as pipe:
+            pipelined = {method_name: getattr(pipe, method_name)(*args) for (method_name, args) in CALLS.items()}
+
+        for (method_name, args) in CALLS.items():
+            expected = getattr(self.local, method_name)(*args)
+
+            self.assertEqual(batched[method_name].result(), expected)
+            self.assertEqual(pipelined[method_name].result(), expected)
+
+        self.assertEqual(self.dbg.channel.frames_sent, self.frames_sent)
+        self.assertEqual(self.dbg.pending, {})
+
+    def test_memoized_helpers(self):
+        for _ in range(3):
+            self.dbg.flip_endian(0x41424344)
+            self.dbg.hex_dump('abc')
+
+        self.assertEqual(self.dbg.local.calls, 6)
+        self.assertEqual(self.dbg.local.hits, 2)
+
+
+class AsyncPyDBGClientLocalHelpersTest(unittest.IsolatedAsyncioTestCase):
+    async def test_direct_calls(self):
+        class Channel(NoNetwork):
+            async def recv_object(self):
+                await asyncio.Event().wait()
+
+            async def close(self):
+                pass
+
+        dbg = AsyncPyDBGClient(Channel())
+        local = PyDBG.__new__(PyDBG)
+
+        for (method_name, args) in CALLS.items():
+            self.assertEqual(getattr(dbg, method_name)(*args), getattr(local, method_name)(*args))
+
+        dbg.reader.cancel()
+        await dbg.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
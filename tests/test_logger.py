@@ -0,0 +1,129 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import io
+import unittest
+
+from pydbg.logger import LOG_DEBUG, LOG_ERROR, LOG_OFF, Logger
+
+from tests.fake_process import DebuggerTestCase
+
+BASE = 0x00400000
+
+
+class Formatted(object):
+    """Argument counting how many times it was formatted"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'formatted'
+
+
+class LoggerTest(unittest.TestCase):
+    def test_disabled_messages_are_never_formatted(self):
+        stream = io.StringIO()
+        logger = Logger(LOG_ERROR, stream)
+        argument = Formatted()
+
+        logger.debug('value %s', argument)
+
+        self.assertFalse(logger.debug_enabled)
+        self.assertEqual(argument.count, 0)
+        self.assertEqual(stream.getvalue(), '')
+
+    def test_stream(self):
+        stream = io.StringIO()
+        logger = Logger(LOG_DEBUG, stream)
+
+        logger.debug('bp_set(0x%08x)', 0x401000)
+        logger.error('failed')
+
+        self.assertEqual(stream.getvalue(), '[PDBG_LOG] bp_set(0x00401000)\n[PDBG_ERR] failed\n')
+
+    def test_ring_defers_formatting_until_read(self):
+        logger = Logger(LOG_DEBUG, ring_size=2)
+        argument = Formatted()
+
+        logger.debug('first %s', argument)
+        logger.debug('second %s', argument)
+        logger.debug('third %s', argument)
+
+        self.assertEqual(argument.count, 0)
+        self.assertEqual(logger.records(), [(LOG_DEBUG, 'second formatted'), (LOG_DEBUG, 'third formatted')])
+
+    def test_hook_receives_formatted_messages(self):
+        seen = []
+        logger = Logger(LOG_DEBUG, io.StringIO())
+
+        logger.set_hook(LOG_DEBUG, seen.append)
+        logger.debug('0x%08x', 0x10)
+        logger.set_hook(LOG_DEBUG, logger.debug)
+        logger.debug('dropped hook')
+
+        self.assertEqual(seen, ['0x00000010'])
+        self.assertEqual(logger.stream.getvalue(), '[PDBG_LOG] dropped hook\n')
+
+
+class PyDBGLogOverrideTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.process.map(BASE, b'\x90' * 0x10)
+        self.dbg.logger.set_level(LOG_DEBUG)
+        self.dbg.logger.route_to_stream(io.StringIO())
+
+    def test_single_argument_override(self):
+        seen = []
+        self.dbg._log = lambda msg: seen.append(msg)
+
+        self.dbg.bp_set(BASE)
+
+        self.assertIn('bp_set(0x00400000)', seen)
+        self.assertEqual(self.dbg.logger.stream.getvalue(), '')
+
+    def test_error_override(self):
+        seen = []
+        self.dbg._err = lambda msg: seen.append(msg)
+
+        self.dbg._err('failed %s', 'twice')
+
+        self.assertEqual(seen, ['failed twice'])
+
+    def test_restoring_the_logger_method_removes_the_override(self):
+        self.dbg._log = lambda msg: None
+        self.dbg._log = self.dbg.logger.debug
+
+        self.dbg.bp_set(BASE)
+
+        self.assertIn('bp_set(0x00400000)', self.dbg.logger.stream.getvalue())
+
+    def test_override_silences_when_logging_is_off(self):
+        seen = []
+        self.dbg._log = seen.append
+        self.dbg.logger.set_level(LOG_OFF)
+
+        self.dbg.bp_set(BASE)
+
+        self.assertEqual(seen, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import unittest
+
+from pydbg.errors import PDError
+from pydbg.mem_snapshot import MemSnapshotBlock, PageStore
+
+PAGE_SIZE = 0x1000
+
+
+class PageStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = PageStore(PAGE_SIZE)
+
+    def test_identical_pages_are_stored_once(self):
+        page = os.urandom(PAGE_SIZE)
+        pages = self.store.put(page + page) + self.store.put(bytearray(page))
+
+        self.assertEqual(len(self.store), 1)
+        self.assertTrue(all(stored is pages[0] for stored in pages))
+        self.assertEqual(self.store.stats()['bytes'], PAGE_SIZE)
+
+    def test_zero_pages_are_not_stored(self):
+        pages = self.store.put(bytes(3 * PAGE_SIZE + 0x10))
+
+        self.assertEqual(pages, (None,) * 4)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.stats()['zero_pages'], 4)
+
+        # a single set byte, even in a short last page, is kept.
+        self.assertIsNotNone(self.store.put(bytes(0xF) + b'\x01')[0])
+
+    def test_release(self):
+        data = os.urandom(2 * PAGE_SIZE)
+        (first, second) = (self.store.put(data), self.store.put(data[:PAGE_SIZE]))
+
+        self.store.release(first)
+        self.assertEqual(len(self.store), 1)
+
+        self.store.release(second)
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.references, {})
+        self.assertEqual(self.store.digests, {})
+
+    def test_page_size_limit(self):
+        with self.assertRaises(PDError):
+            PageStore(0x20000)
+
+
+class MemSnapshotBlockTest(unittest.TestCase):
+    def setUp(self):
+        self.store = PageStore(PAGE_SIZE)
+
+    def test_data_round_trips(self):
+        data = os.urandom(PAGE_SIZE) + bytes(PAGE_SIZE) + os.urandom(PAGE_SIZE // 2)
+        block = MemSnapshotBlock(data=data, store=self.store)
+
+        self.assertEqual(block.data, data)
+        self.assertEqual(block.size, len(data))
+        self.assertEqual(bytes(block.view(PAGE_SIZE - 8, 16)), data[PAGE_SIZE - 8:PAGE_SIZE + 8])
+        self.assertEqual(b''.join(block.iter_pages(PAGE_SIZE)), data)
+
+        # plain blocks hand their data back as is.
+        self.assertIs(MemSnapshotBlock(data=data).data, data)
+
+    def test_blocks_share_pages(self):
+        data = os.urandom(2 * PAGE_SIZE)
+        blocks = [MemSnapshotBlock(data=data, store=self.store) for _ in range(3)]
+
+        self.assertEqual(len(self.store), 2)
+        self.assertIs(blocks[0].pages[1], blocks[2].pages[1])
+
+    def test_released_blocks_drop_their_pages(self):
+        block = MemSnapshotBlock(data=os.urandom(2 * PAGE_SIZE), store=self.store)
+        other = MemSnapshotBlock(data=block.data[:PAGE_SIZE], store=self.store)
+
+        del block
+        self.assertEqual(len(self.store), 1)
+
+        # replacing the data releases the stored pages too.
+        other.data = b'\x01'
+        self.assertEqual(len(self.store), 0)
+        self.assertIsNone(other.pages)
+        self.assertEqual(other.data, b'\x01')
+
+    def test_dirty_runs(self):
+        data = bytes(4 * PAGE_SIZE)
+        current = bytearray(data)
+        current[PAGE_SIZE - 1:PAGE_SIZE + 1] = b'\xCC\xCC'
+        current[3 * PAGE_SIZE] = 0xCC
+
+        for block in (MemSnapshotBlock(data=data), MemSnapshotBlock(data=data, store=self.store)):
+            self.assertEqual(block.dirty_runs(bytes(current), PAGE_SIZE), [(0, 2 * PAGE_SIZE), (3 * PAGE_SIZE, PAGE_SIZE)])
+            self.assertEqual(block.dirty_runs(data, PAGE_SIZE), [])
+            self.assertEqual(block.dirty_runs(data[:-1], PAGE_SIZE), [(0, len(data))])
+
+
+if __name__ == '__main__':
+    unittest.main()
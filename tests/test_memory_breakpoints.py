@@ -0,0 +1,141 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import pickle
+import unittest
+
+from pydbg.breakpoints import MemBreakpoint, MemBreakpointIndex
+from pydbg.defines import PAGE_GUARD, PAGE_READWRITE
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00400000
+
+
+def breakpoint(address, size):
+    return MemBreakpoint(address, size)
+
+
+class MemBreakpointIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = MemBreakpointIndex(PAGE_SIZE)
+
+    def assertIndexed(self, addresses):
+        self.assertEqual(self.index.starts, sorted(addresses))
+        self.assertEqual(sorted(self.index.spans), sorted(addresses))
+        self.assertEqual(sorted({start for owners in self.index.pages.values() for start in owners}), sorted(addresses))
+
+    def test_find(self):
+        self.index[BASE + 0x10] = breakpoint(BASE + 0x10, 0x20)
+        self.index[BASE + 0x2000] = breakpoint(BASE + 0x2000, 0x1800)
+
+        self.assertEqual(self.index.find(BASE + 0x10), BASE + 0x10)
+        self.assertEqual(self.index.find(BASE + 0x30), BASE + 0x10)
+        self.assertIsNone(self.index.find(BASE + 0x31))
+        self.assertEqual(self.index.find(BASE + 0x3000), BASE + 0x2000)
+        self.assertIsNone(self.index.find(BASE + 0x0F))
+
+    def test_find_overlapping_buffers(self):
+        self.index[BASE] = breakpoint(BASE, 0x800)
+        self.index[BASE + 0x100] = breakpoint(BASE + 0x100, 0x10)
+
+        # past the inner buffer, but still within the outer one.
+        self.assertEqual(self.index.find(BASE + 0x400), BASE)
+
+    def test_remove_releases_unshared_pages_only(self):
+        self.index[BASE + 0x10] = breakpoint(BASE + 0x10, 0x10)
+        self.index[BASE + 0x800] = breakpoint(BASE + 0x800, PAGE_SIZE)
+
+        self.assertEqual(self.index.remove(BASE + 0x800), [BASE + PAGE_SIZE])
+        self.assertEqual(self.index.remove(BASE + 0x10), [BASE])
+        self.assertEqual(self.index.remove(BASE + 0x10), [])
+        self.assertIndexed([])
+
+    def test_dictionary_operations_keep_the_index_in_sync(self):
+        for offset in range(0, 0x5000, 0x1000):
+            self.index[BASE + offset] = breakpoint(BASE + offset, 0x10)
+
+        del self.index[BASE]
+        self.index.pop(BASE + 0x1000)
+        self.index.popitem()
+        self.index.update({BASE + 0x8000: breakpoint(BASE + 0x8000, 0x10)})
+        self.index.setdefault(BASE + 0x9000, breakpoint(BASE + 0x9000, 0x10))
+        self.index[BASE + 0x2000] = breakpoint(BASE + 0x2000, 0x2000)
+
+        self.assertEqual(sorted(self.index), [BASE + 0x2000, BASE + 0x3000, BASE + 0x8000, BASE + 0x9000])
+        self.assertIndexed(list(self.index))
+        self.assertEqual(self.index.find(BASE + 0x3008), BASE + 0x3000)
+        self.assertEqual(self.index.find(BASE + 0x3800), BASE + 0x2000)
+        self.assertIsNone(self.index.find(BASE))
+
+        self.index.clear()
+        self.assertIndexed([])
+
+        with self.assertRaises(KeyError):
+            del self.index[BASE]
+
+    def test_pickle_round_trip(self):
+        self.index[BASE] = breakpoint(BASE, 0x10)
+        copy = pickle.loads(pickle.dumps(self.index))
+
+        self.assertIsInstance(copy, MemBreakpointIndex)
+        self.assertEqual(copy.page_size, PAGE_SIZE)
+        self.assertEqual(copy.find(BASE + 8), BASE)
+
+
+class MemoryBreakpointTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.process.map(BASE, size=4 * PAGE_SIZE)
+
+    def test_set_and_delete(self):
+        self.dbg.bp_set_mem(BASE + 0x10, 0x20)
+
+        self.assertEqual(self.dbg.bp_is_ours_mem(BASE + 0x20), BASE + 0x10)
+        self.assertFalse(self.dbg.bp_is_ours_mem(BASE + 0x100))
+        self.assertEqual(self.process.protections[BASE], PAGE_READWRITE | PAGE_GUARD)
+
+        self.dbg.bp_del_mem(BASE + 0x10)
+
+        self.assertFalse(self.dbg.bp_is_ours_mem(BASE + 0x20))
+        self.assertEqual(self.process.protections[BASE], PAGE_READWRITE)
+
+    def test_shared_page_stays_guarded_until_its_last_breakpoint_goes(self):
+        self.dbg.bp_set_mem(BASE + 0x10, 0x10)
+        self.dbg.bp_set_mem(BASE + 0x100, 0x10)
+
+        self.dbg.bp_del_mem(BASE + 0x10)
+        self.assertEqual(self.process.protections[BASE], PAGE_READWRITE | PAGE_GUARD)
+
+        self.dbg.bp_del_mem_all()
+        self.assertEqual(self.process.protections[BASE], PAGE_READWRITE)
+        self.assertEqual(len(self.dbg.memory_breakpoints), 0)
+
+    def test_outside_changes_to_memory_breakpoints_are_seen(self):
+        self.dbg.bp_set_mem(BASE + 0x10, 0x10)
+        del self.dbg.memory_breakpoints[BASE + 0x10]
+
+        self.assertFalse(self.dbg.bp_is_ours_mem(BASE + 0x10))
+
+        self.dbg.memory_breakpoints[BASE + 0x2000] = breakpoint(BASE + 0x2000, 0x10)
+        self.assertEqual(self.dbg.bp_is_ours_mem(BASE + 0x2008), BASE + 0x2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import struct
+import unittest
+from unittest import mock
+
+from pydbg.defines import (
+    CREATE_PROCESS_DEBUG_EVENT, LOAD_DLL_DEBUG_EVENT, UNLOAD_DLL_DEBUG_EVENT, MODULEENTRY32,
+)
+from pydbg.module_map import ModuleMap, ModuleRecord
+from pydbg.systemdll import SystemDLL
+
+from tests.fake_process import DebuggerTestCase
+
+IMAGE_BASE = 0x00400000
+NTDLL_BASE = 0x7C900000
+DEVICE = b'\\Device\\HarddiskVolume1'
+
+
+def map_image(process, base, size):
+    """Map the PE headers of an image of the specified SizeOfImage."""
+
+    headers = bytearray(0x200)
+    headers[0:2] = b'MZ'
+    struct.pack_into('<I', headers, 0x3C, 0x80)
+    headers[0x80:0x84] = b'PE\x00\x00'
+    struct.pack_into('<I', headers, 0x80 + 0x50, size)
+    process.map(base, headers)
+
+
+class ModuleMapTest(unittest.TestCase):
+    def setUp(self):
+        self.map = ModuleMap()
+        self.map.add(ModuleRecord('calc.exe', 'c:\\calc.exe', IMAGE_BASE, 0x20000))
+        self.map.add(ModuleRecord(b'ntdll.dll', b'c:\\windows\\system32\\ntdll.dll', NTDLL_BASE, 0xB0000))
+
+    def test_names_and_paths_are_str(self):
+        record = self.map.find(NTDLL_BASE + 0x1000)
+
+        self.assertEqual(record.name, 'ntdll.dll')
+        self.assertEqual(record.szExePath, 'c:\\windows\\system32\\ntdll.dll')
+        self.assertIs(self.map.find_name('NTDLL.DLL'), record)
+
+    def test_from_entry(self):
+        entry = MODULEENTRY32()
+        (entry.szModule, entry.szExePath) = (b'kernel32.dll', b'c:\\windows\\system32\\kernel32.dll')
+        (entry.modBaseAddr, entry.modBaseSize) = (0x7C800000, 0xF6000)
+
+        self.map.add(ModuleRecord.from_entry(entry))
+
+        self.assertEqual(self.map.find_name('kernel32.dll').end, 0x7C8F6000)
+
+    def test_find(self):
+        self.assertEqual(self.map.find(IMAGE_BASE).name, 'calc.exe')
+        self.assertIsNone(self.map.find(IMAGE_BASE + 0x20000))
+        self.assertIsNone(self.map.find(0))
+
+    def test_overlapping_module_replaces(self):
+        self.map.add(ModuleRecord('other.dll', '', IMAGE_BASE + 0x10000, 0x1000))
+
+        self.assertIsNone(self.map.find_name('calc.exe'))
+        self.assertEqual([record.name for record in self.map], ['other.dll', 'ntdll.dll'])
+
+    def test_remove(self):
+        self.assertEqual(self.map.remove(NTDLL_BASE).name, 'ntdll.dll')
+        self.assertIsNone(self.map.remove(NTDLL_BASE))
+        self.assertIsNone(self.map.find_name('ntdll.dll'))
+
+
+class SystemDLLTest(DebuggerTestCase):
+    def test_name_is_decoded(self):
+        handle = self.process.open_file(DEVICE + '\\WINDOWS\\système32\\ntdll.dll'.encode('utf-8'))
+        dll = SystemDLL(handle, NTDLL_BASE)
+
+        self.assertIsInstance(dll.name, str)
+        self.assertIsInstance(dll.path, str)
+
+    def test_device_path(self):
+        # paths are split on os.sep, Windows' whatever the host.
+        with mock.patch.object(os, 'sep', '\\'):
+            dll = SystemDLL(self.process.open_file(DEVICE + b'\\WINDOWS\\system32\\ntdll.dll'), NTDLL_BASE)
+
+        self.assertEqual((dll.name, dll.path), ('ntdll.dll', '\\WINDOWS\\system32\\ntdll.dll'))
+
+    def test_short_path(self):
+        dll = SystemDLL(self.process.open_file(b'ntdll.dll'), NTDLL_BASE)
+
+        self.assertEqual((dll.name, dll.path), ('ntdll.dll', 'ntdll.dll'))
+
+
+class ModuleEventTest(DebuggerTestCase):
+    def queue(self, event_code, path, base):
+        dbg = self.process.queue_event(event_code)
+
+        if event_code == CREATE_PROCESS_DEBUG_EVENT:
+            (dbg.u.CreateProcessInfo.hFile, dbg.u.CreateProcessInfo.lpBaseOfImage) = (self.process.open_file(path), base)
+        elif event_code == LOAD_DLL_DEBUG_EVENT:
+            (dbg.u.LoadDll.hFile, dbg.u.LoadDll.lpBaseOfDll) = (self.process.open_file(path), base)
+        else:
+            dbg.u.UnloadDll.lpBaseOfDll = base
+
+        self.dbg.debug_event_iteration()
+
+    def test_module_events(self):
+        map_image(self.process, IMAGE_BASE, 0x20000)
+        map_image(self.process, NTDLL_BASE, 0xB0000)
+
+        self.queue(CREATE_PROCESS_DEBUG_EVENT, b'calc.exe', IMAGE_BASE)
+        self.queue(LOAD_DLL_DEBUG_EVENT, b'ntdll.dll', NTDLL_BASE)
+
+        self.assertEqual(self.dbg.addr_to_module(IMAGE_BASE + 0x1FFFF).name, 'calc.exe')
+        self.assertEqual(self.dbg.addr_to_dll(NTDLL_BASE + 0x1000).name, 'ntdll.dll')
+        self.assertEqual(self.dbg.module_map.find_name('NTDLL.DLL').size, 0xB0000)
+
+        self.queue(UNLOAD_DLL_DEBUG_EVENT, None, NTDLL_BASE)
+
+        self.assertIsNone(self.dbg.addr_to_dll(NTDLL_BASE + 0x1000))
+        self.assertIsNone(self.dbg.module_map.find_name('ntdll.dll'))
+        self.assertEqual(self.dbg.system_dlls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
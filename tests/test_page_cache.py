@@ -0,0 +1,126 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+
+from pydbg.defines import DBG_CONTINUE, EXCEPTION_DEBUG_EVENT, PAGE_NOACCESS
+from pydbg.errors import PDError
+from pydbg.page_cache import PageCache
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00400000
+EXCEPTION_CUSTOM = 0xE0000001
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = bytes(range(256)) * (3 * PAGE_SIZE // 256)
+        self.reads = []
+        self.cache = PageCache(self.read, PAGE_SIZE)
+        self.cache.enable()
+
+    def read(self, address, length):
+        self.reads.append((address, length))
+        return self.memory[address - BASE:address - BASE + length]
+
+    def test_repeated_reads_fetch_the_page_once(self):
+        for _ in range(3):
+            self.assertEqual(self.cache.read_cached(BASE + 0x10, 4), self.memory[0x10:0x14])
+
+        self.assertEqual(self.reads, [(BASE, PAGE_SIZE)])
+        self.assertEqual(self.cache.stats(), {'hits': 2, 'misses': 1, 'pages': 1})
+
+    def test_read_spanning_pages(self):
+        data = self.cache.read_cached(BASE + PAGE_SIZE - 2, 4)
+
+        self.assertEqual(data, self.memory[PAGE_SIZE - 2:PAGE_SIZE + 2])
+        self.assertEqual(self.reads, [(BASE, PAGE_SIZE), (BASE + PAGE_SIZE, PAGE_SIZE)])
+
+    def test_invalidate_drops_overlapping_pages_only(self):
+        self.cache.read_cached(BASE, 3 * PAGE_SIZE)
+        self.cache.invalidate(BASE + PAGE_SIZE + 8, 1)
+
+        self.assertEqual(sorted(self.cache.pages), [BASE, BASE + 2 * PAGE_SIZE])
+
+    def test_short_page_is_not_cached(self):
+        with self.assertRaises(PDError):
+            self.cache.read_cached(BASE + 3 * PAGE_SIZE, 1)
+
+        self.assertEqual(self.cache.pages, {})
+
+
+class ReadProcessMemoryCacheTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.process.map(BASE, bytes(range(256)) * 32)
+        self.dbg._page_cache.enable()
+
+    def test_reads_within_an_event_hit_the_cache(self):
+        for _ in range(4):
+            self.dbg.read_process_memory(BASE + 8, 4)
+
+        self.assertEqual(self.process.calls['ReadProcessMemory'], 1)
+        self.assertEqual(self.dbg.page_cache_stats(), {'hits': 3, 'misses': 1, 'pages': 1})
+
+    def test_write_invalidates(self):
+        self.dbg.read_process_memory(BASE, 4)
+        self.dbg.write_process_memory(BASE + 1, b'\xAA')
+
+        self.assertEqual(self.dbg.read_process_memory(BASE, 4), b'\x00\xAA\x02\x03')
+        self.assertEqual(self.process.calls['ReadProcessMemory'], 2)
+
+    def test_bp_set_and_bp_del_invalidate(self):
+        self.assertEqual(self.dbg.read_process_memory(BASE + 0x41, 1), b'\x41')
+
+        self.dbg.bp_set(BASE + 0x41)
+        self.assertEqual(self.dbg.read_process_memory(BASE + 0x41, 1), b'\xCC')
+
+        self.dbg.bp_del(BASE + 0x41)
+        self.assertEqual(self.dbg.read_process_memory(BASE + 0x41, 1), b'\x41')
+
+    def test_cached_read_of_protected_page_restores_its_protection(self):
+        self.process.map(BASE + 2 * PAGE_SIZE, b'\x11' * PAGE_SIZE, protection=PAGE_NOACCESS)
+
+        self.assertEqual(self.dbg.read_process_memory(BASE + 2 * PAGE_SIZE - 2, 4), b'\xFE\xFF\x11\x11')
+        self.assertEqual(self.process.protections[BASE + 2 * PAGE_SIZE], PAGE_NOACCESS)
+
+    def test_cache_is_dropped_when_the_event_is_continued(self):
+        self.dbg._page_cache.disable()
+        seen = []
+
+        def handler(dbg):
+            seen.append(dbg.read_process_memory(BASE, 2))
+            seen.append(dbg.read_process_memory(BASE + 2, 2))
+            seen.append(dbg._page_cache.enabled)
+            return DBG_CONTINUE
+
+        self.dbg.set_callback(EXCEPTION_CUSTOM, handler)
+        self.process.queue_event(EXCEPTION_DEBUG_EVENT, EXCEPTION_CUSTOM)
+        self.dbg.debug_event_iteration()
+
+        self.assertEqual(seen, [b'\x00\x01', b'\x02\x03', True])
+        self.assertEqual(self.process.calls['ReadProcessMemory'], 1)
+        self.assertEqual(self.process.calls['ContinueDebugEvent'], 1)
+        self.assertFalse(self.dbg._page_cache.enabled)
+        self.assertEqual(self.dbg._page_cache.pages, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
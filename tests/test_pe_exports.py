@@ -0,0 +1,211 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import struct
+import unittest
+
+from pydbg.errors import PDError
+from pydbg.module_map import ModuleRecord
+from pydbg.pe_exports import EXPORT_DATA_DIRECTORY, ExportCache, ExportIndex
+
+from tests.fake_process import DebuggerTestCase
+
+BASE = 0x7C800000
+E_LFANEW = 0x80
+DIRECTORY = 0x1000
+
+
+def build_image(exports, forwarders=None, ordinal_base=1, size=0x2000):
+    """
+    Lay out a minimal 32-bit PE image exporting the specified functions.
+
+    @type  exports:    List
+    @param exports:    (name, RVA) pairs, in ordinal order. Names may be None for exports by ordinal only
+    @type  forwarders: Dictionary
+    @param forwarders: (Optional) Name -> forwarder string ("DLL.Function") of forwarded exports
+    @type  size:       Integer
+    @param size:       (Optional, def=0x2000) Size of the image
+
+    @rtype:  bytearray
+    @return: Image, as mapped at its base address.
+    """
+
+    forwarders = forwarders or {}
+    image = bytearray(size)
+    image[0:2] = b'MZ'
+    struct.pack_into('<I', image, 0x3C, E_LFANEW)
+    image[E_LFANEW:E_LFANEW + 4] = b'PE\x00\x00'
+
+    named = sorted((name, index) for (index, (name, rva)) in enumerate(exports) if name)
+    functions = DIRECTORY + 0x28
+    names = functions + 4 * len(exports)
+    ordinals = names + 4 * len(named)
+    strings = ordinals + 2 * len(named)
+
+    # forwarded exports point at their forwarder string, within the directory.
+    rvas = []
+    string_data = bytearray()
+
+    for (name, rva) in exports:
+        if name in forwarders:
+            rva = strings + len(string_data)
+            string_data += forwarders[name].encode() + b'\x00'
+
+        rvas.append(rva)
+
+    name_rvas = []
+
+    for (name, index) in named:
+        name_rvas.append(strings + len(string_data))
+        string_data += name.encode() + b'\x00'
+
+    end = strings + len(string_data)
+
+    struct.pack_into('<II', image, E_LFANEW + EXPORT_DATA_DIRECTORY, DIRECTORY, end - DIRECTORY)
+    struct.pack_into('<IIIIII', image, DIRECTORY + 0x10,
+                     ordinal_base, len(exports), len(named), functions, names, ordinals)
+    struct.pack_into('<{}I'.format(len(rvas)), image, functions, *rvas)
+    struct.pack_into('<{}I'.format(len(named)), image, names, *name_rvas)
+    struct.pack_into('<{}H'.format(len(named)), image, ordinals, *(index for (name, index) in named))
+    image[strings:end] = string_data
+
+    return image
+
+
+class Memory(object):
+    """read(address, length) over an image, short reads past its end"""
+
+    def __init__(self, image, base=BASE):
+        self.image = image
+        self.base = base
+        self.reads = 0
+
+    def __call__(self, address, length):
+        self.reads += 1
+        offset = address - self.base
+
+        if offset < 0:
+            return b''
+
+        return bytes(self.image[offset:offset + length])
+
+
+EXPORTS = [('CreateFileA', 0x100), ('CreateFileW', 0x180), (None, 0x200), ('ExitProcess', 0x0), ('HeapAlloc', 0x300)]
+
+
+class ExportIndexTest(unittest.TestCase):
+    def parse(self, image):
+        self.memory = Memory(image)
+        return ExportIndex.parse(self.memory, BASE)
+
+    def test_exports(self):
+        index = self.parse(build_image(EXPORTS, {'HeapAlloc': 'NTDLL.RtlAllocateHeap'}))
+
+        self.assertEqual(index.resolve('CreateFileW'), BASE + 0x180)
+        self.assertIsNone(index.resolve('createfilew'))
+        self.assertEqual(index.resolve_ordinal(3), BASE + 0x200)
+        self.assertIsNone(index.resolve_ordinal(4))
+        self.assertEqual(index.forwarders, {'HeapAlloc': 'NTDLL.RtlAllocateHeap'})
+        self.assertEqual(index.nearest(0x184), ('CreateFileW', 4))
+        self.assertEqual(index.nearest(0x210), ('#3', 0x10))
+        self.assertIsNone(index.nearest(0xFF))
+
+        # DOS header, PE headers and the whole directory.
+        self.assertEqual(self.memory.reads, 3)
+
+    def test_ordinal_base(self):
+        index = self.parse(build_image(EXPORTS, ordinal_base=100))
+
+        self.assertEqual(index.resolve_ordinal(100), BASE + 0x100)
+        self.assertIsNone(index.resolve_ordinal(1))
+
+    def test_no_exports(self):
+        image = build_image(EXPORTS)
+        struct.pack_into('<II', image, E_LFANEW + EXPORT_DATA_DIRECTORY, 0, 0)
+
+        self.assertEqual(len(self.parse(image)), 0)
+
+    def test_invalid_headers(self):
+        image = build_image(EXPORTS)
+        image[0:2] = b'ZM'
+
+        with self.assertRaises(PDError):
+            self.parse(image)
+
+        image = build_image(EXPORTS)
+        struct.pack_into('<I', image, 0x3C, 0x10000)
+
+        with self.assertRaises(PDError):
+            self.parse(image)
+
+    def test_truncated_export_tables(self):
+        image = build_image(EXPORTS)
+
+        # the module ends within the directory, the tables come back short.
+        for size in (DIRECTORY + 0x10, DIRECTORY + 0x30, DIRECTORY + 0x40):
+            with self.assertRaises(PDError):
+                self.parse(image[:size])
+
+    def test_corrupted_counts(self):
+        image = build_image(EXPORTS)
+        struct.pack_into('<I', image, DIRECTORY + 0x14, 0x7FFFFFFF)
+
+        with self.assertRaises(PDError):
+            self.parse(image)
+
+        # more names than the function table holds, the stray ordinals are skipped.
+        image = build_image(EXPORTS)
+        struct.pack_into('<H', image, DIRECTORY + 0x28 + 4 * len(EXPORTS) + 4 * 4, 0xFFFF)
+
+        self.assertEqual(len(self.parse(image)), 3)
+
+    def test_cache(self):
+        cache = ExportCache()
+        memory = Memory(build_image(EXPORTS))
+
+        self.assertIs(cache.get(memory, BASE), cache.get(memory, BASE))
+
+        cache.drop(BASE)
+        cache.get(memory, BASE)
+
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'modules': 1})
+
+
+class FuncResolveDebuggeeTest(DebuggerTestCase):
+    def load(self, image, name='kernel32.dll'):
+        self.process.map(BASE, image)
+        self.dbg.module_map.add(ModuleRecord(name, 'c:\\windows\\system32\\' + name, BASE, len(image)))
+
+    def test_resolve(self):
+        self.load(build_image(EXPORTS))
+
+        self.assertEqual(self.dbg.func_resolve_debuggee('KERNEL32', 'HeapAlloc'), BASE + 0x300)
+        self.assertIsNone(self.dbg.func_resolve_debuggee('kernel32.dll', 'Missing'))
+        self.assertIsNone(self.dbg.func_resolve_debuggee('user32.dll', 'HeapAlloc'))
+
+    def test_corrupted_export_table(self):
+        image = build_image(EXPORTS)
+        struct.pack_into('<I', image, DIRECTORY + 0x1C, 0x1FF0)
+        self.load(image)
+
+        self.assertIsNone(self.dbg.func_resolve_debuggee('kernel32.dll', 'HeapAlloc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import threading
+import unittest
+
+from pydbg.errors import PDError
+from pydbg.mem_snapshot import PageStore
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00400000
+REGIONS = 32
+WORKERS = 4
+
+
+class ProcessSnapshotTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # one page regions, each mapped on its own so they are not merged.
+        for index in range(REGIONS):
+            self.process.map(BASE + 2 * index * PAGE_SIZE, bytes([index + 1]) * PAGE_SIZE)
+
+    def snapshot(self, workers, store=None):
+        self.dbg.process_snapshot(mem_only=True, store=store, workers=workers)
+
+        return [(block.mbi.BaseAddress, block.data) for block in self.dbg.memory_snapshot_blocks]
+
+    def track_reads(self, name, store):
+        """Record, on every read, how many regions were read but not yet kept as blocks."""
+
+        lock = threading.Lock()
+        read = getattr(self.dbg, name)
+        reads = []
+        held = []
+
+        def tracked(*args):
+            with lock:
+                reads.append(args[0])
+                held.append(len(reads) - store.pages_put)
+
+            return read(*args)
+
+        setattr(self.dbg, name, tracked)
+        return held
+
+    def test_parallel_snapshot_matches_sequential(self):
+        expected = [(BASE + 2 * index * PAGE_SIZE, bytes([index + 1]) * PAGE_SIZE) for index in range(REGIONS)]
+
+        self.assertEqual(self.snapshot(0), expected)
+        self.assertEqual(self.snapshot(WORKERS), expected)
+        self.assertEqual(self.snapshot(WORKERS, PageStore(PAGE_SIZE)), expected)
+
+    def test_sequential_snapshot_keeps_each_region_as_it_is_read(self):
+        store = PageStore(PAGE_SIZE)
+        held = self.track_reads('read_process_memory', store)
+
+        self.snapshot(0, store)
+
+        self.assertEqual(len(held), REGIONS)
+        self.assertEqual(max(held), 1)
+
+    def test_parallel_snapshot_bounds_the_buffers_in_flight(self):
+        self.process.read_latency = 0.001
+        store = PageStore(PAGE_SIZE)
+        held = self.track_reads('_read_process_memory_into', store)
+
+        self.snapshot(WORKERS, store)
+
+        self.assertEqual(len(held), REGIONS)
+        self.assertLessEqual(max(held), 2 * WORKERS)
+        self.assertEqual(store.pages_put, REGIONS)
+
+    def test_parallel_snapshot_raises_on_the_first_unreadable_region(self):
+        read = self.dbg._read_process_memory_into
+        failing = (BASE + 2 * 5 * PAGE_SIZE, BASE + 2 * 9 * PAGE_SIZE)
+
+        def read_into(address, buffer):
+            if address in failing:
+                raise PDError('ReadProcessMemory(0x{:08x})'.format(address))
+
+            return read(address, buffer)
+
+        self.dbg._read_process_memory_into = read_into
+
+        with self.assertRaises(PDError) as raised:
+            self.snapshot(WORKERS)
+
+        self.assertIn('0x{:08x}'.format(failing[0]), str(raised.exception))
+
+
+class ProcessRestoreTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # four regions of four pages.
+        for index in range(4):
+            self.process.map(BASE + 8 * index * PAGE_SIZE, bytes([index + 1]) * PAGE_SIZE * 4)
+
+        self.process.threads = [1, 2]
+        self.dbg.process_snapshot()
+        self.process.calls.clear()
+
+    def test_enumerated_threads_are_saved(self):
+        self.assertEqual([context.thread_id for context in self.dbg.memory_snapshot_contexts], [1, 2])
+
+    def test_incremental_restore_writes_the_dirty_pages_only(self):
+        self.process.poke(BASE + 8 * PAGE_SIZE + PAGE_SIZE + 0x10, b'\xCC')
+
+        self.dbg.process_restore(incremental=True)
+
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 1)
+        self.assertEqual(self.process.peek(BASE + 8 * PAGE_SIZE, 4 * PAGE_SIZE), b'\x02' * PAGE_SIZE * 4)
+        self.assertEqual((self.dbg.last_restore['pages'], self.dbg.last_restore['pages_written']), (16, 1))
+
+        # both threads still run, their contexts are put back.
+        self.assertEqual(self.process.calls['SetThreadContext'], 2)
+
+    def test_incremental_restore_merges_adjacent_pages(self):
+        self.process.poke(BASE + 2 * PAGE_SIZE - 1, b'\xCC\xCC')
+        self.process.poke(BASE + 24 * PAGE_SIZE + 3 * PAGE_SIZE, b'\xCC')
+        self.process.threads = [1]
+
+        self.dbg.process_restore(incremental=True)
+
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 2)
+        self.assertEqual(self.process.peek(BASE, 4 * PAGE_SIZE), b'\x01' * PAGE_SIZE * 4)
+        self.assertEqual(self.process.peek(BASE + 24 * PAGE_SIZE, 4 * PAGE_SIZE), b'\x04' * PAGE_SIZE * 4)
+        self.assertEqual(self.dbg.last_restore['pages_written'], 3)
+        self.assertEqual(self.process.calls['SetThreadContext'], 1)
+
+    def test_untouched_snapshot_writes_nothing(self):
+        self.dbg.process_restore(incremental=True)
+
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 0)
+        self.assertEqual(self.dbg.last_restore['pages_written'], 0)
+
+    def test_full_restore_writes_every_block(self):
+        self.process.poke(BASE + 0x10, b'\xCC')
+
+        self.dbg.process_restore()
+
+        self.assertEqual(self.process.calls['WriteProcessMemory'], 4)
+        self.assertEqual(self.process.peek(BASE, 1), b'\x01')
+        self.assertEqual((self.dbg.last_restore['pages'], self.dbg.last_restore['pages_written']), (16, 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
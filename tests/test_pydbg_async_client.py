@@ -0,0 +1,182 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import asyncio
+import unittest
+
+from pydbg.defines import DBG_EXCEPTION_NOT_HANDLED, USER_CALLBACK_DEBUG_EVENT
+from pydbg.errors import PDError
+from pydbg.pydbg_async_client import AsyncPyDBGClient
+from pydbg.wire import AsyncChannel
+
+
+class StubServerTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Test case running a scripted server on loopback. Tests set self.serve to a coroutine function
+    driving the server side AsyncChannel, then connect self.client to it with connect().
+    """
+
+    async def asyncSetUp(self):
+        self.serve = None
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.client = None
+
+    async def asyncTearDown(self):
+        if self.client:
+            await self.client.close()
+
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        channel = AsyncChannel(reader, writer)
+
+        try:
+            await self.serve(channel)
+        except PDError:
+            pass
+        finally:
+            await channel.close()
+
+    async def connect(self, serve):
+        self.serve = serve
+        self.client = await AsyncPyDBGClient.connect(*self.server.sockets[0].getsockname())
+
+
+class AsyncPyDBGClientTest(StubServerTestCase):
+    async def test_responses_out_of_order(self):
+        async def serve(channel):
+            requests = [await channel.recv_object() for _ in range(3)]
+
+            for (_, seq, method_name, payload) in reversed(requests):
+                await channel.send_object(('**SEQ**', seq, (method_name, payload[0])))
+
+            await channel.recv_object()
+
+        await self.connect(serve)
+        results = await asyncio.gather(self.client.a(1), self.client.b(2), self.client.c(3))
+
+        self.assertEqual(results, [('a', (1,)), ('b', (2,)), ('c', (3,))])
+
+    async def test_remote_exceptions(self):
+        async def serve(channel):
+            (_, seq, method_name, payload) = await channel.recv_object()
+            await channel.send_object(('**SEQ**', seq, ('exception', 'detach(): not attached')))
+            await channel.recv_object()
+
+        await self.connect(serve)
+
+        with self.assertRaisesRegex(PDError, 'not attached'):
+            await self.client.detach()
+
+        # handling the error must not have touched the reader.
+        await asyncio.sleep(0)
+        self.assertFalse(self.client.reader.done())
+
+    async def test_late_response_to_a_cancelled_call(self):
+        release = asyncio.Event()
+
+        async def serve(channel):
+            slow = await channel.recv_object()
+            await release.wait()
+            await channel.send_object(('**SEQ**', slow[1], 'late'))
+
+            (_, seq, method_name, payload) = await channel.recv_object()
+            await channel.send_object(('**SEQ**', seq, 'on time'))
+            await channel.recv_object()
+
+        await self.connect(serve)
+
+        call = asyncio.ensure_future(self.client.slow())
+        await asyncio.sleep(0.05)
+        call.cancel()
+        release.set()
+
+        self.assertEqual(await self.client.fast(), 'on time')
+        self.assertTrue(call.cancelled())
+        self.assertFalse(self.client.reader.done())
+
+    async def test_undecodable_frame_fails_pending_calls(self):
+        async def serve(channel):
+            await channel.recv_object()
+            await channel.send(b'not a pickle')
+            await channel.recv_object()
+
+        await self.connect(serve)
+
+        with self.assertRaisesRegex(PDError, 'connection severed'):
+            await asyncio.wait_for(self.client.anything(), 5)
+
+        with self.assertRaises(PDError):
+            await self.client.anything()
+
+    async def test_response_to_an_unknown_call(self):
+        async def serve(channel):
+            (_, seq, method_name, payload) = await channel.recv_object()
+            await channel.send_object(('**SEQ**', seq + 100, 'stray'))
+            await channel.send_object(('**SEQ**', seq, 'answer'))
+            await channel.recv_object()
+
+        await self.connect(serve)
+
+        self.assertEqual(await asyncio.wait_for(self.client.anything(), 5), 'answer')
+
+    async def test_server_going_away_fails_pending_calls(self):
+        async def serve(channel):
+            await channel.recv_object()
+
+        await self.connect(serve)
+
+        with self.assertRaises(PDError):
+            await asyncio.wait_for(self.client.anything(), 5)
+
+        with self.assertRaises(PDError):
+            await asyncio.wait_for(self.client.debug_event_loop(), 5)
+
+    async def test_debug_event_loop(self):
+        statuses = []
+
+        async def serve(channel):
+            (_, seq, method_name, payload) = await channel.recv_object()
+            await channel.send_object(('**SEQ**', seq, None))
+
+            await channel.recv_object()
+            await channel.send_object(('callback', None, None))
+
+            # calls made by the callback.
+            (_, seq, method_name, payload) = await channel.recv_object()
+            await channel.send_object(('**SEQ**', seq, 1234))
+
+            statuses.append((await channel.recv_object())[1])
+            await channel.send_object(('**EXIT**',))
+            await channel.recv_object()
+
+        async def callback(dbg):
+            self.assertEqual(await dbg.pid(), 1234)
+            return DBG_EXCEPTION_NOT_HANDLED
+
+        await self.connect(serve)
+        await self.client.set_callback(USER_CALLBACK_DEBUG_EVENT, callback)
+        await asyncio.wait_for(self.client.debug_event_loop(), 5)
+
+        self.assertEqual(statuses, [DBG_EXCEPTION_NOT_HANDLED])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import socket
+import threading
+import unittest
+
+from pydbg.defines import (
+    DBG_CONTINUE, DBG_EXCEPTION_NOT_HANDLED, USER_CALLBACK_DEBUG_EVENT, EXCEPTION_DEBUG_EVENT,
+    EXCEPTION_ACCESS_VIOLATION, EXCEPTION_BREAKPOINT, EXIT_THREAD_DEBUG_EVENT,
+)
+from pydbg.errors import PDError
+from pydbg.event_filter import EventFilter
+from pydbg.pydbg_server import PyDBGRequestHandler, PyDBGServer
+from pydbg.wire import MAX_FRAME_SIZE, Channel
+
+from tests.fake_process import DebuggerTestCase
+
+EXCEPTION_INT_DIVIDE_BY_ZERO = 0xC0000094
+
+
+class StubPyDBG(object):
+    """Stand-in for the PyDBG instance backing a connection"""
+
+    def __init__(self):
+        self.pid = 1234
+        self.dbg = None
+        self.context = None
+        self.callbacks = {}
+        self.statuses = []  # continue statuses returned by the callbacks during debug_event_loop()
+
+    def set_callback(self, exception_code, callback_func):
+        if not isinstance(exception_code, int):
+            raise PDError('invalid exception code {!r}'.format(exception_code))
+
+        self.callbacks[exception_code] = callback_func
+
+    def read_process_memory(self, address, length):
+        return bytes((address + i) & 0xFF for i in range(length))
+
+    def detach(self):
+        raise PDError('not attached')
+
+    def dump(self, length):
+        return bytes(length)
+
+    def debug_event_loop(self):
+        # user callback events only, they carry no DEBUG_EVENT.
+        for callback in list(self.callbacks.values()):
+            self.statuses.append(callback(self))
+
+
+class StubServer(object):
+    def __init__(self):
+        self.instances = []
+        self.server = PyDBGServer(('127.0.0.1', 0), pydbg_factory=self.factory, max_workers=4)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+        self.thread.start()
+
+    def factory(self):
+        instance = StubPyDBG()
+        self.instances.append(instance)
+        return instance
+
+    def connect(self):
+        return Channel(socket.create_connection(self.server.server_address))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join(5)
+
+
+class PyDBGServerTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.addCleanup(self.stub.close)
+
+        self.channel = self.stub.connect()
+        self.addCleanup(self.channel.close)
+
+    def call(self, request):
+        self.channel.send_object(request)
+        return self.channel.recv_object()
+
+    def test_attributes_and_methods(self):
+        self.assertEqual(self.call(('pid', ((), {}))), 1234)
+        self.assertEqual(self.call(('read_process_memory', ((0x10, 4), {}))), b'\x10\x11\x12\x13')
+
+    def test_failures_are_returned(self):
+        self.assertEqual(self.call(('detach', ((), {}))), ('exception', 'detach(): not attached'))
+        self.assertEqual(self.call(('missing', ((), {})))[0], 'exception')
+
+    def test_set_callback_failure_is_returned(self):
+        (tag, message) = self.call(('set_callback', 'bogus'))
+
+        self.assertEqual(tag, 'exception')
+        self.assertIn('set_callback(): invalid exception code', message)
+
+        # the connection is still served.
+        self.assertEqual(self.call(('pid', ((), {}))), 1234)
+
+    def test_batch_and_pipelined_calls(self):
+        self.assertEqual(self.call(('**BATCH**', [('pid', ((), {})), ('read_process_memory', ((1, 2), {}))])),
+                         [1234, b'\x01\x02'])
+        self.assertEqual(self.call(('**SEQ**', 7, 'pid', ((), {}))), ('**SEQ**', 7, 1234))
+
+    def test_oversized_responses_are_returned_as_failures(self):
+        dump = ('dump', ((MAX_FRAME_SIZE + 1,), {}))
+
+        (tag, message) = self.call(dump)
+        self.assertEqual(tag, 'exception')
+        self.assertIn('dump(): frame of', message)
+
+        (tag, message) = self.call(('**SEQ**', 8, *dump))[2]
+        self.assertEqual(tag, 'exception')
+
+        self.assertEqual([ret[0] for ret in self.call(('**BATCH**', [('pid', ((), {})), dump]))],
+                         ['exception', 'exception'])
+
+        # the connection is still served.
+        self.assertEqual(self.call(('pid', ((), {}))), 1234)
+
+    def test_debug_event_loop_forwards_callbacks(self):
+        self.assertIsNone(self.call(('set_callback', USER_CALLBACK_DEBUG_EVENT)))
+
+        self.channel.send_object(('debug_event_loop', ()))
+        self.assertEqual(self.channel.recv_object(), ('callback', None, None))
+
+        # requests are served while the client handles the event.
+        self.assertEqual(self.call(('pid', ((), {}))), 1234)
+
+        self.channel.send_object(('**DONE**', DBG_EXCEPTION_NOT_HANDLED))
+        self.assertEqual(self.channel.recv_object(), ('**EXIT**',))
+        self.assertEqual(self.stub.instances[0].statuses, [DBG_EXCEPTION_NOT_HANDLED])
+
+    def test_each_connection_gets_its_own_instance(self):
+        other = self.stub.connect()
+        self.addCleanup(other.close)
+
+        self.call(('set_callback', USER_CALLBACK_DEBUG_EVENT))
+        other.send_object(('pid', ((), {})))
+        other.recv_object()
+
+        self.assertEqual(len(self.stub.instances), 2)
+        self.assertEqual([len(instance.callbacks) for instance in self.stub.instances], [1, 0])
+
+
+class FilteredEventTest(DebuggerTestCase):
+    """Events filtered out by the server are continued as PyDBG would without a callback"""
+
+    def setUp(self):
+        super().setUp()
+
+        # connection state only, forward_callback() must not touch the socket for filtered events.
+        self.handler = PyDBGRequestHandler.__new__(PyDBGRequestHandler)
+        self.handler.filters = {}
+        self.handler.events_filtered = 0
+        self.handler.events_forwarded = 0
+        self.handler.delta = None
+
+    def filtered(self, event_code, exception_code=0, address=0):
+        code = exception_code or event_code
+
+        self.handler.filters[code] = [EventFilter(thread_ids=[999])]
+        self.dbg.set_callback(code, lambda pydbg: self.handler.forward_callback(pydbg, code))
+
+        self.process.queue_event(event_code, exception_code, address=address)
+        self.dbg.debug_event_iteration()
+
+        self.assertEqual(self.handler.events_filtered, 1)
+        return self.process.continued[-1]
+
+    def test_access_violation(self):
+        self.assertEqual(self.filtered(EXCEPTION_DEBUG_EVENT, EXCEPTION_ACCESS_VIOLATION), DBG_EXCEPTION_NOT_HANDLED)
+
+    def test_other_exception(self):
+        self.assertEqual(self.filtered(EXCEPTION_DEBUG_EVENT, EXCEPTION_INT_DIVIDE_BY_ZERO), DBG_EXCEPTION_NOT_HANDLED)
+
+    def test_system_breakpoint(self):
+        self.dbg.system_break = 0x7C901230
+        self.dbg.first_breakpoint = False
+
+        self.assertEqual(self.filtered(EXCEPTION_DEBUG_EVENT, EXCEPTION_BREAKPOINT, 0x7C901230), DBG_CONTINUE)
+
+    def test_debug_event(self):
+        self.assertEqual(self.filtered(EXIT_THREAD_DEBUG_EVENT), DBG_CONTINUE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+
+from pydbg.defines import (
+    MEMORY_BASIC_INFORMATION, MEM_COMMIT, MEM_DECOMMIT, MEM_FREE, MEM_PRIVATE, MEM_RELEASE, MEM_RESERVE,
+    PAGE_EXECUTE_READWRITE, PAGE_NOACCESS, PAGE_READONLY, PAGE_READWRITE,
+)
+from pydbg.region_map import MemoryRegion, RegionMap
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00400000
+
+
+def mbi(base, size, protect=PAGE_READWRITE, state=MEM_COMMIT, allocation_base=None):
+    info = MEMORY_BASIC_INFORMATION()
+    info.BaseAddress = base
+    info.RegionSize = size
+    info.State = state
+    info.Protect = protect
+    info.Type = MEM_PRIVATE
+    info.AllocationBase = base if allocation_base is None else allocation_base
+    info.AllocationProtect = protect
+    return info
+
+
+class RegionMapTest(unittest.TestCase):
+    def setUp(self):
+        self.map = RegionMap(PAGE_SIZE)
+
+        # an allocation of four read / write pages between two free ranges.
+        self.map.load([
+            mbi(0, BASE, PAGE_NOACCESS, MEM_FREE, 0),
+            mbi(BASE, 4 * PAGE_SIZE),
+            mbi(BASE + 4 * PAGE_SIZE, 0x10000, PAGE_NOACCESS, MEM_FREE, 0),
+        ])
+
+    def layout(self):
+        return [(region.base, region.size, region.state, region.protect) for region in self.map]
+
+    def test_find(self):
+        self.assertEqual(self.map.find(BASE).base, BASE)
+        self.assertEqual(self.map.find(BASE + 4 * PAGE_SIZE - 1).base, BASE)
+        self.assertEqual(self.map.find(BASE + 4 * PAGE_SIZE).state, MEM_FREE)
+        self.assertIsNone(self.map.find(BASE + 4 * PAGE_SIZE + 0x10000))
+        self.assertEqual(self.map.stats(), {'hits': 3, 'misses': 1, 'regions': 3})
+
+    def test_to_mbi_starts_at_the_queried_page(self):
+        info = self.map.find(BASE + PAGE_SIZE + 8).to_mbi(BASE + PAGE_SIZE + 8, PAGE_SIZE)
+
+        self.assertEqual((info.BaseAddress, info.RegionSize, info.AllocationBase), (BASE + PAGE_SIZE, 3 * PAGE_SIZE, BASE))
+
+    def test_insert_replaces_the_range(self):
+        self.map.insert(MemoryRegion.from_mbi(mbi(BASE + PAGE_SIZE, PAGE_SIZE, PAGE_READONLY, allocation_base=BASE)))
+
+        self.assertEqual(self.layout()[1:4], [
+            (BASE, PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE),
+            (BASE + PAGE_SIZE, PAGE_SIZE, MEM_COMMIT, PAGE_READONLY),
+            (BASE + 2 * PAGE_SIZE, 2 * PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE),
+        ])
+
+    def test_set_protect_splits_then_merges(self):
+        self.map.set_protect(BASE + PAGE_SIZE + 0x10, 0x20, PAGE_EXECUTE_READWRITE)
+
+        self.assertEqual(len(self.map), 5)
+        self.assertEqual(self.map.find(BASE + PAGE_SIZE).protect, PAGE_EXECUTE_READWRITE)
+        self.assertEqual(self.map.find(BASE).size, PAGE_SIZE)
+
+        self.map.set_protect(BASE + PAGE_SIZE, PAGE_SIZE, PAGE_READWRITE)
+
+        self.assertEqual(self.layout()[1], (BASE, 4 * PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE))
+        self.assertEqual(len(self.map), 3)
+
+    def test_regions_of_different_allocations_are_not_merged(self):
+        self.map.insert(MemoryRegion.from_mbi(mbi(BASE + 4 * PAGE_SIZE, PAGE_SIZE)))
+
+        self.assertEqual([region.base for region in self.map][1:3], [BASE, BASE + 4 * PAGE_SIZE])
+
+    def test_allocate(self):
+        self.map.allocate(BASE + 4 * PAGE_SIZE + 8, 0x10, MEM_RESERVE, PAGE_READWRITE)
+        reserved = self.map.find(BASE + 4 * PAGE_SIZE)
+
+        self.assertEqual((reserved.base, reserved.size, reserved.state, reserved.protect),
+                         (BASE + 4 * PAGE_SIZE, PAGE_SIZE, MEM_RESERVE, 0))
+
+        self.map.allocate(BASE + 4 * PAGE_SIZE, PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE)
+        committed = self.map.find(BASE + 4 * PAGE_SIZE)
+
+        self.assertEqual((committed.state, committed.protect, committed.allocation_base),
+                         (MEM_COMMIT, PAGE_READWRITE, BASE + 4 * PAGE_SIZE))
+
+    def test_free_decommit(self):
+        self.map.free(BASE + PAGE_SIZE, 2 * PAGE_SIZE, MEM_DECOMMIT)
+
+        self.assertEqual(self.layout()[1:4], [
+            (BASE, PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE),
+            (BASE + PAGE_SIZE, 2 * PAGE_SIZE, MEM_RESERVE, 0),
+            (BASE + 3 * PAGE_SIZE, PAGE_SIZE, MEM_COMMIT, PAGE_READWRITE),
+        ])
+
+    def test_free_release_forgets_the_allocation(self):
+        self.map.complete = True
+        self.map.set_protect(BASE, PAGE_SIZE, PAGE_READONLY)
+        self.map.free(BASE, 0, MEM_RELEASE)
+
+        self.assertIsNone(self.map.find(BASE))
+        self.assertIsNone(self.map.find(BASE + 3 * PAGE_SIZE))
+        self.assertEqual(len(self.map), 2)
+        self.assertFalse(self.map.complete)
+
+
+class RegionMapDebuggerTest(DebuggerTestCase):
+    def test_write_leaves_the_region_whole(self):
+        self.process.map(BASE, size=4 * PAGE_SIZE)
+        self.dbg._region_map.enable()
+        self.dbg.memory_regions()
+
+        self.dbg.write_process_memory(BASE + PAGE_SIZE + 8, b'\x41' * 4)
+        self.dbg.process_snapshot(mem_only=True)
+
+        self.assertEqual([(block.mbi.BaseAddress, block.mbi.RegionSize) for block in self.dbg.memory_snapshot_blocks],
+                         [(BASE, 4 * PAGE_SIZE)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import unittest
+
+from pydbg.defines import MEMORY_BASIC_INFORMATION
+from pydbg.mem_snapshot import MemSnapshotBlock, MemSnapshotContext, PageStore
+from pydbg.snapshot_diff import CHUNK_PAGES, WORKER_BATCH, ChangedRange, changed_ranges, diff_snapshots
+
+from tests.test_codec import sample_context
+
+PAGE_SIZE = 0x1000
+BASE = 0x00400000
+
+
+def block(base, data, store=None):
+    mbi = MEMORY_BASIC_INFORMATION()
+    (mbi.BaseAddress, mbi.RegionSize) = (base, len(data))
+
+    return MemSnapshotBlock(mbi, bytes(data), store)
+
+
+class ChangedRangesTest(unittest.TestCase):
+    def test_identical_buffers(self):
+        data = os.urandom(0x1000)
+        self.assertEqual(changed_ranges(BASE, data, bytes(data)), [])
+
+    def test_runs(self):
+        old = bytes(0x200)
+        new = bytearray(old)
+        new[0x10] = 1
+        new[0x3E:0x42] = b'\x01\x02\x03\x04'  # across a stripe boundary
+        new[0x1FF] = 2
+
+        self.assertEqual(changed_ranges(BASE, old, bytes(new)), [
+            ChangedRange(BASE + 0x10, b'\x00', b'\x01'),
+            ChangedRange(BASE + 0x3E, bytes(4), b'\x01\x02\x03\x04'),
+            ChangedRange(BASE + 0x1FF, b'\x00', b'\x02'),
+        ])
+
+    def test_short_buffers(self):
+        self.assertEqual(changed_ranges(BASE, b'\x00\x01\x02', b'\x00\x01\x03'), [ChangedRange(BASE + 2, b'\x02', b'\x03')])
+
+
+class DiffSnapshotsTest(unittest.TestCase):
+    def setUp(self):
+        self.data = bytearray(os.urandom(8 * PAGE_SIZE))
+
+    def diff(self, old_blocks, new_blocks, *contexts, workers=0):
+        return diff_snapshots(old_blocks, new_blocks, *contexts, page_size=PAGE_SIZE, workers=workers)
+
+    def test_identical_snapshots(self):
+        diff = self.diff([block(BASE, self.data)], [block(BASE, self.data)])
+
+        self.assertFalse(diff)
+        self.assertEqual((diff.pages_compared, diff.pages_changed, diff.bytes_changed), (8, 0, 0))
+
+    def test_identical_pages_of_a_store_compare_by_identity(self):
+        store = PageStore(PAGE_SIZE)
+        diff = self.diff([block(BASE, self.data, store)], [block(BASE, self.data, store)])
+
+        self.assertFalse(diff)
+
+    def test_single_changed_byte(self):
+        new = bytearray(self.data)
+        new[3 * PAGE_SIZE + 5] ^= 0xFF
+
+        diff = self.diff([block(BASE, self.data)], [block(BASE, new)])
+
+        self.assertEqual(diff.ranges, [ChangedRange(BASE + 3 * PAGE_SIZE + 5, self.data[3 * PAGE_SIZE + 5:3 * PAGE_SIZE + 6],
+                                                    new[3 * PAGE_SIZE + 5:3 * PAGE_SIZE + 6])])
+        self.assertEqual((diff.pages_changed, diff.bytes_changed), (1, 1))
+
+    def test_run_across_a_page_boundary(self):
+        new = bytearray(self.data)
+        new[PAGE_SIZE - 2:PAGE_SIZE + 2] = bytes(x ^ 0xFF for x in new[PAGE_SIZE - 2:PAGE_SIZE + 2])
+
+        diff = self.diff([block(BASE, self.data)], [block(BASE, new)])
+
+        self.assertEqual(diff.ranges, [ChangedRange(BASE + PAGE_SIZE - 2, bytes(self.data[PAGE_SIZE - 2:PAGE_SIZE + 2]),
+                                                    bytes(new[PAGE_SIZE - 2:PAGE_SIZE + 2]))])
+        self.assertEqual(diff.pages_changed, 2)
+
+    def test_run_across_chunks(self):
+        size = (CHUNK_PAGES + 2) * PAGE_SIZE
+        (old, new) = (bytes(size), b'\x01' * size)
+
+        diff = self.diff([block(BASE, old)], [block(BASE, new)])
+
+        # searched as two chunks, reported as one range.
+        self.assertEqual(diff.ranges, [ChangedRange(BASE, old, new)])
+
+    def test_regions(self):
+        flipped = bytes([self.data[6 * PAGE_SIZE] ^ 0xFF])
+        old_blocks = [block(BASE, self.data), block(0x00500000, bytes(PAGE_SIZE)), block(0x00600000, self.data)]
+        new_blocks = [block(BASE, self.data[:6 * PAGE_SIZE] + flipped), block(0x00600000, self.data),
+                      block(0x00700000, bytes(PAGE_SIZE))]
+
+        diff = self.diff(old_blocks, new_blocks)
+
+        self.assertEqual([mbi.BaseAddress for mbi in diff.regions_removed], [0x00500000])
+        self.assertEqual([mbi.BaseAddress for mbi in diff.regions_added], [0x00700000])
+        self.assertEqual(diff.regions_resized, [(BASE, 8 * PAGE_SIZE, 6 * PAGE_SIZE + 1)])
+
+        # only the overlap of the resized block is compared.
+        self.assertEqual(diff.ranges, [ChangedRange(BASE + 6 * PAGE_SIZE, self.data[6 * PAGE_SIZE:6 * PAGE_SIZE + 1], flipped)])
+
+    def test_threads_and_registers(self):
+        old_contexts = [MemSnapshotContext(1, sample_context()), MemSnapshotContext(2, sample_context())]
+        new_contexts = [MemSnapshotContext(2, sample_context(0x00401005)), MemSnapshotContext(3, sample_context())]
+        new_contexts[0].context.Eax = 7
+
+        diff = self.diff([], [], old_contexts, new_contexts)
+
+        self.assertTrue(diff)
+        self.assertEqual(diff.threads_removed, [1])
+        self.assertEqual(diff.threads_added, [3])
+        self.assertEqual(diff.registers, {2: {'Eax': (1, 7), 'Eip': (0x00401000, 0x00401005)}})
+
+    def test_workers_match_serial(self):
+        # changed pages a page apart, one chunk each, enough of them to be handed to worker processes.
+        pages = 2 * (WORKER_BATCH + 4)
+        old = os.urandom(2 * pages * PAGE_SIZE)
+        new = bytearray(old)
+
+        for page in range(0, 2 * pages, 2):
+            offset = page * PAGE_SIZE + page * 7
+            new[offset:offset + 3] = bytes(x ^ 0xFF for x in new[offset:offset + 3])
+
+        serial = self.diff([block(BASE, old)], [block(BASE, new)])
+        parallel = self.diff([block(BASE, old)], [block(BASE, new)], workers=2)
+
+        self.assertEqual(len(serial.ranges), pages)
+        self.assertEqual(parallel.ranges, serial.ranges)
+        self.assertEqual((parallel.pages_compared, parallel.pages_changed), (serial.pages_compared, serial.pages_changed))
+
+
+if __name__ == '__main__':
+    unittest.main()
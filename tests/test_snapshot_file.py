@@ -0,0 +1,175 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pydbg.defines import CONTEXT, MEMORY_BASIC_INFORMATION
+from pydbg.errors import PDError
+from pydbg.mem_snapshot import MemSnapshotBlock, MemSnapshotContext
+from pydbg.snapshot_file import HEADER, REGION, SnapshotFile, save_snapshot
+
+from tests.fake_process import PAGE_SIZE, DebuggerTestCase
+
+BASE = 0x00400000
+
+
+def block(address, data):
+    mbi = MEMORY_BASIC_INFORMATION()
+    mbi.BaseAddress = address
+    mbi.RegionSize = len(data)
+    return MemSnapshotBlock(mbi, data)
+
+
+def thread_context(thread_id):
+    context = CONTEXT()
+    context.Eax = thread_id
+    return MemSnapshotContext(thread_id, context)
+
+
+class SnapshotFileTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'snapshot')
+
+    def save(self, blocks, contexts=()):
+        return save_snapshot(self.path, blocks, list(contexts), PAGE_SIZE)
+
+    def rewrite(self, offset, data):
+        with open(self.path, 'r+b') as fh:
+            fh.seek(offset)
+            fh.write(data)
+
+    def assertRejected(self):
+        with self.assertRaises(PDError):
+            SnapshotFile(self.path)
+
+    def test_round_trip(self):
+        self.save([block(BASE, b'\x41' * PAGE_SIZE), block(BASE + 0x10000, b'\x42' * 2 * PAGE_SIZE)],
+                  [thread_context(4), thread_context(8)])
+
+        snapshot = SnapshotFile(self.path)
+        self.addCleanup(snapshot.close)
+
+        self.assertEqual([(b.mbi.BaseAddress, b.mbi.RegionSize) for b in snapshot.blocks],
+                         [(BASE, PAGE_SIZE), (BASE + 0x10000, 2 * PAGE_SIZE)])
+        self.assertEqual(bytes(snapshot.blocks[1].view()), b'\x42' * 2 * PAGE_SIZE)
+        self.assertEqual([(c.thread_id, c.context.Eax) for c in snapshot.contexts], [(4, 4), (8, 8)])
+
+    def test_partially_read_region_is_saved_as_read(self):
+        partial = block(BASE, b'\x41' * PAGE_SIZE)
+        partial.mbi.RegionSize = 2 * PAGE_SIZE
+        self.save([partial])
+
+        snapshot = SnapshotFile(self.path)
+        self.addCleanup(snapshot.close)
+
+        self.assertEqual(snapshot.blocks[0].mbi.RegionSize, PAGE_SIZE)
+
+    def test_empty_file(self):
+        open(self.path, 'wb').close()
+        self.assertRejected()
+
+    def test_bad_magic(self):
+        self.save([block(BASE, b'\x41' * PAGE_SIZE)])
+        self.rewrite(0, b'NOTASNAP')
+        self.assertRejected()
+
+    def test_truncated_region_table(self):
+        self.save([block(BASE, b'\x41' * PAGE_SIZE)])
+        os.truncate(self.path, HEADER.size + REGION.size // 2)
+        self.assertRejected()
+
+    def test_truncated_data(self):
+        size = self.save([block(BASE, b'\x41' * PAGE_SIZE), block(BASE + 0x10000, b'\x42' * PAGE_SIZE)])
+        os.truncate(self.path, size - 1)
+        self.assertRejected()
+
+    def test_data_length_must_match_region_size(self):
+        self.save([block(BASE, b'\x41' * PAGE_SIZE)])
+        # RegionSize is the fourth field of the region entry.
+        self.rewrite(HEADER.size + 8 + 8 + 4, (2 * PAGE_SIZE).to_bytes(8, 'little'))
+        self.assertRejected()
+
+    def test_data_offset_past_the_end(self):
+        self.save([block(BASE, b'\x41' * PAGE_SIZE)])
+        self.rewrite(HEADER.size + REGION.size - 16, (1 << 40).to_bytes(8, 'little'))
+        self.assertRejected()
+
+
+class SnapshotLoadTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'snapshot')
+
+        self.process.map(BASE, b'\x41' * PAGE_SIZE)
+        self.dbg.process_snapshot(mem_only=True)
+        self.dbg.process_snapshot_save(self.path)
+        self.addCleanup(self.dbg._snapshot_file_close)
+
+    def test_restore_from_loaded_snapshot(self):
+        self.dbg.process_snapshot_load(self.path)
+        self.process.poke(BASE, b'\x00' * 0x10)
+
+        with mock.patch.object(self.dbg, 'enumerate_threads', return_value=[]):
+            self.dbg.process_restore()
+
+        self.assertEqual(self.process.peek(BASE, PAGE_SIZE), b'\x41' * PAGE_SIZE)
+
+    def test_loading_again_closes_the_previous_file(self):
+        self.dbg.process_snapshot_load(self.path)
+        first = self.dbg.snapshot_file
+
+        self.dbg.process_snapshot_load(self.path)
+
+        self.assertIsNot(self.dbg.snapshot_file, first)
+        self.assertTrue(first.mmap.closed)
+
+    def test_snapshot_closes_the_loaded_file(self):
+        self.dbg.process_snapshot_load(self.path)
+        loaded = self.dbg.snapshot_file
+
+        self.dbg.process_snapshot(mem_only=True)
+
+        self.assertIsNone(self.dbg.snapshot_file)
+        self.assertTrue(loaded.mmap.closed)
+        self.assertEqual(bytes(self.dbg.memory_snapshot_blocks[0].view()), b'\x41' * PAGE_SIZE)
+
+    def test_invalid_file_keeps_the_loaded_snapshot(self):
+        self.dbg.process_snapshot_load(self.path)
+        loaded = self.dbg.snapshot_file
+        truncated = self.path + '.truncated'
+
+        with open(truncated, 'wb') as fh:
+            fh.write(open(self.path, 'rb').read(HEADER.size))
+
+        with self.assertRaises(PDError):
+            self.dbg.process_snapshot_load(truncated)
+
+        self.assertIs(self.dbg.snapshot_file, loaded)
+        self.assertFalse(loaded.mmap.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import os
+import struct
+import unittest
+from unittest import mock
+
+from pydbg.defines import LOAD_DLL_DEBUG_EVENT, UNLOAD_DLL_DEBUG_EVENT
+from pydbg.pe_exports import ExportCache
+from pydbg.symbolizer import Symbolizer
+
+from tests.fake_process import DebuggerTestCase
+from tests.test_pe_exports import BASE, E_LFANEW, EXPORTS, Memory, build_image
+
+DEVICE = b'\\Device\\HarddiskVolume1'
+
+
+class SymbolizerTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = Memory(build_image(EXPORTS))
+        self.symbolizer = Symbolizer(self.memory)
+        self.symbolizer.set_modules([('kernel32.dll', BASE, 0x2000), ('app.exe', 0x00400000, 0x1000)])
+
+    def test_module_at(self):
+        self.assertEqual(len(self.symbolizer), 2)
+        self.assertEqual(self.symbolizer.module_at(BASE), ('kernel32.dll', BASE, 0x2000))
+        self.assertEqual(self.symbolizer.module_at(BASE + 0x1FFF)[0], 'kernel32.dll')
+        self.assertIsNone(self.symbolizer.module_at(BASE + 0x2000))
+        self.assertIsNone(self.symbolizer.module_at(0x1000))
+
+    def test_symbolize(self):
+        self.assertEqual(self.symbolizer.symbolize(BASE + 0x184), 'kernel32.dll!CreateFileW+0x4')
+        self.assertEqual(self.symbolizer.symbolize(BASE + 0x100), 'kernel32.dll!CreateFileA')
+        self.assertEqual(self.symbolizer.symbolize(BASE + 0x210), 'kernel32.dll!#3+0x10')
+        self.assertEqual(self.symbolizer.symbolize(0x7FFE0000), '0x7ffe0000')
+
+        # no export precedes the address.
+        self.assertEqual(self.symbolizer.resolve(BASE + 0x50), ('kernel32.dll', None, 0x50))
+        self.assertEqual(self.symbolizer.symbolize(BASE + 0x50), 'kernel32.dll+0x50')
+
+    def test_symbolize_many(self):
+        addresses = [BASE + 0x184, 0x1000, BASE + 0x100, BASE + 0x184, 0x00400010]
+
+        self.assertEqual(self.symbolizer.symbolize_many(addresses),
+                         [self.symbolizer.symbolize(address) for address in addresses])
+        self.assertEqual(self.symbolizer.exports.stats()['misses'], 2)
+
+    def test_unreadable_module(self):
+        exports = ExportCache()
+        symbolizer = Symbolizer(self.memory, exports)
+        symbolizer.set_modules([('ghost.dll', 0x10000000, 0x1000)])
+
+        self.assertEqual(symbolizer.symbolize_many([0x10000010, 0x10000020]), ['ghost.dll+0x10', 'ghost.dll+0x20'])
+        self.assertEqual(symbolizer.symbolize(0x10000030), 'ghost.dll+0x30')
+
+        # the failure is remembered by the symbolizer alone, the shared cache is left alone.
+        self.assertEqual(self.memory.reads, 1)
+        self.assertEqual(exports.indexes, {})
+
+        symbolizer.drop(0x10000000)
+        symbolizer.symbolize(0x10000030)
+        self.assertEqual(self.memory.reads, 2)
+
+        symbolizer.clear()
+        symbolizer.symbolize(0x10000030)
+        self.assertEqual(self.memory.reads, 3)
+
+
+class SymbolizeAddressesTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        image = build_image(EXPORTS)
+        struct.pack_into('<I', image, E_LFANEW + 0x50, len(image))
+        self.process.map(BASE, image)
+
+        self.load_dll()
+
+    def load_dll(self):
+        dll = self.process.queue_event(LOAD_DLL_DEBUG_EVENT)
+        dll.u.LoadDll.hFile = self.process.open_file(DEVICE + b'\\WINDOWS\\system32\\kernel32.dll')
+        dll.u.LoadDll.lpBaseOfDll = BASE
+
+        # paths are split on os.sep, Windows' whatever the host.
+        with mock.patch.object(os, 'sep', '\\'):
+            self.dbg.debug_event_iteration()
+
+    def test_symbolize_addresses(self):
+        self.assertEqual(self.dbg.symbolize(BASE + 0x184), 'kernel32.dll!CreateFileW+0x4')
+        self.assertEqual(self.dbg.symbolize_addresses([BASE + 0x300, 0x1000, BASE + 0x300]),
+                         ['kernel32.dll!HeapAlloc', '0x00001000', 'kernel32.dll!HeapAlloc'])
+
+    def test_failures_do_not_leak_into_the_export_cache(self):
+        self.process.ReadProcessMemory = lambda *args: 0
+
+        self.assertEqual(self.dbg.symbolize_addresses([BASE + 0x184]), ['kernel32.dll+0x184'])
+
+        del self.process.ReadProcessMemory
+
+        # func_resolve_debuggee() shares the export cache, it still gets to read the exports.
+        self.assertEqual(self.dbg.func_resolve_debuggee('kernel32.dll', 'HeapAlloc'), BASE + 0x300)
+
+    def test_failures_are_forgotten_on_unload(self):
+        self.process.ReadProcessMemory = lambda *args: 0
+        self.assertEqual(self.dbg.symbolize(BASE + 0x184), 'kernel32.dll+0x184')
+        del self.process.ReadProcessMemory
+
+        # remembered until the module goes away.
+        self.assertEqual(self.dbg.symbolize(BASE + 0x184), 'kernel32.dll+0x184')
+
+        unload = self.process.queue_event(UNLOAD_DLL_DEBUG_EVENT)
+        unload.u.UnloadDll.lpBaseOfDll = BASE
+        self.dbg.debug_event_iteration()
+        self.load_dll()
+
+        self.assertEqual(self.dbg.symbolize(BASE + 0x184), 'kernel32.dll!CreateFileW+0x4')
+
+
+if __name__ == '__main__':
+    unittest.main()
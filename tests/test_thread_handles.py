@@ -0,0 +1,100 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import unittest
+
+from pydbg.defines import CREATE_THREAD_DEBUG_EVENT, EXIT_THREAD_DEBUG_EVENT
+
+from tests.fake_process import DebuggerTestCase
+
+THREAD_ID = 7
+EVENT_HANDLE = 0x9990
+
+
+class ThreadHandleCacheTest(DebuggerTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # handles GetThreadContext() was called with.
+        self.queried = []
+        self.process.GetThreadContext = self.get_thread_context
+
+    def get_thread_context(self, handle, context):
+        self.process.calls['GetThreadContext'] += 1
+        self.queried.append(handle)
+        return 1
+
+    def test_repeated_context_access_opens_the_thread_once(self):
+        for _ in range(3):
+            context = self.dbg.get_thread_context(thread_id=THREAD_ID)
+            self.dbg.set_thread_context(context, thread_id=THREAD_ID)
+
+        self.assertEqual(self.process.calls['OpenThread'], 1)
+        self.assertEqual(self.process.calls['CloseHandle'], 0)
+        self.assertEqual(len(set(self.queried)), 1)
+        self.assertEqual(list(self.process.thread_handles.values()), [THREAD_ID])
+
+    def test_exit_thread_closes_the_handle(self):
+        self.dbg.get_thread_context(thread_id=THREAD_ID)
+        self.process.queue_event(EXIT_THREAD_DEBUG_EVENT, thread_id=THREAD_ID)
+        self.dbg.debug_event_iteration()
+
+        self.assertEqual(self.process.calls['CloseHandle'], 1)
+        self.assertEqual(self.process.thread_handles, {})
+
+    def test_detach_closes_every_handle(self):
+        for thread_id in (THREAD_ID, THREAD_ID + 1, THREAD_ID + 2):
+            self.dbg.get_thread_context(thread_id=thread_id)
+
+        self.dbg.detach()
+
+        self.assertEqual(self.process.calls['CloseHandle'], 3)
+        self.assertEqual(self.process.thread_handles, {})
+
+    def test_recycled_thread_id_gets_a_fresh_handle(self):
+        self.dbg.get_thread_context(thread_id=THREAD_ID)
+        self.process.queue_event(EXIT_THREAD_DEBUG_EVENT, thread_id=THREAD_ID)
+        self.dbg.debug_event_iteration()
+
+        self.dbg.get_thread_context(thread_id=THREAD_ID)
+
+        self.assertEqual(self.process.calls['OpenThread'], 2)
+        self.assertNotEqual(self.queried[0], self.queried[-1])
+        self.assertIn(self.queried[-1], self.process.thread_handles)
+
+    def test_create_thread_replaces_a_stale_handle(self):
+        stale = self.dbg._thread_handle(THREAD_ID)
+
+        event = self.process.queue_event(CREATE_THREAD_DEBUG_EVENT, thread_id=THREAD_ID)
+        event.u.CreateThread.hThread = EVENT_HANDLE
+        self.dbg.debug_event_iteration()
+        self.dbg.get_thread_context(thread_id=THREAD_ID)
+
+        # the handle we opened is closed, the one the event delivered is used and left open.
+        self.assertNotIn(stale, self.process.thread_handles)
+        self.assertEqual(self.queried[-1], EVENT_HANDLE)
+        self.assertEqual(self.process.calls['OpenThread'], 1)
+
+        self.dbg.detach()
+
+        self.assertEqual(self.process.calls['CloseHandle'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#
+# PyDBG
+# Copyright (C) 2006 Pedram Amini <pedram.amini@gmail.com>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation;
+# either version 2 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+
+import asyncio
+import os
+import socket
+import threading
+import unittest
+
+from pydbg.errors import PDError
+from pydbg.wire import FRAME_HEADER, AsyncChannel, Channel
+
+
+def loopback_pair():
+    """
+    @rtype:  Tuple
+    @return: Pair of TCP sockets connected to each other over the loopback interface.
+    """
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+
+    client = socket.create_connection(listener.getsockname())
+    (server, address) = listener.accept()
+    listener.close()
+
+    return (client, server)
+
+
+class Loopback(object):
+    """Two channels connected over loopback TCP, the peer echoing every frame from a thread"""
+
+    def __init__(self, echo=True):
+        (client, server) = loopback_pair()
+
+        self.client = Channel(client)
+        self.server = Channel(server)
+        self.thread = None
+
+        if echo:
+            self.thread = threading.Thread(target=self._echo, daemon=True)
+            self.thread.start()
+
+    def _echo(self):
+        try:
+            while True:
+                self.server.send(self.server.recv())
+        except PDError:
+            self.server.close()
+
+    def close(self):
+        self.client.close()
+
+        if self.thread:
+            self.thread.join(5)
+        else:
+            self.server.close()
+
+
+class ChannelTest(unittest.TestCase):
+    def setUp(self):
+        self.loopback = Loopback()
+        self.addCleanup(self.loopback.close)
+
+    def test_multi_megabyte_payloads(self):
+        for size in (0, 1, 0xFFFF, 0x10000, 0x10001, 8 << 20, 32 << 20):
+            payload = os.urandom(size)
+            self.loopback.client.send(payload)
+
+            self.assertEqual(bytes(self.loopback.client.recv()), payload)
+
+    def test_scatter_gather_send(self):
+        pieces = [b'header', bytearray(3 << 20), memoryview(os.urandom(0x1000))]
+        self.loopback.client.send(*pieces)
+
+        self.assertEqual(bytes(self.loopback.client.recv()), b''.join(pieces))
+
+    def test_objects(self):
+        data = {'method': 'read_process_memory', 'args': (0x00400000, 5 << 20), 'data': bytes(5 << 20)}
+        self.loopback.client.send_object(data)
+
+        self.assertEqual(self.loopback.client.recv_object(), data)
+
+    def test_counters(self):
+        self.loopback.client.send(bytes(100))
+        self.loopback.client.recv()
+
+        stats = self.loopback.client.stats()
+        self.assertEqual(stats['frames_sent'], 1)
+        self.assertEqual(stats['bytes_sent'], FRAME_HEADER.size + 100)
+        self.assertEqual(stats['bytes_received'], FRAME_HEADER.size + 100)
+
+
+class ChannelFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.loopback = Loopback(echo=False)
+        self.addCleanup(self.loopback.close)
+
+    def test_frame_above_the_limit_is_refused(self):
+        self.loopback.server.max_frame_size = 0x1000
+        self.loopback.client.send(bytes(0x1001))
+
+        with self.assertRaises(PDError):
+            self.loopback.server.recv()
+
+    def test_oversized_send_is_refused_before_writing(self):
+        self.loopback.client.max_frame_size = 0x1000
+
+        with self.assertRaises(PDError):
+            self.loopback.client.send(bytes(0x800), bytes(0x801))
+
+        self.assertEqual(self.loopback.client.stats()['bytes_sent'], 0)
+
+        # nothing went out, the stream is still in sync.
+        self.loopback.client.send(b'next')
+        self.assertEqual(bytes(self.loopback.server.recv()), b'next')
+
+    def test_truncated_frame(self):
+        self.loopback.client.sock.sendall(FRAME_HEADER.pack(0x100) + bytes(0x10))
+        self.loopback.client.sock.shutdown(socket.SHUT_WR)
+
+        with self.assertRaises(PDError):
+            self.loopback.server.recv()
+
+    def test_closed_peer(self):
+        self.loopback.client.sock.shutdown(socket.SHUT_WR)
+
+        with self.assertRaises(PDError):
+            self.loopback.server.recv()
+
+
+class AsyncChannelTest(unittest.TestCase):
+    def test_wire_compatible_with_channel(self):
+        loopback = Loopback()
+        self.addCleanup(loopback.close)
+
+        async def exchange(payload):
+            (reader, writer) = await asyncio.open_connection(sock=loopback.client.sock.dup())
+            channel = AsyncChannel(reader, writer)
+
+            await channel.send(payload[:10], payload[10:])
+            received = bytes(await channel.recv())
+            await channel.close()
+
+            return received
+
+        payload = os.urandom(4 << 20)
+        self.assertEqual(asyncio.run(exchange(payload)), payload)
+
+    def test_oversized_send_is_refused_before_writing(self):
+        loopback = Loopback()
+        self.addCleanup(loopback.close)
+
+        async def exchange():
+            (reader, writer) = await asyncio.open_connection(sock=loopback.client.sock.dup())
+            channel = AsyncChannel(reader, writer, max_frame_size=0x1000)
+
+            with self.assertRaises(PDError):
+                await channel.send(bytes(0x1001))
+
+            await channel.send(b'next')
+            received = bytes(await channel.recv())
+            await channel.close()
+
+            return received
+
+        self.assertEqual(asyncio.run(exchange()), b'next')
+
+
+if __name__ == '__main__':
+    unittest.main()